@@ -0,0 +1,73 @@
+"""
+Portfolio-Risikokennzahlen mit NumPy.
+
+Everything works on one matrix of daily closes (days x symbols) and the
+current share counts, so the cost is a handful of matrix operations no
+matter how many positions the account holds.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def portfolio_risk(symbols: List[str], closes: np.ndarray, quantities: np.ndarray,
+                   benchmark: np.ndarray) -> Dict:
+    """
+    Risk metrics for holding `quantities` shares over the close history.
+
+    closes:     (days, symbols) daily closes, no gaps
+    quantities: (symbols,) current share counts (negative for shorts)
+    benchmark:  (days,) benchmark closes on the same days
+    """
+    values = closes @ quantities                   # portfolio value per day
+    returns = closes[1:] / closes[:-1] - 1.0       # (days - 1, symbols)
+    portfolio_returns = values[1:] / values[:-1] - 1.0
+    benchmark_returns = benchmark[1:] / benchmark[:-1] - 1.0
+
+    market_values = closes[-1] * quantities
+    weights = market_values / market_values.sum()
+
+    # Beta: covariance with the benchmark over the benchmark's variance
+    benchmark_var = benchmark_returns.var(ddof=1)
+    beta = np.cov(portfolio_returns, benchmark_returns)[0, 1] / benchmark_var if benchmark_var > 0 else 0.0
+
+    # Drawdown of the value path
+    running_peak = np.maximum.accumulate(values)
+    drawdowns = values / running_peak - 1.0
+
+    # Risk contribution: w_i * (Σw)_i / (w'Σw), sums to 1
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    marginal = covariance @ weights
+    portfolio_var = float(weights @ marginal)
+    contributions = weights * marginal / portfolio_var if portfolio_var > 0 else np.zeros_like(weights)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        correlation = np.atleast_2d(np.corrcoef(returns, rowvar=False))
+    correlation = np.nan_to_num(correlation)
+
+    position_vol = np.sqrt(np.diag(covariance) * TRADING_DAYS)
+    return {
+        "window_days": int(len(values)),
+        "total_return": float(values[-1] / values[0] - 1.0),
+        "benchmark_return": float(benchmark[-1] / benchmark[0] - 1.0),
+        "volatility": float(portfolio_returns.std(ddof=1) * np.sqrt(TRADING_DAYS)),
+        "beta": float(beta),
+        "max_drawdown": float(drawdowns.min()),
+        "current_drawdown": float(drawdowns[-1]),
+        "correlation": {
+            a: {b: round(float(correlation[i, j]), 4) for j, b in enumerate(symbols)}
+            for i, a in enumerate(symbols)
+        },
+        "positions": [
+            {
+                "symbol": symbol,
+                "weight": round(float(weights[i]), 4),
+                "volatility": round(float(position_vol[i]), 4),
+                "risk_contribution": round(float(contributions[i]), 4),
+            }
+            for i, symbol in enumerate(symbols)
+        ],
+    }
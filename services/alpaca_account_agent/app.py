@@ -1,24 +1,55 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import GetOrdersRequest
-from alpaca.trading.enums import OrderSide, QueryOrderStatus
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta
+import hashlib
+import json
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-app = FastAPI(title="Alpaca Account Info Agent")
+# Shared StockM8 library (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import (
+    Warmup, add_conditional_responses, add_health_routes, add_negotiation, cache_metrics, close_clients, get_cache,
+    get_data_client, get_trading_client, precondition, throttle_metrics
+)
 
-# Initialize Alpaca Trading Client
-trading_client = TradingClient(
-    api_key=os.getenv('APCA_API_KEY_ID'),
-    secret_key=os.getenv('APCA_API_SECRET_KEY'),
-    paper=True  # Paper trading
+# alpaca-py, pandas and numpy are imported in the background after startup (or on first use)
+warmup = Warmup(
+    modules=[
+        "alpaca.trading.client", "alpaca.trading.requests", "alpaca.trading.enums",
+        "alpaca.data.historical", "alpaca.data.requests", "pandas", "numpy", "analytics", "equity_store"
+    ],
+    hooks=[("trading_client", lambda: get_trading_client(paper=True)), ("data_client", get_data_client)]
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The shared, rate-limit-aware Trading Client (paper trading) is created
+    # in each worker process by the warm-up, never at import time
+    warmup.start()
+    yield
+    close_clients()
+
+app = FastAPI(title="Alpaca Account Info Agent", lifespan=lifespan)
+# JSON by default, MessagePack and data-only answers for the orchestrator
+add_negotiation(app)
+# ETag/304 and compression for n8n's portfolio polling
+add_conditional_responses(app, ["/account-info"])
+add_health_routes(app, warmup)
+
+# Short-lived cache: absorbs n8n polling bursts and is shared across workers
+cache = get_cache("account")
+ACCOUNT_CACHE_TTL = float(os.getenv("ACCOUNT_CACHE_TTL", "5"))
+
 class AccountInfoResponse(BaseModel):
     formatted_message: str
     account_value: float
@@ -28,12 +59,67 @@ class AccountInfoResponse(BaseModel):
     positions_count: int
     open_orders_count: int
 
+class PositionRisk(BaseModel):
+    symbol: str
+    weight: float
+    volatility: float
+    risk_contribution: float
+
+class PortfolioAnalyticsResponse(BaseModel):
+    formatted_message: str
+    as_of: str
+    benchmark: str
+    window_days: int
+    total_return: float
+    benchmark_return: float
+    volatility: float
+    beta: float
+    max_drawdown: float
+    current_drawdown: float
+    correlation: Dict[str, Dict[str, float]]
+    positions: List[PositionRisk]
+    skipped_symbols: List[str] = []
+
+class EquityPoint(BaseModel):
+    date: str
+    equity: float
+    cash: float
+
+class EquityCurveResponse(BaseModel):
+    formatted_message: str
+    start: str
+    end: str
+    points: List[EquityPoint]
+    change: float
+    change_percent: float
+    new_activities: int
+    unreconciled_symbols: List[str] = []
+    cash_offset: float = 0.0
+
+# Equity curve: activities are stored once in a local SQLite file and replayed incrementally
+EQUITY_DB_PATH = os.getenv("EQUITY_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "equity.sqlite3"))
+EQUITY_SYNC_INTERVAL = float(os.getenv("EQUITY_SYNC_INTERVAL", "30"))
+EQUITY_DEFAULT_DAYS = int(os.getenv("EQUITY_DEFAULT_DAYS", "90"))
+ACTIVITY_PAGE_SIZE = 100
+equity_store = None
+equity_sync_lock = threading.Lock()
+equity_last_sync = 0.0
+
+# Portfolio analytics: daily closes of all holdings plus the benchmark
+ANALYTICS_BENCHMARK = os.getenv("ANALYTICS_BENCHMARK", "SPY")
+ANALYTICS_DAYS_BACK = int(os.getenv("ANALYTICS_DAYS_BACK", "365"))
+
 @app.get("/")
 def read_root():
-    return {"status": "Alpaca Account Agent is running", "endpoints": ["/account-info"]}
+    return {"status": "Alpaca Account Agent is running", "endpoints": ["/account-info", "/portfolio/analytics", "/portfolio/equity-curve", "/metrics", "/healthz", "/readyz", "/startup-profile"]}
+
+@app.get("/metrics")
+def metrics():
+    """Alpaca rate-limit and cache counters"""
+    return {"alpaca": throttle_metrics(), "cache": cache_metrics()}
 
 @app.get("/account-info", response_model=AccountInfoResponse)
-def get_account_info():
+def get_account_info(request: Request, response: Response):
     """
     Returns comprehensive account information including:
     - Account balance, buying power, cash
@@ -42,103 +128,443 @@ def get_account_info():
     - Formatted message ready for Telegram
     """
     try:
-        # Get account details
-        account = trading_client.get_account()
-        
-        # Get all positions
-        positions = trading_client.get_all_positions()
-        
-        # Get open orders
-        order_request = GetOrdersRequest(
-            status=QueryOrderStatus.OPEN
-        )
-        open_orders = trading_client.get_orders(filter=order_request)
-        
-        # Build formatted message
-        message_parts = []
-        
-        # Header
-        message_parts.append("💼 YOUR ALPACA ACCOUNT")
-        message_parts.append("")
-        
-        # Account Overview
-        message_parts.append("📊 ACCOUNT OVERVIEW")
-        message_parts.append("")
-        message_parts.append(f"💰 Total Value: ${float(account.portfolio_value):,.2f}")
-        message_parts.append(f"💵 Cash: ${float(account.cash):,.2f}")
-        message_parts.append(f"⚡ Buying Power: ${float(account.buying_power):,.2f}")
-        message_parts.append(f"📈 Equity: ${float(account.equity):,.2f}")
+        version, account_info = cache.get_or_set("account-info:versioned", versioned_account_info, ttl=ACCOUNT_CACHE_TTL)
+        # A poll with the current version's ETag gets 304 before anything is serialised
+        not_modified = precondition(request, response, version)
+        if not_modified is not None:
+            return not_modified
+        return AccountInfoResponse(**account_info)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching account info: {str(e)}")
+
+
+def versioned_account_info() -> list:
+    """[content hash, account info]: the hash is computed once per cache fill, not per request."""
+    account_info = build_account_info()
+    raw = json.dumps(account_info, sort_keys=True, default=str).encode("utf-8")
+    return [hashlib.blake2b(raw, digest_size=12).hexdigest(), account_info]
+
+
+def build_account_info() -> dict:
+    """Fetches account, positions and open orders and builds the response data."""
+    from alpaca.trading.requests import GetOrdersRequest
+    from alpaca.trading.enums import OrderSide, QueryOrderStatus
+
+    trading_client = get_trading_client(paper=True)
+
+    # Get account details
+    account = trading_client.get_account()
+    
+    # Get all positions
+    positions = trading_client.get_all_positions()
+    
+    # Get open orders
+    order_request = GetOrdersRequest(
+        status=QueryOrderStatus.OPEN
+    )
+    open_orders = trading_client.get_orders(filter=order_request)
+    
+    # Build formatted message
+    message_parts = []
+    
+    # Header
+    message_parts.append("💼 YOUR ALPACA ACCOUNT")
+    message_parts.append("")
+    
+    # Account Overview
+    message_parts.append("📊 ACCOUNT OVERVIEW")
+    message_parts.append("")
+    message_parts.append(f"💰 Total Value: ${float(account.portfolio_value):,.2f}")
+    message_parts.append(f"💵 Cash: ${float(account.cash):,.2f}")
+    message_parts.append(f"⚡ Buying Power: ${float(account.buying_power):,.2f}")
+    message_parts.append(f"📈 Equity: ${float(account.equity):,.2f}")
+    message_parts.append("")
+    
+    # Day's Performance
+    if account.equity != account.last_equity:
+        change = float(account.equity) - float(account.last_equity)
+        change_percent = (change / float(account.last_equity)) * 100
+        emoji = "🟢" if change >= 0 else "🔴"
+        sign = "+" if change >= 0 else ""
+        message_parts.append(f"📊 Today: {sign}${change:,.2f} ({sign}{change_percent:.2f}%) {emoji}")
         message_parts.append("")
-        
-        # Day's Performance
-        if account.equity != account.last_equity:
-            change = float(account.equity) - float(account.last_equity)
-            change_percent = (change / float(account.last_equity)) * 100
-            emoji = "🟢" if change >= 0 else "🔴"
-            sign = "+" if change >= 0 else ""
-            message_parts.append(f"📊 Today: {sign}${change:,.2f} ({sign}{change_percent:.2f}%) {emoji}")
+    
+    # Positions
+    message_parts.append(f"📦 POSITIONS ({len(positions)})")
+    message_parts.append("")
+    
+    if positions:
+        for position in positions:
+            symbol = position.symbol
+            qty = float(position.qty)
+            current_price = float(position.current_price)
+            market_value = float(position.market_value)
+            unrealized_pl = float(position.unrealized_pl)
+            unrealized_plpc = float(position.unrealized_plpc) * 100
+            
+            pl_emoji = "🟢" if unrealized_pl >= 0 else "🔴"
+            pl_sign = "+" if unrealized_pl >= 0 else ""
+            
+            message_parts.append(f"• {symbol}")
+            message_parts.append(f"  {qty} shares @ ${current_price:.2f}")
+            message_parts.append(f"  Value: ${market_value:,.2f}")
+            message_parts.append(f"  P/L: {pl_sign}${unrealized_pl:,.2f} ({pl_sign}{unrealized_plpc:.2f}%) {pl_emoji}")
             message_parts.append("")
-        
-        # Positions
-        message_parts.append(f"📦 POSITIONS ({len(positions)})")
+    else:
+        message_parts.append("No open positions")
         message_parts.append("")
-        
-        if positions:
-            for position in positions:
-                symbol = position.symbol
-                qty = float(position.qty)
-                current_price = float(position.current_price)
-                market_value = float(position.market_value)
-                unrealized_pl = float(position.unrealized_pl)
-                unrealized_plpc = float(position.unrealized_plpc) * 100
-                
-                pl_emoji = "🟢" if unrealized_pl >= 0 else "🔴"
-                pl_sign = "+" if unrealized_pl >= 0 else ""
-                
-                message_parts.append(f"• {symbol}")
-                message_parts.append(f"  {qty} shares @ ${current_price:.2f}")
-                message_parts.append(f"  Value: ${market_value:,.2f}")
-                message_parts.append(f"  P/L: {pl_sign}${unrealized_pl:,.2f} ({pl_sign}{unrealized_plpc:.2f}%) {pl_emoji}")
-                message_parts.append("")
-        else:
-            message_parts.append("No open positions")
+    
+    # Open Orders
+    message_parts.append(f"📋 OPEN ORDERS ({len(open_orders)})")
+    message_parts.append("")
+    
+    if open_orders:
+        for order in open_orders:
+            side_emoji = "🟢" if order.side == OrderSide.BUY else "🔴"
+            message_parts.append(f"{side_emoji} {order.side.value} {order.symbol}")
+            message_parts.append(f"  {order.qty} shares @ ${float(order.limit_price or 0):.2f}")
+            message_parts.append(f"  Status: {order.status.value}")
             message_parts.append("")
-        
-        # Open Orders
-        message_parts.append(f"📋 OPEN ORDERS ({len(open_orders)})")
+    else:
+        message_parts.append("No open orders")
         message_parts.append("")
-        
-        if open_orders:
-            for order in open_orders:
-                side_emoji = "🟢" if order.side == OrderSide.BUY else "🔴"
-                message_parts.append(f"{side_emoji} {order.side.value} {order.symbol}")
-                message_parts.append(f"  {order.qty} shares @ ${float(order.limit_price or 0):.2f}")
-                message_parts.append(f"  Status: {order.status.value}")
-                message_parts.append("")
-        else:
-            message_parts.append("No open orders")
-            message_parts.append("")
-        
-        # Footer
-        message_parts.append("🤖 Powered by StockM8")
-        
-        formatted_message = "\n".join(message_parts)
-        
-        return AccountInfoResponse(
-            formatted_message=formatted_message,
-            account_value=float(account.portfolio_value),
-            buying_power=float(account.buying_power),
-            cash=float(account.cash),
-            portfolio_value=float(account.portfolio_value),
-            positions_count=len(positions),
-            open_orders_count=len(open_orders)
+    
+    # Footer
+    message_parts.append("🤖 Powered by StockM8")
+    
+    formatted_message = "\n".join(message_parts)
+    
+    return {
+        "formatted_message": formatted_message,
+        "account_value": float(account.portfolio_value),
+        "buying_power": float(account.buying_power),
+        "cash": float(account.cash),
+        "portfolio_value": float(account.portfolio_value),
+        "positions_count": len(positions),
+        "open_orders_count": len(open_orders)
+    }
+
+
+@app.get("/portfolio/analytics", response_model=PortfolioAnalyticsResponse)
+def get_portfolio_analytics():
+    """
+    Risk view of the current holdings over the last ANALYTICS_DAYS_BACK days:
+    return, volatility, beta vs. the benchmark, drawdown, correlation matrix
+    and each position's share of portfolio risk.
+
+    Cached until the next daily bar for the same holdings.
+    """
+    try:
+        holdings = cache.get_or_set("positions", fetch_holdings, ttl=ACCOUNT_CACHE_TTL)
+        if not holdings:
+            raise HTTPException(status_code=404, detail="No open stock positions to analyse")
+        end_day = last_bar_day()
+        fingerprint = hashlib.sha256(
+            ",".join(f"{h['symbol']}:{h['qty']}" for h in holdings).encode("utf-8")
+        ).hexdigest()[:16]
+        analytics = cache.get_or_set(
+            f"portfolio-analytics:{fingerprint}:{end_day}",
+            lambda: build_portfolio_analytics(holdings),
+            ttl=seconds_until_next_bar()
         )
-        
+        return PortfolioAnalyticsResponse(**analytics)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching account info: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error computing portfolio analytics: {str(e)}")
+
+
+def last_bar_day() -> str:
+    # Same convention as the other agents: daily bars up to yesterday
+    return (datetime.now() - timedelta(days=1)).date().isoformat()
+
+
+def seconds_until_next_bar() -> float:
+    """Seconds until the daily bar window moves on (next midnight)."""
+    now = datetime.now()
+    next_day = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max((next_day - now).total_seconds(), 60.0)
+
+
+def fetch_holdings() -> List[dict]:
+    """Current stock positions as [{"symbol", "qty"}], sorted by symbol."""
+    positions = get_trading_client(paper=True).get_all_positions()
+    holdings = [
+        {"symbol": position.symbol, "qty": float(position.qty)}
+        for position in positions
+        if getattr(position.asset_class, "value", position.asset_class) == "us_equity"
+    ]
+    return sorted(holdings, key=lambda h: h["symbol"])
+
+
+def load_closes(symbols: List[str]) -> dict:
+    """Daily closes for all symbols in one batched bars request, cached until the next bar."""
+    key = hashlib.sha256(",".join(symbols).encode("utf-8")).hexdigest()[:16]
+    return cache.get_or_set(
+        f"closes:{key}:{last_bar_day()}",
+        lambda: fetch_closes(symbols),
+        ttl=seconds_until_next_bar()
+    )
+
+
+def fetch_closes(symbols: List[str]) -> dict:
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    end_date = datetime.now() - timedelta(days=1)
+    request = StockBarsRequest(
+        symbol_or_symbols=symbols,
+        timeframe=TimeFrame.Day,
+        start=end_date - timedelta(days=ANALYTICS_DAYS_BACK),
+        end=end_date
+    )
+    df = get_data_client().get_stock_bars(request).df
+    if df.empty:
+        return {"dates": [], "symbols": [], "closes": []}
+
+    # (days x symbols); symbols without any bar are dropped, short gaps filled
+    closes = df["close"].unstack(level="symbol").reindex(columns=symbols)
+    closes = closes.dropna(axis=1, how="all").ffill().dropna()
+    return {
+        "dates": [ts.date().isoformat() for ts in closes.index],
+        "symbols": list(closes.columns),
+        "closes": closes.to_numpy(dtype=float).tolist()
+    }
+
+
+def build_portfolio_analytics(holdings: List[dict]) -> dict:
+    import numpy as np
+    from analytics import portfolio_risk
+
+    symbols = [h["symbol"] for h in holdings]
+    history = load_closes(sorted(set(symbols) | {ANALYTICS_BENCHMARK}))
+    if ANALYTICS_BENCHMARK not in history["symbols"] or len(history["dates"]) < 3:
+        raise HTTPException(status_code=503, detail="Not enough price history for analytics")
+
+    columns = {symbol: i for i, symbol in enumerate(history["symbols"])}
+    held = [h for h in holdings if h["symbol"] in columns]
+    skipped = [h["symbol"] for h in holdings if h["symbol"] not in columns]
+    if not held:
+        raise HTTPException(status_code=404, detail="No price history for any held symbol")
+
+    matrix = np.asarray(history["closes"], dtype=float)
+    closes = matrix[:, [columns[h["symbol"]] for h in held]]
+    quantities = np.array([h["qty"] for h in held], dtype=float)
+    benchmark = matrix[:, columns[ANALYTICS_BENCHMARK]]
+
+    result = portfolio_risk([h["symbol"] for h in held], closes, quantities, benchmark)
+    result.update({
+        "as_of": history["dates"][-1],
+        "benchmark": ANALYTICS_BENCHMARK,
+        "skipped_symbols": skipped
+    })
+    result["formatted_message"] = format_analytics_message(result)
+    return result
+
+
+def format_analytics_message(result: dict) -> str:
+    message_parts = []
+    message_parts.append("📐 PORTFOLIO ANALYTICS")
+    message_parts.append(f"{result['window_days']} trading days until {result['as_of']}")
+    message_parts.append("")
+
+    ret_emoji = "🟢" if result["total_return"] >= 0 else "🔴"
+    message_parts.append(f"{ret_emoji} Return: {result['total_return'] * 100:+.2f}% ({result['benchmark']}: {result['benchmark_return'] * 100:+.2f}%)")
+    message_parts.append(f"🌊 Volatility (ann.): {result['volatility'] * 100:.2f}%")
+    message_parts.append(f"⚖️ Beta vs {result['benchmark']}: {result['beta']:.2f}")
+    message_parts.append(f"📉 Max Drawdown: {result['max_drawdown'] * 100:.2f}%")
+    message_parts.append("")
+
+    message_parts.append("🎯 RISK CONTRIBUTION")
+    for position in sorted(result["positions"], key=lambda p: p["risk_contribution"], reverse=True):
+        message_parts.append(
+            f"• {position['symbol']}: {position['risk_contribution'] * 100:.1f}% of risk "
+            f"({position['weight'] * 100:.1f}% of value)"
+        )
+    message_parts.append("")
+
+    if result["skipped_symbols"]:
+        message_parts.append(f"⚠️ No price history: {', '.join(result['skipped_symbols'])}")
+        message_parts.append("")
+
+    message_parts.append("🤖 Powered by StockM8")
+    return "\n".join(message_parts)
+
+
+def get_equity_store():
+    """The SQLite store, opened on first use in each worker."""
+    global equity_store
+    if equity_store is None:
+        from equity_store import EquityStore
+        equity_store = EquityStore(EQUITY_DB_PATH)
+    return equity_store
+
+
+def fetch_activity_page(page_token: Optional[str]) -> List[dict]:
+    params = {"direction": "asc", "page_size": ACTIVITY_PAGE_SIZE}
+    if page_token:
+        params["page_token"] = page_token
+    return get_trading_client(paper=True).get("/account/activities", params)
+
+
+def sync_activities() -> int:
+    """Ingests and replays new activities, at most every EQUITY_SYNC_INTERVAL seconds per worker."""
+    global equity_last_sync
+    with equity_sync_lock:
+        if time.monotonic() - equity_last_sync < EQUITY_SYNC_INTERVAL:
+            return 0
+        store = get_equity_store()
+        added = store.ingest(fetch_activity_page, ACTIVITY_PAGE_SIZE)
+        # Also picks up rows another worker ingested but did not replay yet
+        store.replay()
+        equity_last_sync = time.monotonic()
+        return added
+
+
+def trading_days(start: str, end: str) -> List[str]:
+    """Market days in [start, end] from Alpaca's calendar (past calendars never change)."""
+    def fetch():
+        from alpaca.trading.requests import GetCalendarRequest
+        calendar = get_trading_client(paper=True).get_calendar(
+            GetCalendarRequest(start=date.fromisoformat(start), end=date.fromisoformat(end))
+        )
+        return [day.date.isoformat() for day in calendar]
+    return cache.get_or_set(f"calendar:{start}:{end}", fetch, ttl=24 * 3600)
+
+
+def daily_equity(days: List[str]) -> Dict[str, tuple]:
+    """Equity per day from stored values; only days never computed are priced."""
+    import pandas as pd
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    store = get_equity_store()
+    known = store.stored_equity(days[0], days[-1])
+    missing = [day for day in days if day not in known]
+    if not missing:
+        return known
+
+    states = store.states_for_days(missing)
+    symbols = sorted({symbol for _, positions in states for symbol in positions})
+    closes = None
+    if symbols:
+        # One batched request; a few days of lead-in to carry prices over gaps
+        request = StockBarsRequest(
+            symbol_or_symbols=symbols,
+            timeframe=TimeFrame.Day,
+            start=datetime.fromisoformat(missing[0]) - timedelta(days=7),
+            end=datetime.fromisoformat(missing[-1]) + timedelta(days=1)
+        )
+        df = get_data_client().get_stock_bars(request).df
+        if not df.empty:
+            closes = df["close"].unstack(level="symbol")
+            closes.index = closes.index.tz_convert("America/New_York").strftime("%Y-%m-%d")
+            closes = closes.reindex(sorted(set(closes.index) | set(missing))).ffill()
+
+    rows = []
+    for day, (cash, positions) in zip(missing, states):
+        value = cash
+        for symbol, qty in positions.items():
+            if closes is not None and symbol in closes.columns and pd.notna(closes.at[day, symbol]):
+                value += qty * float(closes.at[day, symbol])
+        rows.append((day, value, cash))
+    store.store_equity(rows)
+    known.update({day: (value, cash) for day, value, cash in rows})
+    return known
+
+
+@app.get("/portfolio/equity-curve", response_model=EquityCurveResponse)
+def get_equity_curve(start: Optional[str] = None, end: Optional[str] = None):
+    """
+    Daily account equity between start and end (YYYY-MM-DD, default: last
+    EQUITY_DEFAULT_DAYS days). Past days come from the local store; today is
+    added live from the account when the range includes it.
+    """
+    try:
+        today = date.today()
+        end_day = date.fromisoformat(end) if end else today
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=EQUITY_DEFAULT_DAYS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    try:
+        new_activities = sync_activities()
+        store = get_equity_store()
+        first = store.first_activity_date()
+        if first:
+            start_day = max(start_day, date.fromisoformat(first))
+
+        # Closed days only; the current session is priced live below
+        last_closed = min(end_day, today - timedelta(days=1))
+        days = trading_days(start_day.isoformat(), last_closed.isoformat()) if first and start_day <= last_closed else []
+        equity = daily_equity(days) if days else {}
+
+        # Replay starts from cash 0 at the first stored activity; cash held
+        # before that (or moved by activities Alpaca does not report) is the
+        # gap between live and replayed cash, added to every past day
+        account = get_trading_client(paper=True).get_account()
+        replayed_cash, replayed_positions = store.current_state()
+        cash_offset = float(account.cash) - replayed_cash
+        points = [
+            EquityPoint(date=day, equity=round(equity[day][0] + cash_offset, 2), cash=round(equity[day][1] + cash_offset, 2))
+            for day in days
+        ]
+
+        if end_day >= today:
+            points.append(EquityPoint(date=today.isoformat(), equity=float(account.equity), cash=float(account.cash)))
+
+        if not points:
+            raise HTTPException(status_code=404, detail="No account history in this range")
+
+        # Same for share counts, but a position cannot be shifted: flag the ones replay cannot explain
+        actual = {h["symbol"]: h["qty"] for h in cache.get_or_set("positions", fetch_holdings, ttl=ACCOUNT_CACHE_TTL)}
+        unreconciled = sorted(
+            symbol for symbol in set(actual) | set(replayed_positions)
+            if abs(actual.get(symbol, 0.0) - replayed_positions.get(symbol, 0.0)) > 1e-6
+        )
+
+        change = points[-1].equity - points[0].equity
+        change_percent = change / points[0].equity * 100 if points[0].equity else 0.0
+        return EquityCurveResponse(
+            formatted_message=format_equity_message(points, change, change_percent),
+            start=points[0].date,
+            end=points[-1].date,
+            points=points,
+            change=round(change, 2),
+            change_percent=round(change_percent, 2),
+            new_activities=new_activities,
+            unreconciled_symbols=unreconciled,
+            cash_offset=round(cash_offset, 2)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building equity curve: {str(e)}")
+
+
+def format_equity_message(points: List[EquityPoint], change: float, change_percent: float) -> str:
+    peak = max(points, key=lambda p: p.equity)
+    low = min(points, key=lambda p: p.equity)
+    emoji = "🟢" if change >= 0 else "🔴"
+    sign = "+" if change >= 0 else ""
+
+    message_parts = []
+    message_parts.append("📈 EQUITY CURVE")
+    message_parts.append(f"{points[0].date} → {points[-1].date}")
+    message_parts.append("")
+    message_parts.append(f"💰 Start: ${points[0].equity:,.2f}")
+    message_parts.append(f"💰 End: ${points[-1].equity:,.2f}")
+    message_parts.append(f"{emoji} Change: {sign}${change:,.2f} ({sign}{change_percent:.2f}%)")
+    message_parts.append(f"🔝 High: ${peak.equity:,.2f} ({peak.date})")
+    message_parts.append(f"🔻 Low: ${low.equity:,.2f} ({low.date})")
+    message_parts.append("")
+    message_parts.append("🤖 Powered by StockM8")
+    return "\n".join(message_parts)
 
 
-#local server run
+#local server run (WEB_CONCURRENCY sets the number of worker processes)
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=80)
+    uvicorn.run("app:app", host="0.0.0.0", port=80, workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -0,0 +1,292 @@
+"""
+Lokaler, append-only Speicher für Kontoaktivitäten und die Equity-Kurve.
+
+Three layers in one SQLite file:
+
+- activities:  every Alpaca account activity (fills, dividends, deposits,
+               fees, splits, ...) exactly once, in the order it was ingested
+- checkpoints: cash and share counts at the end of each day that had
+               activity, produced by replaying activities in order
+- equity:      cash + sum(qty * close) per trading day, computed once per day
+               and reused for every later range query
+
+Cash is replayed from 0 at the first stored activity, so stored cash and
+equity are relative to it; the API anchors them to the live account cash.
+
+Each sync only pulls activities newer than the last stored id and replays
+from the earliest day among the new rows, so the full history is walked
+once. An activity that arrives late (dated before days already replayed)
+rebuilds the checkpoints from its day on.
+WAL mode lets several worker processes read while one writes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Days are trading days: a fill at 21:00 UTC in winter still belongs to
+# that day's session, one at 01:00 UTC to the previous evening's
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+# Bumped when parse_activity changes; stored rows are re-parsed once
+PARSE_VERSION = "2"
+
+# Non-trade activities that change share counts (qty is the change)
+POSITION_ACTIVITY_TYPES = {"SPLIT", "SSO", "SSP", "MA", "NC", "SC", "ACATS"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    activity_type TEXT NOT NULL,
+    date TEXT NOT NULL,
+    symbol TEXT,
+    qty_change REAL NOT NULL,
+    cash_change REAL NOT NULL,
+    raw TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    date TEXT PRIMARY KEY,
+    cash REAL NOT NULL,
+    positions TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS equity (
+    date TEXT PRIMARY KEY,
+    equity REAL NOT NULL,
+    cash REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+State = Tuple[float, Dict[str, float]]
+
+
+def market_date(timestamp: str) -> str:
+    """New York trading date of an ISO timestamp (e.g. "2024-01-02T01:30:00Z" -> "2024-01-01")"""
+    moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        return timestamp[:10]
+    return moment.astimezone(MARKET_TIMEZONE).date().isoformat()
+
+
+def parse_activity(activity: dict) -> Tuple[str, str, Optional[str], float, float]:
+    """Returns (activity_type, date, symbol, qty_change, cash_change) for a raw activity."""
+    kind = activity.get("activity_type", "")
+    symbol = activity.get("symbol")
+    if kind == "FILL":
+        qty = float(activity["qty"])
+        signed_qty = qty if activity.get("side") == "buy" else -qty
+        return kind, market_date(activity["transaction_time"]), symbol, signed_qty, -signed_qty * float(activity["price"])
+
+    cash_change = float(activity.get("net_amount") or 0.0)
+    qty_change = float(activity.get("qty") or 0.0) if kind in POSITION_ACTIVITY_TYPES and symbol else 0.0
+    date = (activity.get("date") or activity.get("transaction_time") or "")[:10]
+    return kind, date, symbol, qty_change, cash_change
+
+
+class EquityStore:
+    """Append-only activity log with daily checkpoints and per-day equity."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; the timeout covers other workers' writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_state(self, conn, key: str, default: str = "") -> str:
+        row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_state(self, conn, key: str, value: str) -> None:
+        conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def _migrate(self) -> None:
+        """Re-parses stored activities written by an older parse_activity and replays from scratch."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._get_state(conn, "parse_version", "1") == PARSE_VERSION:
+                conn.execute("COMMIT")
+                return
+            rows = conn.execute("SELECT seq, raw FROM activities").fetchall()
+            conn.executemany(
+                "UPDATE activities SET date = ? WHERE seq = ?",
+                [(parse_activity(json.loads(raw))[1], seq) for seq, raw in rows]
+            )
+            conn.execute("DELETE FROM checkpoints")
+            conn.execute("DELETE FROM equity")
+            self._set_state(conn, "replay_cursor", "0")
+            self._set_state(conn, "parse_version", PARSE_VERSION)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def last_activity_id(self) -> Optional[str]:
+        row = self._connect().execute("SELECT id FROM activities ORDER BY seq DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def append(self, activities: Iterable[dict]) -> int:
+        """Stores activities (oldest first); ids already stored are ignored."""
+        rows = []
+        for activity in activities:
+            kind, date, symbol, qty_change, cash_change = parse_activity(activity)
+            rows.append((activity["id"], kind, date, symbol, qty_change, cash_change, json.dumps(activity)))
+        if not rows:
+            return 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO activities (id, activity_type, date, symbol, qty_change, cash_change, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def ingest(self, fetch_page: Callable[[Optional[str]], List[dict]], page_size: int) -> int:
+        """
+        Pulls activities newer than the last stored one.
+
+        fetch_page(page_token) returns up to page_size activities in ascending
+        order after the activity id `page_token` (None: from the beginning).
+        """
+        added = 0
+        token = self.last_activity_id()
+        while True:
+            page = fetch_page(token)
+            added += self.append(page)
+            if len(page) < page_size:
+                return added
+            token = page[-1]["id"]
+
+    # ------------------------------------------------------------------
+    # Replay
+    # ------------------------------------------------------------------
+
+    def _state_on_or_before(self, conn, date: str) -> Tuple[Optional[str], State]:
+        row = conn.execute(
+            "SELECT date, cash, positions FROM checkpoints WHERE date <= ? ORDER BY date DESC LIMIT 1", (date,)
+        ).fetchone()
+        if row is None:
+            return None, (0.0, {})
+        return row[0], (row[1], json.loads(row[2]))
+
+    def replay(self) -> int:
+        """Applies activities after the replay cursor and rewrites the daily checkpoints they touch."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = int(self._get_state(conn, "replay_cursor", "0"))
+            added, first, last_seq = conn.execute(
+                "SELECT COUNT(*), MIN(date), MAX(seq) FROM activities WHERE seq > ?", (cursor,)
+            ).fetchone()
+            if not added:
+                conn.execute("COMMIT")
+                return 0
+
+            # Usually `first` is the latest checkpoint's day or later. A late
+            # activity can be older: then every day from it on is replayed
+            # again, in date order, from the last checkpoint before it.
+            row = conn.execute(
+                "SELECT cash, positions FROM checkpoints WHERE date < ? ORDER BY date DESC LIMIT 1", (first,)
+            ).fetchone()
+            cash, positions = (row[0], json.loads(row[1])) if row else (0.0, {})
+            rows = conn.execute(
+                "SELECT date, symbol, qty_change, cash_change FROM activities WHERE date >= ? ORDER BY date, seq",
+                (first,)
+            ).fetchall()
+            checkpoints = {}
+            for date, symbol, qty_change, cash_change in rows:
+                cash += cash_change
+                if symbol and qty_change:
+                    qty = positions.get(symbol, 0.0) + qty_change
+                    if abs(qty) < 1e-9:
+                        positions.pop(symbol, None)
+                    else:
+                        positions[symbol] = qty
+                checkpoints[date] = (cash, json.dumps(positions, sort_keys=True))
+
+            conn.execute("DELETE FROM checkpoints WHERE date >= ?", (first,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO checkpoints (date, cash, positions) VALUES (?, ?, ?)",
+                [(date, c, p) for date, (c, p) in checkpoints.items()]
+            )
+            # Equity from the first touched day on was computed without these rows
+            conn.execute("DELETE FROM equity WHERE date >= ?", (first,))
+            self._set_state(conn, "replay_cursor", str(last_seq))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def states_for_days(self, days: List[str]) -> List[State]:
+        """Cash and share counts at the end of each given day (sorted ascending)."""
+        if not days:
+            return []
+        conn = self._connect()
+        _, state = self._state_on_or_before(conn, days[0])
+        changes = conn.execute(
+            "SELECT date, cash, positions FROM checkpoints WHERE date > ? AND date <= ? ORDER BY date",
+            (days[0], days[-1])
+        ).fetchall()
+        states, index = [], 0
+        for day in days:
+            while index < len(changes) and changes[index][0] <= day:
+                state = (changes[index][1], json.loads(changes[index][2]))
+                index += 1
+            states.append(state)
+        return states
+
+    def current_state(self) -> State:
+        conn = self._connect()
+        latest = conn.execute("SELECT MAX(date) FROM checkpoints").fetchone()[0]
+        return self._state_on_or_before(conn, latest or "")[1]
+
+    # ------------------------------------------------------------------
+    # Daily equity
+    # ------------------------------------------------------------------
+
+    def stored_equity(self, start: str, end: str) -> Dict[str, Tuple[float, float]]:
+        rows = self._connect().execute(
+            "SELECT date, equity, cash FROM equity WHERE date >= ? AND date <= ?", (start, end)
+        ).fetchall()
+        return {date: (equity, cash) for date, equity, cash in rows}
+
+    def store_equity(self, rows: List[Tuple[str, float, float]]) -> None:
+        if rows:
+            self._connect().executemany("INSERT OR REPLACE INTO equity (date, equity, cash) VALUES (?, ?, ?)", rows)
+
+    def first_activity_date(self) -> Optional[str]:
+        return self._connect().execute("SELECT MIN(date) FROM activities").fetchone()[0]
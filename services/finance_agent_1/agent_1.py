@@ -1,44 +1,168 @@
+import logging
 import os
+import re
+import sys
+import hashlib
+import threading
+import time
+from datetime import date
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from pydantic import BaseModel
-from agno.agent import Agent
-from agno.models.google import Gemini
-from agno.tools.yfinance import YFinanceTools
-from instructions import agent_instructions
+from instructions import agent_instructions, agent_instructions_compact
+from snapshot import snapshot_response, snapshot_symbol, stats as snapshot_stats
+from usage import run_usage, usage_stats
 
 # Load .env from parent directory (stock_m8/.env)
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-# Initialize FastAPI app
-app = FastAPI()
+# Shared StockM8 library (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import Warmup, add_health_routes, add_negotiation, cache_metrics, get_cache
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 # Get Gemini API key from environment
 gemini_api_key = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# "compact" sends about half the instruction tokens with every model call
+INSTRUCTIONS = agent_instructions_compact if os.getenv("FINANCE_INSTRUCTIONS", "full") == "compact" else agent_instructions
+# Keep the system prompt in Gemini's context cache (see gemini_cache.py)
+CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
 
 class Query(BaseModel):
     prompt: str
+    refresh: bool = False  # Pre-market briefing job: recompute and keep for BRIEFING_CACHE_TTL
+
+# The agent (and its Gemini client) is created once per worker process,
+# in the lifespan hook or on first use, never at import time
+_finance_agent = None
+_finance_agent_lock = threading.Lock()
+
+def get_finance_agent():
+    """Returns this worker's finance agent with Gemini model and YFinance tools."""
+    global _finance_agent
+    with _finance_agent_lock:
+        if _finance_agent is None:
+            # agno, google-genai and yfinance are slow to import; load them
+            # in the warm-up (or here on first use), not at module import
+            from agno.agent import Agent
+            from agno.models.google import Gemini
+            from agno.tools.yfinance import YFinanceTools
+
+            if CONTEXT_CACHE:
+                from gemini_cache import CachedPromptGemini as Gemini
 
-# Initialize finance agent with Gemini model and YFinance tools
-finance_agent = Agent(
-    name='Finance Agent',
-    model=Gemini(id='gemini-2.0-flash', api_key=gemini_api_key), 
-    tools=[
-        YFinanceTools(),
-    ],
-    instructions=agent_instructions,
-    add_history_to_context=False,  # No database configured
-    add_datetime_to_context=True,
-    debug_mode=False,
-    markdown=True,
+            _finance_agent = Agent(
+                name='Finance Agent',
+                model=Gemini(id=GEMINI_MODEL, api_key=gemini_api_key),
+                tools=[
+                    YFinanceTools(),
+                ],
+                instructions=INSTRUCTIONS,
+                add_history_to_context=False,  # No database configured
+                # The time in the system prompt would change it on every call;
+                # with the context cache the date goes into the question instead
+                add_datetime_to_context=not CONTEXT_CACHE,
+                debug_mode=False,
+                markdown=True,
+            )
+        return _finance_agent
+
+warmup = Warmup(
+    modules=["agno.agent", "agno.models.google", "agno.tools.yfinance"],
+    hooks=[("finance_agent", get_finance_agent)]
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve /healthz immediately, /readyz once the agent is built
+    warmup.start()
+    yield
+
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
+# JSON by default, MessagePack and data-only answers for the orchestrator
+add_negotiation(app)
+add_health_routes(app, warmup)
+
+# Identical questions within the TTL share one Gemini run across workers
+cache = get_cache("finance")
+ASK_CACHE_TTL = int(os.getenv("FINANCE_CACHE_TTL", "600"))
+# Analyses warmed by the orchestrator's briefing job must outlive its refresh interval
+BRIEFING_CACHE_TTL = int(os.getenv("BRIEFING_CACHE_TTL", "1800"))
+# Bare-ticker snapshots (snapshot.py): prices, so a short TTL
+SNAPSHOT_CACHE_TTL = int(os.getenv("SNAPSHOT_CACHE_TTL", "60"))
+
+# "analyze AAPL", "$AAPL outlook?", "what about AAPL" ask the same thing: one
+# cached (and pre-warmed) analysis per ticker
+TICKER_PROMPT = re.compile(
+    r"^\s*(?i:(?:please\s+)?(?:analy[sz]e|analysis\s+(?:of|for)|briefing\s+(?:for|on)|outlook\s+for|"
+    r"what\s+about|how\s+about|analysiere)\s+)?\$?([A-Z]{1,5})"
+    r"(?i:\s+(?:analysis|outlook|briefing|stock|aktie))?\s*[?!.]*\s*$"
+)
+
+def canonical_prompt(prompt: str) -> str:
+    """Single-ticker analysis requests → "Analyze TICKER", anything else unchanged."""
+    match = TICKER_PROMPT.match(prompt)
+    return f"Analyze {match.group(1)}" if match else prompt
+
+def prompt_cache_key(prompt: str) -> str:
+    """Cache key for a prompt, ignoring case and whitespace differences."""
+    normalized = " ".join(prompt.lower().split())
+    return "ask:" + hashlib.sha256(normalized.encode()).hexdigest()
+
+def run_agent(prompt: str) -> str:
+    """Runs the agent once and records tokens, cost and latency."""
+    if CONTEXT_CACHE:
+        prompt = f"{prompt}\n\n(Today is {date.today():%A, %B %d, %Y}.)"
+    started = time.monotonic()
+    try:
+        run_output = get_finance_agent().run(prompt)
+    except Exception:
+        usage_stats.record_error()
+        raise
+    usage_stats.record(run_usage(run_output, time.monotonic() - started))
+    return run_output.content
+
 @app.post("/ask")
 def ask_agent(query: Query):
     """Process user query and return agent response."""
-    response = finance_agent.run(query.prompt)
-    return {"response": response.content}
+    # Bare ticker: deterministic snapshot, no LLM (falls through if Yahoo has no data)
+    symbol = snapshot_symbol(query.prompt)
+    if symbol and not query.refresh:
+        snapshot = snapshot_response(symbol, cache, SNAPSHOT_CACHE_TTL)
+        if snapshot is not None:
+            return {"response": snapshot}
+
+    prompt = canonical_prompt(query.prompt)
+    if query.refresh:
+        content = run_agent(prompt)
+        cache.set(prompt_cache_key(prompt), content, ttl=max(ASK_CACHE_TTL, BRIEFING_CACHE_TTL))
+        return {"response": content}
+    content = cache.get_or_set(
+        prompt_cache_key(prompt),
+        lambda: run_agent(prompt),
+        ttl=ASK_CACHE_TTL,
+        lock_timeout=90  # Agent runs with tools can take a while
+    )
+    return {"response": content}
+
+@app.get("/metrics")
+def metrics():
+    """Response cache counters, snapshot fast path and LLM token/cost accounting (this worker)."""
+    return {
+        "cache": cache_metrics(),
+        "snapshots": dict(snapshot_stats),
+        "llm": {
+            "model": GEMINI_MODEL,
+            "instructions": "compact" if INSTRUCTIONS is agent_instructions_compact else "full",
+            "context_cache": CONTEXT_CACHE,
+            **usage_stats.as_dict(),
+        },
+    }
 
 # Local testing - uncomment to test directly
 if __name__ == "__main__":
@@ -48,7 +172,7 @@ if __name__ == "__main__":
     test_query = input("Enter stock ticker or question (e.g., 'AAPL'): ")
     
     print("\n⏳ Processing...\n")
-    response = finance_agent.run(test_query)
+    response = get_finance_agent().run(test_query)
     
     print("="*60)
     print(response.content)
@@ -0,0 +1,86 @@
+"""
+Gemini with the static system prompt in an explicit context cache.
+
+With GEMINI_CONTEXT_CACHE=true the instructions and tool declarations are
+uploaded once as a cached content; requests then reference it instead of
+sending them again, which cuts billed input tokens (cached tokens cost ~25%)
+and time to first token. Gemini does not allow system_instruction or tools
+next to cached_content, so both are moved into the cache entirely.
+
+The cache is created on the first request from exactly what agno would
+send, and recreated shortly before GEMINI_CACHE_TTL_SECONDS runs out or when
+the prompt changes. Gemini only caches prompts above a model-specific minimum
+size; if creation fails, requests fall back to the normal uncached path.
+
+Imported lazily (agno and google-genai are heavy), like the agent itself.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.models.google import Gemini
+from agno.utils.gemini import format_function_definitions
+from google.genai.types import CreateCachedContentConfig, GenerateContentConfig
+
+log = logging.getLogger("finance.gemini_cache")
+
+CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+RETRY_AFTER_SECONDS = 600  # after a failed creation, run uncached for a while
+
+# prompt hash → (cached content name, monotonic time to recreate it)
+_caches: Dict[str, Tuple[str, float]] = {}
+_failed: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class CachedPromptGemini(Gemini):
+    """Gemini model that sends the system prompt and tools via context caching"""
+
+    def _prompt_cache(self, system_message: Optional[str], tools: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+        digest = hashlib.sha256(
+            json.dumps([self.id, system_message, tools], sort_keys=True, default=str).encode()
+        ).hexdigest()
+        now = time.monotonic()
+        with _lock:
+            entry = _caches.get(digest)
+            if entry is not None and entry[1] > now:
+                return entry[0]
+            if _failed.get(digest, 0) > now:
+                return None
+            try:
+                declarations = format_function_definitions(tools) if tools else None
+                cached = self.get_client().caches.create(
+                    model=self.id,
+                    config=CreateCachedContentConfig(
+                        system_instruction=system_message,
+                        tools=[declarations] if declarations else None,
+                        ttl=f"{CACHE_TTL_SECONDS}s",
+                    ),
+                )
+            except Exception as e:
+                log.warning("Context cache not created, sending the prompt uncached: %s", e)
+                _failed[digest] = now + RETRY_AFTER_SECONDS
+                return None
+            # Recreate a minute early so no request references an expired cache
+            _caches[digest] = (cached.name, now + max(60, CACHE_TTL_SECONDS - 60))
+            log.info("Created context cache %s for the system prompt", cached.name)
+            return cached.name
+
+    def get_request_params(self, system_message=None, response_format=None, tools=None, tool_choice=None):
+        cache_name = self._prompt_cache(system_message, tools)
+        if cache_name is None:
+            return super().get_request_params(system_message, response_format, tools, tool_choice)
+
+        # System prompt and tools live in the cache, the request only references it
+        params = super().get_request_params(None, response_format, None, None)
+        config = params.get("config") or GenerateContentConfig()
+        config.cached_content = cache_name
+        params["config"] = config
+        return params
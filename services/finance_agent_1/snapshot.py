@@ -0,0 +1,160 @@
+"""
+Deterministic stock snapshot for bare-ticker prompts ("AAPL", "$TSLA?").
+
+For a bare ticker the agent mostly fetches the same fields with YFinanceTools
+and formats them as in instructions.py. Here they are fetched directly, cached
+per symbol and rendered in the same Telegram style in milliseconds. The LLM
+only runs when the prompt asks for more ("Analyze AAPL", "Should I buy AAPL?").
+"""
+
+import logging
+import math
+import re
+import threading
+from typing import Dict, Optional
+
+log = logging.getLogger("finance.snapshot")
+
+# Ticker alone, optionally with "price"/"quote"/"snapshot" (case matters: "hello" is no ticker)
+SNAPSHOT_PROMPT = re.compile(
+    r"^\s*\$?([A-Z]{1,5}(?:\.[A-Z])?)(?i:\s+(?:price|quote|snapshot|stock|kurs|aktie))?\s*[?!.]*\s*$"
+)
+
+# Counters for /metrics
+stats = {"served": 0, "no_data": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        stats[name] += 1
+
+
+def snapshot_symbol(prompt: str) -> Optional[str]:
+    """Ticker if the prompt asks for nothing but the stock itself, else None"""
+    match = SNAPSHOT_PROMPT.match(prompt)
+    return match.group(1) if match else None
+
+
+def _number(value) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def fetch_snapshot(symbol: str) -> Optional[Dict]:
+    """
+    Snapshot fields from Yahoo Finance (same source as the agent's YFinanceTools)
+
+    Returns None when Yahoo has no price for the symbol, the caller then
+    falls back to the agent.
+    """
+    import yfinance as yf
+
+    ticker = yf.Ticker(symbol)
+    try:
+        info = ticker.info or {}
+    except Exception as e:
+        log.warning("Snapshot for %s failed: %s", symbol, e)
+        return None
+
+    price = _number(info.get("currentPrice")) or _number(info.get("regularMarketPrice"))
+    if price is None:
+        return None
+    previous_close = _number(info.get("previousClose")) or _number(info.get("regularMarketPreviousClose"))
+    dividend_rate = _number(info.get("dividendRate"))
+
+    data = {
+        "symbol": symbol,
+        "name": info.get("shortName") or info.get("longName") or symbol,
+        "price": price,
+        "change_percent": (price / previous_close - 1) * 100 if previous_close else None,
+        "high_52w": _number(info.get("fiftyTwoWeekHigh")),
+        "low_52w": _number(info.get("fiftyTwoWeekLow")),
+        "pe_ratio": _number(info.get("trailingPE")),
+        "market_cap": _number(info.get("marketCap")),
+        "eps": _number(info.get("trailingEps")),
+        "dividend_percent": dividend_rate / price * 100 if dividend_rate else None,
+        "ratings": None,
+    }
+
+    try:
+        summary = ticker.recommendations_summary
+        if summary is not None and not summary.empty:
+            row = summary.iloc[0]
+            data["ratings"] = {
+                key: int(row.get(key, 0) or 0) for key in ("strongBuy", "buy", "hold", "sell", "strongSell")
+            }
+    except Exception as e:
+        log.info("No analyst ratings for %s: %s", symbol, e)
+    return data
+
+
+def _money(value: Optional[float]) -> str:
+    return f"${value:,.2f}" if value is not None else "n/a"
+
+
+def _large_money(value: Optional[float]) -> str:
+    if value is None:
+        return "n/a"
+    for limit, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if value >= limit:
+            return f"${value / limit:.2f}{suffix}"
+    return f"${value:,.0f}"
+
+
+def format_snapshot(data: Dict) -> str:
+    """Market snapshot, financial health and analyst ratings as in instructions.py"""
+    change = data["change_percent"]
+    if change is None:
+        change_line = "📈 Change: n/a"
+    else:
+        change_line = f"{'📈' if change >= 0 else '📉'} Change: {change:+.2f}% {'🟢' if change >= 0 else '🔴'}"
+
+    pe = f"{data['pe_ratio']:.2f}" if data["pe_ratio"] is not None else "n/a"
+    dividend = f"{data['dividend_percent']:.2f}%" if data["dividend_percent"] is not None else "none"
+    sections = [
+        f"📊 {data['symbol']} - {data['name']}",
+        "💹 MARKET SNAPSHOT\n\n"
+        f"💰 Price: {_money(data['price'])}\n"
+        f"📊 52W High: {_money(data['high_52w'])}\n"
+        f"📉 52W Low: {_money(data['low_52w'])}\n"
+        f"{change_line}",
+        "💼 FINANCIAL HEALTH\n\n"
+        f"• P/E Ratio: {pe}\n"
+        f"• Market Cap: {_large_money(data['market_cap'])}\n"
+        f"• EPS: {_money(data['eps'])}\n"
+        f"• Dividend: {dividend}",
+    ]
+
+    ratings = data.get("ratings")
+    total = sum(ratings.values()) if ratings else 0
+    if total:
+        lines = [
+            ("🟢 Strong Buy", ratings["strongBuy"]),
+            ("🟡 Buy", ratings["buy"]),
+            ("⚪ Hold", ratings["hold"]),
+            ("🔴 Sell", ratings["sell"] + ratings["strongSell"]),
+        ]
+        sections.append("🎯 ANALYST RATINGS\n\n" + "\n".join(
+            f"{label}: {count} ({count / total:.0%})" for label, count in lines
+        ))
+
+    sections += [
+        f"💡 For an AI analysis with verdict ask: Analyze {data['symbol']}",
+        "⚠️ Disclaimer: For informational purposes only. Markets are volatile. Always do your own research.",
+        "🤖 Powered by StockM8",
+    ]
+    return "\n\n".join(sections)
+
+
+def snapshot_response(symbol: str, cache, ttl: float) -> Optional[str]:
+    """Formatted snapshot, fetched at most once per `ttl` across workers; None without data"""
+    data = cache.get_or_set(f"snapshot:{symbol}", lambda: fetch_snapshot(symbol), ttl=ttl)
+    if data is None:
+        _count("no_data")
+        return None
+    _count("served")
+    return format_snapshot(data)
@@ -0,0 +1,117 @@
+"""
+Token, cost and latency accounting for finance agent runs.
+
+One run is several model calls: the first sees the system prompt and the
+question, every tool round trip sends all of it again plus the tool results.
+Per run we count
+
+    prompt_tokens      system prompt + question, once per model call
+    tool_tokens        tool calls and results sent back to the model
+    completion_tokens  generated text (including thinking tokens)
+    cached_tokens      input served from Gemini's context cache (cheaper)
+
+and price them with GEMINI_*_PRICE_PER_M (USD per million tokens, defaults
+are gemini-2.0-flash list prices).
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+log = logging.getLogger("finance.usage")
+
+INPUT_PRICE_PER_M = float(os.getenv("GEMINI_INPUT_PRICE_PER_M", "0.10"))
+CACHED_INPUT_PRICE_PER_M = float(os.getenv("GEMINI_CACHED_INPUT_PRICE_PER_M", "0.025"))
+OUTPUT_PRICE_PER_M = float(os.getenv("GEMINI_OUTPUT_PRICE_PER_M", "0.40"))
+
+TOKEN_FIELDS = ("prompt_tokens", "tool_tokens", "completion_tokens", "cached_tokens")
+
+
+def run_usage(run_output, seconds: float) -> Dict:
+    """Token split, tool calls, cost and latency of one agent run"""
+    calls = [m.metrics for m in (run_output.messages or []) if m.role == "assistant" and m.metrics]
+    calls = [metrics for metrics in calls if metrics.input_tokens or metrics.output_tokens]
+    if calls:
+        input_tokens = sum(metrics.input_tokens for metrics in calls)
+        prompt_tokens = min(calls[0].input_tokens * len(calls), input_tokens)
+        completion_tokens = sum(metrics.output_tokens for metrics in calls)
+        cached_tokens = sum(metrics.cache_read_tokens for metrics in calls)
+    else:
+        # Per-message metrics missing: only the run total is known
+        metrics = run_output.metrics
+        input_tokens = prompt_tokens = metrics.input_tokens if metrics else 0
+        completion_tokens = metrics.output_tokens if metrics else 0
+        cached_tokens = metrics.cache_read_tokens if metrics else 0
+
+    cost = (
+        (input_tokens - cached_tokens) * INPUT_PRICE_PER_M
+        + cached_tokens * CACHED_INPUT_PRICE_PER_M
+        + completion_tokens * OUTPUT_PRICE_PER_M
+    ) / 1_000_000
+    return {
+        "prompt_tokens": prompt_tokens,
+        "tool_tokens": input_tokens - prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "model_calls": len(calls) or 1,
+        "tool_calls": len(run_output.tools or []),
+        "cost_usd": cost,
+        "seconds": seconds,
+    }
+
+
+class UsageStats:
+    """Totals since start plus latency percentiles of the last runs (per worker)"""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.runs = 0
+        self.errors = 0
+        self.totals = dict.fromkeys(TOKEN_FIELDS + ("model_calls", "tool_calls"), 0)
+        self.cost_usd = 0.0
+
+    def record(self, usage: Dict) -> None:
+        with self._lock:
+            self.runs += 1
+            for field in self.totals:
+                self.totals[field] += usage[field]
+            self.cost_usd += usage["cost_usd"]
+            self._latencies.append(usage["seconds"])
+        log.info(
+            "run prompt=%d tool=%d completion=%d cached=%d calls=%d tools=%d cost=$%.5f seconds=%.1f",
+            usage["prompt_tokens"], usage["tool_tokens"], usage["completion_tokens"], usage["cached_tokens"],
+            usage["model_calls"], usage["tool_calls"], usage["cost_usd"], usage["seconds"],
+        )
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def _latency(self, latencies: list, quantile: float) -> Optional[float]:
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(quantile * len(latencies)))], 2)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            runs = self.runs
+            totals = dict(self.totals)
+            cost = self.cost_usd
+            errors = self.errors
+        return {
+            "runs": runs,
+            "errors": errors,
+            **totals,
+            "cost_usd": round(cost, 5),
+            "avg_tokens_per_run": round(sum(totals[f] for f in TOKEN_FIELDS[:3]) / runs) if runs else None,
+            "avg_cost_usd_per_run": round(cost / runs, 6) if runs else None,
+            "latency_p50_seconds": self._latency(latencies, 0.5),
+            "latency_p95_seconds": self._latency(latencies, 0.95),
+        }
+
+
+usage_stats = UsageStats()
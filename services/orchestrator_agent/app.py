@@ -1,28 +1,74 @@
+import hashlib
+import logging
 import os
 import re
+import sys
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from typing import Optional, Dict, List, Callable
+from typing import Optional, Dict, List, Callable, Tuple
 
 # Load environment variables
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-app = FastAPI(title="Master Orchestrator Agent")
+# Shared StockM8 library (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import (
+    COMPACT_ACCEPT, DATA_ONLY_HEADERS, CircuitBreaker, CircuitOpenError, Warmup, add_health_routes, decode_response, get_cache,
+    hedge_metrics, hedged_call
+)
+from stockm8_common.messages import chart_links_message, comparison_message, intraday_message
+from briefing import BriefingScheduler
+from classifier import classifier
+from context import (
+    CACHEABLE_INTENTS, is_follow_up, load_context, save_context,
+    resolve_references, result_key, cached_result, remember, forget_results
+)
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger("orchestrator.routing")
+
+# The orchestrator has no heavy imports; readiness only confirms startup ran
+warmup = Warmup()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    # Pre-market cache warming for BRIEFING_WATCHLIST (one worker per run)
+    briefing.start()
+    yield
+    briefing.stop()
+
+app = FastAPI(title="Master Orchestrator Agent", lifespan=lifespan)
+add_health_routes(app, warmup)
 
 # Expert agent endpoints (Docker internal network)
 EXPERT_URLS = {
     "finance": "http://agent-01:80/ask",
     "chart": "http://stock-chart-agent:80/chart-links",
+    "intraday": "http://stock-chart-agent:80/intraday",
     "portfolio": "http://alpaca-account:80/account-info",
     "comparison": "http://stock-comparison:80/compare",
     "market_order": "http://stock-ordering:80/order/market",
     "limit_order": "http://stock-ordering:80/order/limit",
+    "stop_order": "http://stock-ordering:80/order/stop",
+    "stop_limit_order": "http://stock-ordering:80/order/stop-limit",
+    "trailing_stop_order": "http://stock-ordering:80/order/trailing-stop",
+    "bracket_order": "http://stock-ordering:80/order/bracket",
+    "oco_order": "http://stock-ordering:80/order/oco",
+    "rule": "http://stock-ordering:80/rules",
     "market_status": "http://stock-ordering:80/market-status"
 }
 
+briefing = BriefingScheduler(EXPERT_URLS, get_cache("orchestrator-briefing"))
+
 # Company name to ticker symbol mapping
 COMPANY_TO_TICKER = {
     "apple": "AAPL", "tesla": "TSLA", "microsoft": "MSFT",
@@ -39,12 +85,58 @@ INTENT_PATTERNS = {
     "portfolio": ["portfolio", "account", "balance", "positions", "holdings", "my stocks"],
     "comparison": ["compare", "vs", "versus", "against", "better than", "vergleich", "oder"],
     "ordering": ["buy", "sell", "purchase", "kaufe", "verkaufe"],
-    "chart": ["chart", "graph", "visualize", "show", "price", "diagramm"]
+    "chart": ["chart", "graph", "visualize", "show", "price", "diagramm", "today", "heute", "intraday"]
 }
 
+# Local classifier (classifier.py) for messages without intent keywords:
+# route only confident predictions, everything else goes to the AI agent
+CLASSIFIER_MIN_SCORE = float(os.getenv("CLASSIFIER_MIN_SCORE", "0.2"))
+CLASSIFIER_MIN_MARGIN = float(os.getenv("CLASSIFIER_MIN_MARGIN", "0.05"))
+SYMBOLS_NEEDED = {"chart": 1, "comparison": 2}
+NOT_TICKERS = {"I", "A"}  # "Can I trade now?" is not about a stock called I
+
+# Chart requests with these words get today's session instead of daily links
+INTRADAY_KEYWORDS = ["today", "heute", "intraday"]
+
+# Order modifiers (regex alternatives), e.g. "5% stop", "take profit at 220", "trailing 3%"
+TRAILING_KEYWORDS = r"trailing[- ]?stop|trailing|trail"
+TAKE_PROFIT_KEYWORDS = r"take[- ]?profit|target|ziel|tp"
+STOP_KEYWORDS = r"stop[- ]?loss|stop"
+
+# Conditional and scheduled orders, e.g. "if it drops below 180", "every monday at 9:35"
+RULE_PRICE_PATTERN = r'\b(?:if|when|once|wenn|falls|sobald)\b[^$\d]*?\b(below|under|unter|above|over|über)\s*\$?\s*(\d+(?:\.\d+)?)'
+RULE_SCHEDULE_PATTERN = (
+    r'\b(?:every|each|jeden|jede)\s+(day|tag|weekday|werktag|monday|tuesday|wednesday|thursday|friday|'
+    r'montag|dienstag|mittwoch|donnerstag|freitag)\b'
+)
+RULE_TIME_PATTERN = r'\b(?:at|um)\s+(\d{1,2}:\d{2})\b'
+RULE_DAY_ALIASES = {"tag": "day", "werktag": "weekday"}
+
+# Circuit breakers: calls slower than this count as failures (the AI agent is slow by nature)
+EXPERT_SLOW_SECONDS = float(os.getenv("EXPERT_SLOW_SECONDS", "5"))
+FINANCE_SLOW_SECONDS = float(os.getenv("FINANCE_SLOW_SECONDS", "20"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+
+# Idempotent reads are hedged: a second request goes out when the first is
+# slower than the expert's recent p95 (HEDGE_DELAY_SECONDS until that is known)
+HEDGED_EXPERTS = {"chart", "intraday", "comparison", "market_status"}
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "1.0"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.2"))
+
+# Experts answer in MessagePack; these send data only and the message is
+# rendered here (stockm8_common.messages), the rest still send their text
+DATA_ONLY_EXPERTS = {"chart", "intraday", "comparison"}
+EXPERT_DATA_ONLY = os.getenv("EXPERT_DATA_ONLY", "true").lower() == "true"
+
+# Last good answer per question, served when an expert fails
+FALLBACK_TTL = int(os.getenv("EXPERT_FALLBACK_TTL_SECONDS", str(6 * 3600)))
+fallback_cache = get_cache("orchestrator-fallback")
+DEGRADED_AGENTS = {"orchestrator_validation", "expert_unavailable", "cached_fallback"}
+
 
 class UserRequest(BaseModel):
     message: str
+    chat_id: Optional[str] = None  # Telegram/WhatsApp chat; enables follow-up questions
 
 
 class OrchestratorResponse(BaseModel):
@@ -74,10 +166,10 @@ def extract_stock_symbols(user_message: str) -> List[str]:
     return list(set(found_symbols))
 
 
-def extract_quantity(user_message: str) -> int:
-    """Extract quantity from message, default to 1"""
-    match = re.search(r'\b(\d+)\b', user_message)
-    return int(match.group(1)) if match else 1
+def extract_quantity(user_message: str) -> float:
+    """Extract quantity from message (fractional shares allowed), default to 1"""
+    match = re.search(r'\b(\d+(?:\.\d+)?)\b', user_message)
+    return float(match.group(1)) if match else 1
 
 
 def extract_price(user_message: str) -> Optional[float]:
@@ -96,6 +188,153 @@ def extract_price(user_message: str) -> Optional[float]:
     return None
 
 
+def extract_notional(message: str) -> Tuple[Optional[float], str]:
+    """Extract a dollar amount like '$500 of NVDA' or '500 dollars worth'; returns (amount, rest of message)"""
+    patterns = [
+        r'\$\s*(\d+(?:\.\d+)?)\s+(?:of|worth|in|an|von)\b',
+        r'(\d+(?:\.\d+)?)\s*(?:\$|usd|dollars?)\s+(?:of|worth|in|an|von)\b'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, message)
+        if match:
+            return float(match.group(1)), message[:match.start()] + " " + message[match.end():]
+    return None, message
+
+
+def extract_level(message: str, keywords: str) -> Tuple[Optional[Tuple[str, float]], str]:
+    """
+    Extract a price level after/before a keyword; returns (level, rest of message)
+
+    '5% stop' → ("percent", 5.0), 'stop at 180' → ("price", 180.0), 'stop 3%' → ("percent", 3.0)
+    """
+    patterns = [
+        rf'(\d+(?:\.\d+)?)\s*%\s*(?:{keywords})\b',
+        rf'\b(?:{keywords})\s*(?:at|of|@|bei|von|auf)?\s*\$?\s*(\d+(?:\.\d+)?)\s*(%)?'
+    ]
+    for index, pattern in enumerate(patterns):
+        match = re.search(pattern, message)
+        if match:
+            is_percent = index == 0 or bool(match.group(2))
+            level = ("percent" if is_percent else "price", float(match.group(1)))
+            return level, message[:match.start()] + " " + message[match.end():]
+    return None, message
+
+
+def level_fields(level: Optional[Tuple[str, float]], price_field: str, percent_field: str) -> Dict:
+    """("percent", 5.0) → {percent_field: 5.0}, ("price", 180.0) → {price_field: 180.0}"""
+    if level is None:
+        return {}
+    kind, value = level
+    return {percent_field if kind == "percent" else price_field: value}
+
+
+def parse_order(user_message: str, symbol: str) -> Tuple[str, Dict]:
+    """
+    Work out order type and payload from a chat message
+
+    Examples:
+        "Buy 5 AAPL"                          → market_order
+        "Buy $500 of NVDA"                    → market_order (notional)
+        "Buy 5 AAPL at $150"                  → limit_order
+        "Buy $500 of NVDA with 5% stop"       → bracket_order (OTO with stop loss)
+        "Buy 10 AMD stop loss 150 target 190" → bracket_order
+        "Sell 10 AAPL take profit 220 stop 180" → oco_order
+        "Sell 10 AAPL stop 180 limit 178"     → stop_limit_order
+        "Sell 5 TSLA trailing stop 3%"        → trailing_stop_order
+    """
+    side = extract_order_side(user_message)
+    text = user_message.lower()
+
+    # Pull modifiers out first so their numbers aren't read as quantity or limit price
+    trailing, text = extract_level(text, TRAILING_KEYWORDS)
+    take_profit, text = extract_level(text, TAKE_PROFIT_KEYWORDS)
+    stop, text = extract_level(text, STOP_KEYWORDS)
+    limit_match = re.search(r'\blimit\s*(?:at|@|bei)?\s*\$?\s*(\d+(?:\.\d+)?)', text)
+    if limit_match:
+        text = text[:limit_match.start()] + " " + text[limit_match.end():]
+    notional, text = extract_notional(text)
+    limit_price = float(limit_match.group(1)) if limit_match else extract_price(text)
+
+    payload = {"symbol": symbol, "side": side}
+    if notional is not None and limit_price is None:
+        payload["notional"] = notional
+    elif notional is not None:
+        payload["qty"] = round(notional / limit_price, 4)
+    else:
+        payload["qty"] = extract_quantity(text)
+
+    if trailing is not None:
+        payload.pop("notional", None)
+        payload.setdefault("qty", 1)
+        return "trailing_stop_order", {**payload, **level_fields(trailing, "trail_price", "trail_percent")}
+
+    exits = {
+        **level_fields(take_profit, "take_profit", "take_profit_percent"),
+        **level_fields(stop, "stop_loss", "stop_loss_percent")
+    }
+    # A buy stop is a protective exit unless it reads like a plain stop entry ("buy 10 AMD stop 150")
+    protective = take_profit is not None or (
+        stop is not None and (stop[0] == "percent" or re.search(r'\b(?:with|mit|and|und)\b|stop[- ]?loss', text))
+    )
+
+    if side == "buy" and protective:
+        if limit_price is not None:
+            payload["limit_price"] = limit_price
+        return "bracket_order", {**payload, **exits}
+
+    if side == "sell" and take_profit is not None and stop is not None:
+        payload.pop("notional", None)
+        payload.setdefault("qty", 1)
+        return "oco_order", {**payload, **exits}
+
+    if side == "sell" and take_profit is not None and take_profit[0] == "price":
+        return "limit_order", {**payload, "limit_price": take_profit[1]}
+
+    if stop is not None:
+        payload.pop("notional", None)
+        payload.setdefault("qty", 1)
+        stop_fields = level_fields(stop, "stop_price", "stop_percent")
+        if limit_price is not None and "stop_price" in stop_fields:
+            return "stop_limit_order", {**payload, **stop_fields, "limit_price": limit_price}
+        return "stop_order", {**payload, **stop_fields}
+
+    if limit_price is not None:
+        return "limit_order", {**payload, "limit_price": limit_price}
+    return "market_order", payload
+
+
+def parse_rule(user_message: str, symbol: str) -> Optional[Dict]:
+    """
+    Detect conditional or scheduled orders; returns a /rules payload or None
+
+    Examples:
+        "Buy AAPL if it drops below 180"    → {"trigger": "price_below", "price": 180, ...}
+        "Sell 5 TSLA when it rises above 300" → {"trigger": "price_above", "price": 300, ...}
+        "Buy 1 SPY every Monday at 9:35"    → {"trigger": "schedule", "every": "monday", "at": "9:35", ...}
+    """
+    text = user_message.lower()
+    match = re.search(RULE_PRICE_PATTERN, text)
+    if match:
+        direction = "price_below" if match.group(1) in ("below", "under", "unter") else "price_above"
+        trigger = {"trigger": direction, "price": float(match.group(2))}
+    else:
+        match = re.search(RULE_SCHEDULE_PATTERN, text)
+        if not match:
+            return None
+        trigger = {"trigger": "schedule", "every": RULE_DAY_ALIASES.get(match.group(1), match.group(1))}
+    rest = text[:match.start()] + " " + text[match.end():]
+
+    # "at 9:35" must not be read as a limit price
+    time_match = re.search(RULE_TIME_PATTERN, rest)
+    if time_match and trigger["trigger"] == "schedule":
+        trigger["at"] = time_match.group(1)
+        rest = rest[:time_match.start()] + " " + rest[time_match.end():]
+
+    _, payload = parse_order(rest, symbol)
+    order_fields = {k: v for k, v in payload.items() if k in ("symbol", "side", "qty", "notional", "limit_price")}
+    return {**order_fields, **trigger}
+
+
 def extract_order_side(user_message: str) -> str:
     """Determine buy or sell"""
     buy_keywords = ["buy", "purchase", "kaufe"]
@@ -129,15 +368,112 @@ def detect_intent(user_message: str) -> str:
     return "finance"  # Default: AI agent
 
 
+def classify_intent(user_message: str) -> Tuple[str, float]:
+    """
+    Local classifier for messages the patterns miss
+    Returns: (intent or 'finance' if not confident, classifier score)
+    """
+    intent, score, margin = classifier.classify(user_message)
+    if score < CLASSIFIER_MIN_SCORE or margin < CLASSIFIER_MIN_MARGIN:
+        return "finance", score
+    symbols = [s for s in extract_stock_symbols(user_message) if s not in NOT_TICKERS]
+    if len(symbols) < SYMBOLS_NEEDED.get(intent, 0):
+        # "How is the market doing?" is no chart request without a stock
+        return "finance", score
+    return intent, score
+
+
+# How messages were routed (GET /health)
+routing_stats = {"keywords": 0, "context": 0, "classifier": 0, "llm": 0}
+_routing_lock = threading.Lock()
+
+
+def log_route(user_message: str, intent: str, source: str, score: Optional[float] = None) -> None:
+    with _routing_lock:
+        routing_stats[source] += 1
+    confidence = f"{score:.2f}" if score is not None else "-"
+    # Chat text (orders, holdings) stays out of INFO logs; the hash still groups repeated messages
+    digest = hashlib.blake2b(user_message.encode("utf-8"), digest_size=4).hexdigest()
+    log.info("route intent=%s source=%s confidence=%s message_hash=%s", intent, source, confidence, digest)
+    log.debug("route message_hash=%s message=%r", digest, user_message)
+
+
+# ============================================================================
+# EXPERT CALLS (circuit breakers + hedged requests)
+# ============================================================================
+
+# One breaker per expert service (the ordering agent serves several URLs)
+breakers: Dict[str, CircuitBreaker] = {}
+for expert_name, expert_url in EXPERT_URLS.items():
+    host = urlsplit(expert_url).netloc
+    if host not in breakers:
+        slow = FINANCE_SLOW_SECONDS if expert_name == "finance" else EXPERT_SLOW_SECONDS
+        breakers[host] = CircuitBreaker(host, slow_call_seconds=slow, open_seconds=BREAKER_OPEN_SECONDS)
+
+
+def call_expert(name: str, payload: Optional[Dict] = None, timeout: float = 10) -> requests.Response:
+    """
+    GET (without payload) or POST to an expert through its circuit breaker
+    
+    While the breaker is open this fails immediately with CircuitOpenError
+    (a RequestException) instead of waiting for the timeout. Server errors
+    count as failures; client errors (e.g. 422) are returned to the handler.
+    """
+    url = EXPERT_URLS[name]
+    breaker = breakers[urlsplit(url).netloc]
+    headers = DATA_ONLY_HEADERS if EXPERT_DATA_ONLY and name in DATA_ONLY_EXPERTS else COMPACT_ACCEPT
+    
+    def send() -> requests.Response:
+        if payload is None:
+            response = requests.get(url, headers=headers, timeout=timeout)
+        else:
+            response = requests.post(url, json=payload, headers=headers, timeout=timeout)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+    
+    if name in HEDGED_EXPERTS:
+        delay = max(breaker.latency(0.95) or HEDGE_DELAY_SECONDS, HEDGE_MIN_DELAY_SECONDS)
+        return breaker.call(lambda: hedged_call(send, delay))
+    return breaker.call(send)
+
+
+def order_never_sent(error: Exception) -> bool:
+    """Open circuit or no connection (incl. connect timeout): the order never reached the ordering agent"""
+    return isinstance(error, (CircuitOpenError, requests.exceptions.ConnectionError))
+
+
+def degraded_response(intent: str, key: Optional[str], error: Exception) -> OrchestratorResponse:
+    """Answer when an expert fails: last good answer to the same question, else a short notice"""
+    saved = fallback_cache.get(key) if key else None
+    if saved is not None:
+        saved_at, answer = saved
+        minutes = max(1, round((time.time() - saved_at) / 60))
+        return OrchestratorResponse(
+            response=f"⚠️ Live data is unavailable right now, this answer is from {minutes} min ago:\n\n{answer['response']}",
+            agent_used="cached_fallback",
+            extracted_data=answer.get("extracted_data")
+        )
+    if intent == "ordering" and order_never_sent(error):
+        text = "❌ The ordering service is not responding. Your order was NOT placed, please try again in a minute."
+    elif intent == "ordering":
+        # Timeout or 5xx after the request went out: the order may have been placed
+        text = ("⚠️ The ordering service did not confirm your order, its status is unknown. "
+                "Please check your orders (/orders) before trying again.")
+    else:
+        text = f"❌ The {intent.replace('_', ' ')} service is not responding. Please try again in a minute."
+    return OrchestratorResponse(response=text, agent_used="expert_unavailable")
+
+
 # ============================================================================
 # AGENT HANDLERS (Strategy Pattern)
 # ============================================================================
 
 def handle_market_status(user_message: str) -> OrchestratorResponse:
     """Handle market status request"""
-    response = requests.get(EXPERT_URLS["market_status"], timeout=10)
+    response = call_expert("market_status")
     response.raise_for_status()
-    result = response.json()
+    result = decode_response(response)
     
     return OrchestratorResponse(
         response=result["formatted_message"],
@@ -147,9 +483,9 @@ def handle_market_status(user_message: str) -> OrchestratorResponse:
 
 def handle_portfolio(user_message: str) -> OrchestratorResponse:
     """Handle portfolio request"""
-    response = requests.get(EXPERT_URLS["portfolio"], timeout=10)
+    response = call_expert("portfolio")
     response.raise_for_status()
-    result = response.json()
+    result = decode_response(response)
     
     return OrchestratorResponse(
         response=result["formatted_message"],
@@ -167,16 +503,12 @@ def handle_comparison(user_message: str) -> OrchestratorResponse:
             agent_used="orchestrator_validation"
         )
     
-    response = requests.post(
-        EXPERT_URLS["comparison"],
-        json={"symbol1": symbols[0], "symbol2": symbols[1]},
-        timeout=10
-    )
+    response = call_expert("comparison", {"symbol1": symbols[0], "symbol2": symbols[1]})
     response.raise_for_status()
-    result = response.json()
+    result = decode_response(response)
     
     return OrchestratorResponse(
-        response=result["formatted_message"],
+        response=result.get("formatted_message") or comparison_message(result),
         agent_used="comparison_agent",
         extracted_data={"symbols": symbols[:2]}
     )
@@ -192,16 +524,23 @@ def handle_chart(user_message: str) -> OrchestratorResponse:
             agent_used="orchestrator_validation"
         )
     
-    response = requests.post(
-        EXPERT_URLS["chart"],
-        json={"symbol": symbols[0]},
-        timeout=10
-    )
+    message_lower = user_message.lower()
+    if any(keyword in message_lower for keyword in INTRADAY_KEYWORDS):
+        response = call_expert("intraday", {"symbol": symbols[0], "timeframe": "5Min"})
+        response.raise_for_status()
+        result = decode_response(response)
+        return OrchestratorResponse(
+            response=result.get("formatted_message") or intraday_message(result),
+            agent_used="chart_agent",
+            extracted_data={"symbol": symbols[0], "timeframe": "5Min"}
+        )
+    
+    response = call_expert("chart", {"symbol": symbols[0]})
     response.raise_for_status()
-    result = response.json()
+    result = decode_response(response)
     
     return OrchestratorResponse(
-        response=result["formatted_message"],
+        response=result.get("formatted_message") or chart_links_message(result),
         agent_used="chart_agent",
         extracted_data={"symbol": symbols[0]}
     )
@@ -216,41 +555,46 @@ def handle_ordering(user_message: str) -> OrchestratorResponse:
             response="❌ Which stock? Example: 'Buy 5 AAPL'",
             agent_used="orchestrator_validation"
         )
+    if len(symbols) > 1:
+        # One order per message: "buy 5 of those" must not pick one at random
+        return OrchestratorResponse(
+            response=f"❌ One stock per order please: {' or '.join(sorted(symbols))}? Example: 'Buy 5 AAPL'",
+            agent_used="orchestrator_validation"
+        )
     
     symbol = symbols[0]
-    qty = extract_quantity(user_message)
-    side = extract_order_side(user_message)
-    limit_price = extract_price(user_message)
     
-    # Choose endpoint based on price
-    endpoint = EXPERT_URLS["limit_order"] if limit_price else EXPERT_URLS["market_order"]
-    payload = {"symbol": symbol, "qty": qty, "side": side}
+    # Conditional/scheduled orders go to the rule engine, everything else is
+    # routed by price, stops, targets and dollar amounts
+    rule = parse_rule(user_message, symbol)
+    if rule is not None:
+        order_kind, payload = "rule", rule
+    else:
+        order_kind, payload = parse_order(user_message, symbol)
     
-    if limit_price:
-        payload["limit_price"] = limit_price
-    
-    response = requests.post(endpoint, json=payload, timeout=10)
+    response = call_expert(order_kind, payload)
+    if 400 <= response.status_code < 500:
+        # Rejected by the pre-trade checks or by Alpaca: the order does not exist
+        return OrchestratorResponse(
+            response=decode_response(response, {}).get("detail", "❌ Order rejected"),
+            agent_used="pretrade_validation",
+            extracted_data=payload
+        )
     response.raise_for_status()
-    result = response.json()
-    
-    agent_type = "limit_order_agent" if limit_price else "market_order_agent"
+    result = decode_response(response)
     
     return OrchestratorResponse(
         response=result["formatted_message"],
-        agent_used=agent_type,
+        agent_used=f"{order_kind}_agent",
         extracted_data=payload
     )
 
 
 def handle_finance(user_message: str) -> OrchestratorResponse:
     """Handle general finance/AI request"""
-    response = requests.post(
-        EXPERT_URLS["finance"],
-        json={"prompt": user_message},
-        timeout=30
-    )
+    response = call_expert("finance", {"prompt": user_message}, timeout=30)
     response.raise_for_status()
-    result = response.json()
+    result = decode_response(response)
     
     return OrchestratorResponse(
         response=result.get("response", result.get("formatted_message", "No response")),
@@ -272,6 +616,141 @@ INTENT_HANDLERS: Dict[str, Callable[[str], OrchestratorResponse]] = {
 }
 
 
+# ============================================================================
+# MULTI-INTENT MESSAGES
+# ============================================================================
+
+# "show my portfolio and compare AAPL vs MSFT" → two sub-requests
+PART_SEPARATORS = r'\s*(?:;|,(?!\d)|\band then\b|\band also\b|\bthen\b|\band\b|\bund\b|\bdann\b|\bplus\b)\s*'
+MAX_PARTS = int(os.getenv("ORCHESTRATOR_MAX_PARTS", "4"))
+FOOTER = "🤖 Powered by StockM8"
+
+# Sub-requests run in parallel on this pool (the endpoint itself runs in FastAPI's pool)
+dispatch_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("ORCHESTRATOR_DISPATCH_THREADS", "16")),
+    thread_name_prefix="expert-dispatch"
+)
+
+
+def split_intents(user_message: str) -> List[str]:
+    """
+    Split a message into sub-requests on conjunctions
+    
+    A piece without an intent of its own stays with the previous one, so
+    "Compare AAPL and TSLA" and "Sell 10 AAPL take profit 220 and stop 180"
+    remain single requests.
+    """
+    # Pieces at even positions, the separators between them at odd positions
+    tokens = re.split(f"({PART_SEPARATORS})", user_message.strip(), flags=re.IGNORECASE)
+    parts = []
+    for i in range(0, len(tokens), 2):
+        piece = tokens[i]
+        if not piece:
+            continue
+        piece_lower = piece.lower()
+        has_intent = any(keyword in piece_lower for keywords in INTENT_PATTERNS.values() for keyword in keywords)
+        if parts and (not has_intent or len(parts) == MAX_PARTS):
+            # Keep the original wording: "AMD, INTC", "take profit 220 and stop 180"
+            parts[-1] = f"{parts[-1]}{tokens[i - 1]}{piece}"
+        else:
+            parts.append(piece)
+    return parts or [user_message]
+
+
+def plan_part(user_message: str, context: Dict) -> Tuple[str, str, Optional[str]]:
+    """
+    Resolve references and detect the intent of one (sub-)request
+    
+    Returns (resolved message, intent, result key or None if not reusable)
+    """
+    follow_up = is_follow_up(user_message)
+    
+    # "compare it with MSFT" / "buy 5 of those" → fill in the last symbols
+    message_lower = user_message.lower()
+    wants_comparison = any(keyword in message_lower for keyword in INTENT_PATTERNS["comparison"])
+    needed = 2 if wants_comparison or (follow_up and context["intent"] == "comparison") else 1
+    resolved = resolve_references(user_message, extract_stock_symbols(user_message), needed, context)
+    
+    intent = detect_intent(resolved)
+    if intent != "finance":
+        log_route(resolved, intent, "keywords")
+    elif follow_up and context["intent"]:
+        # "and TSLA?" after a chart request → another chart
+        intent = context["intent"]
+        log_route(resolved, intent, "context")
+    else:
+        # No keywords: cheap local classifier before the LLM
+        intent, score = classify_intent(resolved)
+        log_route(resolved, intent, "classifier" if intent != "finance" else "llm", score)
+    
+    key = result_key(intent, resolved) if intent in CACHEABLE_INTENTS else None
+    return resolved, intent, key
+
+
+def run_part(resolved: str, intent: str, key: Optional[str], context: Dict) -> OrchestratorResponse:
+    # Same question again within the chat → answer from the context
+    cached = cached_result(context, key) if key else None
+    if cached is not None:
+        return OrchestratorResponse(**cached)
+    
+    # Get handler function and execute (ONE LINE!)
+    handler = INTENT_HANDLERS.get(intent, handle_finance)
+    try:
+        result = handler(resolved)
+    except requests.exceptions.RequestException as e:
+        # Expert down, slow or its circuit is open → answer without it
+        return degraded_response(intent, key, e)
+    
+    if key and result.agent_used not in DEGRADED_AGENTS:
+        fallback_cache.set(key, [time.time(), result.model_dump()], ttl=FALLBACK_TTL)
+    return result
+
+
+def record_part(context: Dict, resolved: str, intent: str, key: Optional[str], result: OrchestratorResponse) -> None:
+    """Remember symbols, intent and answer of a successful (sub-)request"""
+    if result.agent_used in DEGRADED_AGENTS:
+        return
+    data = result.extracted_data or {}
+    symbols = data.get("symbols") or ([data["symbol"]] if data.get("symbol") else extract_stock_symbols(resolved))
+    remember(context, intent, symbols, key, result.model_dump())
+
+
+def dispatch_parts(plans: List[Tuple[str, str, Optional[str]]], context: Dict) -> List[OrchestratorResponse]:
+    """
+    Run sub-requests concurrently, so the reply takes as long as the slowest expert
+    
+    Portfolio requests wait for orders in the same message, otherwise they
+    would show the account before the order.
+    """
+    has_orders = any(intent == "ordering" for _, intent, _ in plans)
+    if has_orders:
+        forget_results(context)
+    after_orders = [i for i, (_, intent, _) in enumerate(plans) if has_orders and intent == "portfolio"]
+    waves = [[i for i in range(len(plans)) if i not in after_orders], after_orders]
+    
+    # A failing expert only degrades its own part (see run_part)
+    results: List[Optional[OrchestratorResponse]] = [None] * len(plans)
+    for wave in waves:
+        futures = {i: dispatch_pool.submit(run_part, *plans[i], context) for i in wave}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
+
+
+def merge_responses(plans: List[Tuple[str, str, Optional[str]]], results: List[OrchestratorResponse]) -> OrchestratorResponse:
+    """One reply for all sub-requests (footer only once, at the end)"""
+    texts = [result.response.strip() for result in results]
+    texts = [text[:-len(FOOTER)].rstrip() if text.endswith(FOOTER) else text for text in texts]
+    return OrchestratorResponse(
+        response="\n\n".join(texts) + f"\n\n{FOOTER}",
+        agent_used="+".join(result.agent_used for result in results),
+        extracted_data={"parts": [
+            {"message": resolved, "agent_used": result.agent_used, "extracted_data": result.extracted_data}
+            for (resolved, _, _), result in zip(plans, results)
+        ]}
+    )
+
+
 # ============================================================================
 # MAIN ORCHESTRATOR
 # ============================================================================
@@ -289,14 +768,36 @@ def orchestrate_request(request: UserRequest):
         "Buy 5 AAPL" → market order agent
         "Is the market open?" → market status agent
         "Should I buy Tesla?" → finance agent (AI)
+    
+    Several requests in one message run in parallel and come back as one reply:
+        "Show my portfolio and compare AAPL vs MSFT" → portfolio + comparison agent
+    
+    With a chat_id, follow-ups reuse the chat's context:
+        "Show me AAPL chart" → "and compare it with MSFT" → "buy 5 of those"
     """
     try:
-        user_message = request.message
-        intent = detect_intent(user_message)
+        context = load_context(request.chat_id)
         
-        # Get handler function and execute (ONE LINE!)
-        handler = INTENT_HANDLERS.get(intent, handle_finance)
-        return handler(user_message)
+        # Plan all parts first: "show AAPL chart and buy 5 of it" resolves
+        # "it" from the first part, so each part sees the symbols before it
+        plans = []
+        view = dict(context)
+        for part in split_intents(request.message):
+            resolved, intent, key = plan_part(part, view)
+            plans.append((resolved, intent, key))
+            symbols = extract_stock_symbols(resolved)
+            view = dict(view, intent=intent, symbols=symbols or view["symbols"])
+        
+        if len(plans) == 1:
+            results = [run_part(*plans[0], context)]
+        else:
+            results = dispatch_parts(plans, context)
+        
+        for (resolved, intent, key), result in zip(plans, results):
+            record_part(context, resolved, intent, key, result)
+        save_context(request.chat_id, context)
+        
+        return results[0] if len(results) == 1 else merge_responses(plans, results)
     
     except requests.exceptions.RequestException as e:
         raise HTTPException(
@@ -320,21 +821,38 @@ def health_check():
         "endpoints": {
             "orchestrate": "/orchestrate",
             "docs": "/docs",
-            "health": "/health"
+            "health": "/health",
+            "liveness": "/healthz",
+            "readiness": "/readyz"
         }
     }
 
 
+@app.post("/briefing/run")
+def run_briefing():
+    """Warm the watchlist caches now (e.g. after changing BRIEFING_WATCHLIST)"""
+    if not briefing.watchlist:
+        raise HTTPException(status_code=400, detail="BRIEFING_WATCHLIST is empty")
+    threading.Thread(target=briefing.run_once, name="briefing-manual", daemon=True).start()
+    return {"status": "started", **briefing.status()}
+
+
+def expert_base_url(url: str) -> str:
+    """http://host:port/some/path → http://host:port"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
 @app.get("/health")
 def detailed_health():
-    """Check health of all expert agents"""
+    """Check readiness of all expert agents"""
     health_status = {}
     
     for agent_name, url in EXPERT_URLS.items():
         try:
-            # Try to reach the agent (timeout 2 seconds)
-            base_url = url.rsplit('/', 1)[0]  # Get base URL
-            response = requests.get(base_url, timeout=2)
+            # Ask the agent's readiness endpoint (timeout 2 seconds);
+            # 503 means it is up but still warming up
+            response = requests.get(expert_base_url(url) + "/readyz", timeout=2)
             health_status[agent_name] = "healthy" if response.status_code == 200 else "degraded"
         except:
             health_status[agent_name] = "unavailable"
@@ -344,6 +862,10 @@ def detailed_health():
     return {
         "orchestrator": "healthy",
         "experts": health_status,
+        "circuits": {host: breaker.as_dict() for host, breaker in breakers.items()},
+        "hedging": hedge_metrics.as_dict(),
+        "routing": dict(routing_stats),
+        "briefing": briefing.status(),
         "overall_status": "healthy" if all_healthy else "degraded"
     }
 
@@ -362,4 +884,5 @@ if __name__ == "__main__":
     print('     -d \'{"message": "Compare Apple and Tesla"}\'')
     print("\n" + "="*60 + "\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=80)
+    # WEB_CONCURRENCY sets the number of worker processes
+    uvicorn.run("app:app", host="0.0.0.0", port=80, workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -0,0 +1,141 @@
+"""
+Pre-market briefing: warm the expert caches for a watchlist before the open
+===========================================================================
+
+At the open many users ask about the same tickers within minutes, and every
+uncached /ask is a Gemini run with tools. On weekdays, from BRIEFING_START to
+BRIEFING_END (New York time) every BRIEFING_INTERVAL_MINUTES, this job calls
+the experts for each ticker in BRIEFING_WATCHLIST:
+
+    finance     /ask "Analyze TICKER" with refresh=true (recomputed, kept for
+                BRIEFING_CACHE_TTL, shared by "AAPL", "analyze AAPL", ...)
+    chart       /chart-links per ticker
+    comparison  /compare for pairs of tickers (warms the per-symbol data)
+
+Every orchestrator worker runs the scheduler, a lock in the shared cache lets
+exactly one of them run each slot. Market holidays are not skipped, a run
+then only refreshes caches nobody reads.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import requests
+
+log = logging.getLogger("orchestrator.briefing")
+
+WATCHLIST = [s.strip().upper() for s in os.getenv("BRIEFING_WATCHLIST", "").split(",") if s.strip()]
+START = os.getenv("BRIEFING_START", "08:45")
+END = os.getenv("BRIEFING_END", "10:30")
+INTERVAL_MINUTES = int(os.getenv("BRIEFING_INTERVAL_MINUTES", "15"))
+# Parallel expert calls per run (keeps the Gemini request rate down)
+CONCURRENCY = int(os.getenv("BRIEFING_CONCURRENCY", "2"))
+PROMPT = "Analyze {symbol}"
+
+NEW_YORK = ZoneInfo("America/New_York")
+
+# (expert name, payload, timeout seconds)
+Task = Tuple[str, Dict, float]
+
+
+def _time_of_day(value: str) -> Tuple[int, int]:
+    hour, minute = value.split(":")
+    return int(hour), int(minute)
+
+
+def next_slot(after: datetime) -> datetime:
+    """First run time after `after` (New York time, weekdays only)"""
+    start_hour, start_minute = _time_of_day(START)
+    end_hour, end_minute = _time_of_day(END)
+    day = after.astimezone(NEW_YORK).date()
+    for _ in range(8):
+        if day.weekday() < 5:
+            slot = datetime(day.year, day.month, day.day, start_hour, start_minute, tzinfo=NEW_YORK)
+            end = datetime(day.year, day.month, day.day, end_hour, end_minute, tzinfo=NEW_YORK)
+            while slot <= end:
+                if slot > after:
+                    return slot
+                slot += timedelta(minutes=INTERVAL_MINUTES)
+        day += timedelta(days=1)
+    raise ValueError("No briefing slot within a week, check BRIEFING_START/BRIEFING_END")
+
+
+def briefing_tasks(watchlist: List[str]) -> List[Task]:
+    """Cheap chart/comparison warm-ups first, then the slow AI analyses"""
+    tasks: List[Task] = [("chart", {"symbol": symbol}, 30) for symbol in watchlist]
+    # Comparison data is cached per symbol, so pairs cover the whole list
+    pairs = [watchlist[i:i + 2] for i in range(0, len(watchlist), 2)]
+    if len(watchlist) % 2 == 1 and len(watchlist) > 1:
+        pairs[-1].append(watchlist[0])
+    tasks += [("comparison", {"symbol1": pair[0], "symbol2": pair[1]}, 30) for pair in pairs if len(pair) == 2]
+    tasks += [("finance", {"prompt": PROMPT.format(symbol=symbol), "refresh": True}, 120) for symbol in watchlist]
+    return tasks
+
+
+class BriefingScheduler:
+    """Background thread running the briefing at every slot (if this worker wins the lock)"""
+
+    def __init__(self, expert_urls: Dict[str, str], cache, watchlist: List[str] = WATCHLIST):
+        self.expert_urls = expert_urls
+        self.cache = cache
+        self.watchlist = watchlist
+        self.next_run: Optional[datetime] = None
+        self.last_run: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.watchlist and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="briefing", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.next_run = next_slot(datetime.now(NEW_YORK))
+            wait = (self.next_run - datetime.now(NEW_YORK)).total_seconds()
+            if self._stop.wait(max(0.0, wait)):
+                return
+            # One worker per slot; the lock expires with the interval
+            if self.cache.try_lock(f"briefing:{self.next_run:%Y-%m-%d %H:%M}", INTERVAL_MINUTES * 60):
+                self.run_once()
+
+    def _call(self, task: Task) -> bool:
+        name, payload, timeout = task
+        try:
+            response = requests.post(self.expert_urls[name], json=payload, timeout=timeout)
+            response.raise_for_status()
+            return True
+        except requests.RequestException as e:
+            log.warning("Briefing %s %s failed: %s", name, payload, e)
+            return False
+
+    def run_once(self) -> Dict:
+        """Runs all warm-up calls now; returns (and keeps) a summary"""
+        started = time.monotonic()
+        tasks = briefing_tasks(self.watchlist)
+        with ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="briefing-call") as pool:
+            results = list(pool.map(self._call, tasks))
+        self.last_run = {
+            "finished_at": datetime.now(NEW_YORK).isoformat(timespec="seconds"),
+            "seconds": round(time.monotonic() - started, 1),
+            "calls": len(tasks),
+            "failed": results.count(False),
+        }
+        log.info("Briefing for %d tickers: %s", len(self.watchlist), self.last_run)
+        return self.last_run
+
+    def status(self) -> Dict:
+        return {
+            "watchlist": self.watchlist,
+            "next_run": self.next_run.isoformat(timespec="minutes") if self.next_run else None,
+            "last_run": self.last_run,
+        }
@@ -0,0 +1,124 @@
+"""
+Local intent classifier for messages the keyword patterns miss
+==============================================================
+
+    "How much cash do I have?"          → portfolio     (no "portfolio" keyword)
+    "Wie hat sich Tesla entwickelt?"    → chart
+    "Welche ist stärker, AMD oder NVDA" → comparison
+    "Can I still trade right now?"      → market_status
+    "Is now a good time to invest?"     → finance (the LLM)
+
+TF-IDF over words and character trigrams (so German compounds like
+"Depotwert" still match "Depot"), one centroid per intent, cosine
+similarity. Pure Python, built once at import from the examples below
+in a few milliseconds; classifying a message takes microseconds.
+
+Orders are deliberately not an intent here: a guessed order is worse than
+a slow answer, so buy/sell still needs an explicit keyword.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+EXAMPLES: Dict[str, List[str]] = {
+    "portfolio": [
+        "how much cash do I have", "how much money is in my account", "what do I own",
+        "how are my investments doing", "what is my buying power", "my profit and loss",
+        "how much did I make today", "which shares do I hold", "show my equity",
+        "wie viel geld habe ich", "was ist in meinem depot", "mein kontostand",
+        "welche aktien besitze ich", "wie steht mein depot", "wie viel gewinn habe ich gemacht",
+        "zeig mir meine positionen", "wie viel kaufkraft habe ich",
+    ],
+    "chart": [
+        "how is AAPL doing", "how did tesla perform this year", "what is the trend of nvidia",
+        "where is microsoft trading", "how much is apple worth now", "plot amazon for the last year",
+        "what does the AAPL candle look like", "current quote for meta", "is tesla up or down",
+        "what is nvidia trading at", "how much does one apple share cost",
+        "wie hat sich tesla entwickelt", "wie steht apple", "kursverlauf von microsoft",
+        "was kostet nvidia gerade", "wie läuft amazon", "zeig mir den verlauf von meta",
+        "ist tesla gestiegen oder gefallen",
+    ],
+    "comparison": [
+        "which is stronger AMD or NVDA", "which performed better apple or microsoft",
+        "AAPL or MSFT which one", "how does tesla stack up to ford", "difference between meta and google",
+        "welche ist stärker amd oder nvidia", "was ist besser apple oder microsoft",
+        "wie schlägt sich tesla gegen ford", "unterschied zwischen meta und google",
+        "welche aktie lief besser", "gegenüberstellung von amazon und apple",
+    ],
+    "market_status": [
+        "can I still trade right now", "is wall street open", "when does the nyse open",
+        "when does trading close today", "is the stock exchange closed", "are markets open on monday",
+        "what time does the market close", "is today a trading day", "can I trade now",
+        "kann ich jetzt handeln", "hat die börse geöffnet", "wann öffnet die nyse",
+        "wann schließt der handel", "ist heute ein handelstag", "ist wall street offen",
+    ],
+    "finance": [
+        "is now a good time to invest", "what is a p/e ratio", "explain dividends",
+        "should I diversify into bonds", "what do analysts think about tesla", "what is inflation doing to stocks",
+        "give me the latest news on apple", "what are the fundamentals of nvidia", "is apple overvalued",
+        "what is an etf", "how do interest rates affect tech stocks", "what is the outlook for the economy",
+        "ist jetzt ein guter zeitpunkt zu investieren", "was ist ein kgv", "erkläre mir dividenden",
+        "was sagen analysten zu tesla", "neuigkeiten zu apple", "ist apple überbewertet",
+        "was ist ein etf", "wie ist der ausblick für die wirtschaft",
+    ],
+}
+
+WORD_PATTERN = re.compile(r"[a-zäöüß0-9/]+")
+
+Vector = Dict[str, float]
+
+
+def features(text: str) -> Counter:
+    """Words plus character trigrams of each word ("#depot#" → "#de", "dep", ...)"""
+    counts = Counter()
+    for word in WORD_PATTERN.findall(text.lower()):
+        counts[f"w:{word}"] += 1
+        padded = f"#{word}#"
+        for i in range(len(padded) - 2):
+            counts[padded[i:i + 3]] += 1
+    return counts
+
+
+def _normalize(vector: Vector) -> Vector:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / norm for term, value in vector.items()} if norm else vector
+
+
+class IntentClassifier:
+    """Nearest centroid over TF-IDF vectors"""
+
+    def __init__(self, examples: Dict[str, List[str]]):
+        documents = [(intent, features(text)) for intent, texts in examples.items() for text in texts]
+        document_frequency = Counter(term for _, counts in documents for term in counts)
+        total = len(documents)
+        self.idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        sums: Dict[str, Vector] = {intent: {} for intent in examples}
+        for intent, counts in documents:
+            for term, value in self._vector(counts).items():
+                sums[intent][term] = sums[intent].get(term, 0.0) + value
+        self.centroids = {intent: _normalize(vector) for intent, vector in sums.items()}
+
+    def _vector(self, counts: Counter) -> Vector:
+        # Unknown terms (tickers, typos) carry no information about the intent
+        return _normalize({
+            term: (1 + math.log(count)) * self.idf[term] for term, count in counts.items() if term in self.idf
+        })
+
+    def scores(self, text: str) -> Dict[str, float]:
+        vector = self._vector(features(text))
+        return {
+            intent: sum(value * centroid.get(term, 0.0) for term, value in vector.items())
+            for intent, centroid in self.centroids.items()
+        }
+
+    def classify(self, text: str) -> Tuple[str, float, float]:
+        """Returns (intent, cosine similarity to its centroid, lead over the runner-up)"""
+        ranked = sorted(self.scores(text).items(), key=lambda item: item[1], reverse=True)
+        (intent, score), (_, runner_up) = ranked[0], ranked[1]
+        return intent, score, score - runner_up
+
+
+classifier = IntentClassifier(EXAMPLES)
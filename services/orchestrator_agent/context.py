@@ -0,0 +1,158 @@
+"""
+Conversation context per chat, so follow-up messages work
+==========================================================
+
+    "Show me the AAPL chart"      → chart_agent (AAPL)
+    "and compare it with MSFT"    → comparison_agent (AAPL vs MSFT)
+    "buy 5 of those"              → "AAPL or MSFT?" (one order per message)
+
+For every chat_id the orchestrator remembers the last symbols, the last
+intent and the answers to recent read-only questions. References like
+"it"/"those" are replaced with the remembered symbols before routing,
+and a repeated question is answered from the context instead of calling
+the expert (and the LLM) again.
+
+Contexts live in the shared StockM8 cache without its in-process tier:
+with CACHE_REDIS_URL set they are read from Redis on every message, so
+every orchestrator worker sees the latest conversation (a local copy would
+keep serving a context another worker has already updated). A chat's
+context expires CONTEXT_TTL_SECONDS after its last message.
+
+Two messages of the same chat can be handled at the same time by different
+workers. Each one merges its changes into the stored context when it ends
+(see save_context) instead of writing its copy back whole.
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from stockm8_common import get_cache
+
+CONTEXT_TTL = int(os.getenv("CONTEXT_TTL_SECONDS", "1800"))
+RESULT_TTL = int(os.getenv("CONTEXT_RESULT_TTL_SECONDS", "120"))
+MAX_RESULTS = int(os.getenv("CONTEXT_MAX_RESULTS", "8"))
+SAVE_LOCK_SECONDS = float(os.getenv("CONTEXT_SAVE_LOCK_SECONDS", "2"))
+
+# Read-only intents whose answers can be reused for a repeated question
+CACHEABLE_INTENTS = {"chart", "comparison", "portfolio", "market_status", "finance"}
+
+SINGULAR_REFERENCES = r"it|that one|this one|that stock|the same|es|dieselbe|diese aktie"
+PLURAL_REFERENCES = r"those|these|them|both|beide|diese|davon"
+FOLLOW_UP_PATTERN = r"^\s*(?:and|also|what about|how about|same for|und|auch|was ist mit|wie ist es mit)\b"
+
+cache = get_cache("orchestrator-context", local_tier=False)
+
+
+def empty_context() -> Dict:
+    return {"symbols": [], "intent": None, "results": {}}
+
+
+def load_context(chat_id: Optional[str]) -> Dict:
+    """Context of a chat (empty without chat_id or after the TTL)"""
+    if not chat_id:
+        return empty_context()
+    return cache.get(chat_id) or empty_context()
+
+
+def save_context(chat_id: Optional[str], context: Dict) -> None:
+    """
+    Merge the message's context into the stored one
+
+    Read, merge and write run under a short per-chat lock, so a message
+    finishing at the same time on another worker doesn't get overwritten.
+    If the lock can't be had within SAVE_LOCK_SECONDS the merge still runs.
+    """
+    if not chat_id:
+        return
+    lock_key = f"save:{chat_id}"
+    deadline = time.time() + SAVE_LOCK_SECONDS
+    locked = cache.try_lock(lock_key, SAVE_LOCK_SECONDS)
+    while not locked and time.time() < deadline:
+        time.sleep(0.02)
+        locked = cache.try_lock(lock_key, SAVE_LOCK_SECONDS)
+    try:
+        stored = cache.get(chat_id)
+        cache.set(chat_id, merge_contexts(stored, context) if stored else context, ttl=CONTEXT_TTL)
+    finally:
+        if locked:
+            cache.unlock(lock_key)
+
+
+def merge_contexts(stored: Dict, context: Dict) -> Dict:
+    """
+    The later message's intent and symbols win, cached answers of both are
+    kept, except answers stored before the last order (see forget_results)
+    """
+    latest = context if context.get("updated", 0) >= stored.get("updated", 0) else stored
+    cleared = max(context.get("cleared", 0), stored.get("cleared", 0))
+    results = {k: v for k, v in {**stored["results"], **context["results"]}.items() if v[0] - RESULT_TTL >= cleared}
+    return {
+        "symbols": latest["symbols"],
+        "intent": latest["intent"],
+        "results": dict(sorted(results.items(), key=lambda item: item[1][0])[-MAX_RESULTS:]),
+        "updated": latest.get("updated", 0),
+        "cleared": cleared,
+    }
+
+
+def is_follow_up(message: str) -> bool:
+    """'and for TSLA?', 'what about MSFT', 'und Tesla?'"""
+    return re.search(FOLLOW_UP_PATTERN, message, re.IGNORECASE) is not None
+
+
+def resolve_references(message: str, found_symbols: List[str], needed: int, context: Dict) -> str:
+    """
+    Replace references with the chat's last symbols
+
+    Only when the message names fewer symbols than the request needs
+    (1, or 2 for a comparison), so "buy AAPL if it drops" stays untouched.
+    """
+    last = [s for s in context["symbols"] if s not in found_symbols]
+    if not last or len(found_symbols) >= needed:
+        return message
+
+    plural = re.search(rf"\b(?:{PLURAL_REFERENCES})\b", message, re.IGNORECASE)
+    if plural:
+        return message[:plural.start()] + " and ".join(last) + message[plural.end():]
+    singular = re.search(rf"\b(?:{SINGULAR_REFERENCES})\b", message, re.IGNORECASE)
+    if singular:
+        return message[:singular.start()] + last[0] + message[singular.end():]
+    if is_follow_up(message):
+        # "and the chart?" / "what about MSFT" (in a comparison)
+        return f"{message} {' '.join(last[:needed - len(found_symbols)])}"
+    return message
+
+
+def result_key(intent: str, message: str) -> str:
+    return f"{intent}:{' '.join(message.lower().split())}"
+
+
+def cached_result(context: Dict, key: str) -> Optional[Dict]:
+    entry = context["results"].get(key)
+    if entry is None or entry[0] <= time.time():
+        return None
+    return entry[1]
+
+
+def forget_results(context: Dict) -> None:
+    """An order changes portfolio and buying power, earlier answers are stale"""
+    context["results"] = {}
+    context["cleared"] = time.time()
+
+
+def remember(context: Dict, intent: str, symbols: List[str], key: Optional[str], result: Optional[Dict]) -> None:
+    """Store intent, symbols and (for read intents) the answer; keeps at most MAX_RESULTS answers"""
+    context["intent"] = intent
+    if symbols:
+        context["symbols"] = symbols
+    if intent == "ordering":
+        forget_results(context)
+    now = time.time()
+    context["updated"] = now
+    results = {k: v for k, v in context["results"].items() if v[0] > now}
+    if key is not None and result is not None:
+        results[key] = [now + RESULT_TTL, result]
+    # Oldest answers go first (earliest expiry)
+    context["results"] = dict(sorted(results.items(), key=lambda item: item[1][0])[-MAX_RESULTS:])
@@ -0,0 +1,214 @@
+"""
+Quote Hub - one market-data websocket for all StockM8 services
+==============================================================
+
+Keeps a single Alpaca stream subscription for the symbols users actually ask
+about and serves last trade, quote and minute bar over local HTTP. The
+ordering agent reads it (QUOTE_HUB_URL) for pre-trade price estimates and
+price rules instead of polling the REST API; the chart and comparison
+agents work on historical bars and do not use it. The websocket connects
+with the first subscribed symbol.
+
+Endpoints:
+- GET  /                  → Status and subscribed symbols
+- POST /subscribe         → Subscribe symbols to the stream
+- GET  /quotes?symbols=   → Latest data for several symbols (auto-subscribes)
+- GET  /quote/{symbol}    → Latest data for one symbol (auto-subscribes)
+- GET  /healthz, /readyz  → Liveness / readiness (ready once the feed runs)
+
+Set QUOTE_HUB_FEED=replay (and optionally QUOTE_HUB_REPLAY_FILE) to run
+against a recorded session instead of the live stream.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+from quote_table import QuoteTable
+from feeds import AlpacaQuoteFeed, ReplayQuoteFeed
+
+# Load environment variables
+dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
+load_dotenv(dotenv_path=dotenv_path)
+
+# Shared StockM8 library (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import Warmup, add_health_routes
+
+# Alpaca's free IEX feed allows 30 symbols per connection
+MAX_SYMBOLS = int(os.getenv("QUOTE_HUB_MAX_SYMBOLS", "30"))
+FEED_MODE = os.getenv("QUOTE_HUB_FEED", "alpaca")
+REPLAY_FILE = os.getenv(
+    "QUOTE_HUB_REPLAY_FILE",
+    os.path.join(os.path.dirname(__file__), "replay", "sample_session.jsonl")
+)
+
+table = QuoteTable()
+
+
+def create_feed():
+    if FEED_MODE == "replay":
+        return ReplayQuoteFeed(table, REPLAY_FILE, speed=float(os.getenv("QUOTE_HUB_REPLAY_SPEED", "1.0")))
+    return AlpacaQuoteFeed(
+        table,
+        os.getenv("APCA_API_KEY_ID"),
+        os.getenv("APCA_API_SECRET_KEY"),
+        feed=os.getenv("QUOTE_HUB_DATA_FEED", "iex")
+    )
+
+
+class SubscriptionManager:
+    """
+    Tracks subscribed symbols in least-recently-requested order.
+
+    When the symbol limit is reached, the symbol nobody asked about for the
+    longest time is unsubscribed and dropped from the table.
+    """
+
+    def __init__(self, feed, max_symbols: int):
+        self.feed = feed
+        self.max_symbols = max_symbols
+        self._symbols: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    def touch(self, symbols: List[str]) -> List[str]:
+        """Marks symbols as requested, subscribing new ones. Returns the new symbols."""
+        new_symbols, evicted = [], []
+        with self._lock:
+            for symbol in symbols:
+                if symbol in self._symbols:
+                    self._symbols.move_to_end(symbol)
+                    continue
+                self._symbols[symbol] = None
+                new_symbols.append(symbol)
+            while len(self._symbols) > self.max_symbols:
+                oldest, _ = self._symbols.popitem(last=False)
+                evicted.append(oldest)
+            # A symbol can be added and evicted in the same call if more than
+            # max_symbols are requested at once; it was never subscribed
+            evicted = [s for s in evicted if s not in new_symbols]
+            new_symbols = [s for s in new_symbols if s in self._symbols]
+        if evicted:
+            self.feed.unsubscribe(evicted)
+            for symbol in evicted:
+                table.remove(symbol)
+        if new_symbols:
+            self.feed.subscribe(new_symbols)
+        return new_symbols
+
+
+feed = None
+subscriptions: Optional[SubscriptionManager] = None
+
+
+def start_feed() -> None:
+    global feed, subscriptions
+    feed = create_feed()
+    subscriptions = SubscriptionManager(feed, MAX_SYMBOLS)
+    feed.start()
+
+
+# alpaca-py is imported in the background after startup; the stream connects on the first subscribe
+warmup = Warmup(
+    modules=["alpaca.data.live"] if FEED_MODE != "replay" else [],
+    hooks=[("feed", start_feed)]
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    yield
+    if feed is not None:
+        feed.stop()
+
+
+app = FastAPI(title="Quote Hub", lifespan=lifespan)
+add_health_routes(app, warmup)
+
+
+class SubscribeRequest(BaseModel):
+    symbols: List[str]
+
+
+class QuotesResponse(BaseModel):
+    quotes: Dict[str, dict]
+    pending: List[str]
+
+
+def parse_symbols(raw: List[str]) -> List[str]:
+    return [s.strip().upper() for s in raw if s and s.strip()]
+
+
+def require_feed() -> SubscriptionManager:
+    if subscriptions is None:
+        raise HTTPException(status_code=503, detail="Quote feed is starting")
+    return subscriptions
+
+
+def collect_quotes(symbols: List[str]) -> QuotesResponse:
+    require_feed().touch(symbols)
+    quotes = table.snapshot(symbols)
+    # Subscribed, but no event has arrived yet
+    pending = [s for s in symbols if s not in quotes]
+    return QuotesResponse(quotes=quotes, pending=pending)
+
+
+@app.get("/")
+def read_root():
+    return {
+        "status": "Quote Hub is running",
+        "feed": FEED_MODE,
+        "subscribed": subscriptions.symbols() if subscriptions else [],
+        "max_symbols": MAX_SYMBOLS,
+        "endpoints": ["/subscribe", "/quotes", "/quote/{symbol}", "/healthz", "/readyz"]
+    }
+
+
+@app.post("/subscribe")
+def subscribe(request: SubscribeRequest):
+    """Subscribes symbols so their data is warm before the first read."""
+    symbols = parse_symbols(request.symbols)
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    manager = require_feed()
+    new_symbols = manager.touch(symbols)
+    return {"subscribed": manager.symbols(), "added": new_symbols}
+
+
+@app.get("/quotes", response_model=QuotesResponse)
+def get_quotes(symbols: str):
+    """
+    Latest trade, quote and minute bar for comma separated symbols.
+
+    Example:
+        curl "http://localhost:80/quotes?symbols=AAPL,MSFT"
+    """
+    symbol_list = parse_symbols(symbols.split(","))
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    return collect_quotes(symbol_list)
+
+
+@app.get("/quote/{symbol}")
+def get_quote(symbol: str):
+    """Latest trade, quote and minute bar for one symbol."""
+    result = collect_quotes(parse_symbols([symbol]))
+    if result.pending:
+        raise HTTPException(status_code=404, detail=f"No data yet for {symbol.upper()} (subscribed)")
+    return result.quotes[symbol.upper()]
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=80)
@@ -0,0 +1,163 @@
+import json
+import logging
+import threading
+from typing import Iterable, List, Optional
+
+from quote_table import QuoteTable
+
+log = logging.getLogger("quote_hub.feeds")
+
+
+class AlpacaQuoteFeed:
+    """
+    One Alpaca market-data websocket shared by all StockM8 services.
+
+    The stream runs its own event loop in a daemon thread. subscribe() and
+    unsubscribe() are called from request threads; alpaca-py forwards them
+    into the stream loop while it is running.
+
+    The thread starts with the first subscribe(), not in start(): until a
+    symbol is subscribed alpaca-py's run loop spins on asyncio.sleep(0) and
+    would keep a CPU core busy.
+    """
+
+    def __init__(self, table: QuoteTable, api_key: str, secret_key: str, feed: str = "iex"):
+        from alpaca.data.enums import DataFeed
+        from alpaca.data.live import StockDataStream
+
+        self.table = table
+        self._stream = StockDataStream(api_key, secret_key, feed=DataFeed(feed))
+        self._thread: Optional[threading.Thread] = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    async def _on_trade(self, trade):
+        self.table.update_trade(trade.symbol, trade.price, trade.size, trade.timestamp.timestamp())
+
+    async def _on_quote(self, quote):
+        self.table.update_quote(
+            quote.symbol, quote.bid_price, quote.bid_size,
+            quote.ask_price, quote.ask_size, quote.timestamp.timestamp()
+        )
+
+    async def _on_bar(self, bar):
+        self.table.update_bar(
+            bar.symbol, bar.open, bar.high, bar.low,
+            bar.close, bar.volume, bar.timestamp.timestamp()
+        )
+
+    def start(self) -> None:
+        """Allows the stream to run; it connects on the first subscribe()."""
+        self._started = True
+
+    def _run_stream(self) -> None:
+        with self._lock:
+            if not self._started or self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._stream.run, name="alpaca-quote-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._started = False
+            if self._thread is None:
+                return
+        try:
+            self._stream.stop()
+        except Exception as e:
+            log.warning("Error stopping quote stream: %s", e)
+
+    def subscribe(self, symbols: List[str]) -> None:
+        # Handlers first: the stream sends them all in its first subscribe message
+        self._stream.subscribe_trades(self._on_trade, *symbols)
+        self._stream.subscribe_quotes(self._on_quote, *symbols)
+        self._stream.subscribe_bars(self._on_bar, *symbols)
+        self._run_stream()
+
+    def unsubscribe(self, symbols: List[str]) -> None:
+        self._stream.unsubscribe_trades(*symbols)
+        self._stream.unsubscribe_quotes(*symbols)
+        self._stream.unsubscribe_bars(*symbols)
+
+
+class ReplayQuoteFeed:
+    """
+    Replays recorded market-data events from a JSON-lines file.
+
+    Drop-in replacement for AlpacaQuoteFeed in tests and local development.
+    Each line is one event:
+
+        {"type": "trade", "symbol": "AAPL", "ts": 1700000000.0, "price": 189.5, "size": 100}
+        {"type": "quote", "symbol": "AAPL", "ts": ..., "bid_price": ..., "bid_size": ...,
+         "ask_price": ..., "ask_size": ...}
+        {"type": "bar", "symbol": "AAPL", "ts": ..., "open": ..., "high": ..., "low": ...,
+         "close": ..., "volume": ...}
+
+    Like the real feed, only events for subscribed symbols reach the table.
+    `speed` scales the recorded gaps between events (0 = as fast as possible).
+    """
+
+    def __init__(self, table: QuoteTable, path: str, speed: float = 1.0, loop: bool = True):
+        self.table = table
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self._subscribed = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def load_events(self) -> List[dict]:
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def apply(self, event: dict) -> None:
+        symbol = event["symbol"]
+        if symbol not in self._subscribed:
+            return
+        kind = event["type"]
+        if kind == "trade":
+            self.table.update_trade(symbol, event["price"], event["size"], event["ts"])
+        elif kind == "quote":
+            self.table.update_quote(
+                symbol, event["bid_price"], event["bid_size"],
+                event["ask_price"], event["ask_size"], event["ts"]
+            )
+        elif kind == "bar":
+            self.table.update_bar(
+                symbol, event["open"], event["high"], event["low"],
+                event["close"], event["volume"], event["ts"]
+            )
+
+    def replay(self, events: Optional[Iterable[dict]] = None) -> None:
+        """Applies all events immediately (synchronous, for tests)."""
+        for event in events if events is not None else self.load_events():
+            self.apply(event)
+
+    def _run(self) -> None:
+        events = self.load_events()
+        while not self._stop.is_set():
+            previous_ts = None
+            for event in events:
+                if self._stop.is_set():
+                    return
+                if previous_ts is not None and self.speed > 0:
+                    self._stop.wait(max(0.0, event["ts"] - previous_ts) / self.speed)
+                previous_ts = event["ts"]
+                self.apply(event)
+            if not self.loop:
+                return
+            # Pause between passes so speed=0 does not spin
+            self._stop.wait(1.0)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="replay-quote-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def subscribe(self, symbols: List[str]) -> None:
+        self._subscribed.update(symbols)
+
+    def unsubscribe(self, symbols: List[str]) -> None:
+        self._subscribed.difference_update(symbols)
@@ -0,0 +1,97 @@
+import threading
+from array import array
+from typing import Dict, Iterable, Optional
+
+# Column layout of one table row. Timestamps are stored as epoch seconds.
+FIELDS = (
+    "trade_price", "trade_size", "trade_ts",
+    "bid_price", "bid_size", "ask_price", "ask_size", "quote_ts",
+    "bar_open", "bar_high", "bar_low", "bar_close", "bar_volume", "bar_ts",
+)
+_COL = {name: i for i, name in enumerate(FIELDS)}
+_WIDTH = len(FIELDS)
+_NAN = float("nan")
+
+
+class QuoteTable:
+    """
+    Last trade, quote and minute bar per symbol in one flat float64 array.
+
+    Every symbol owns a fixed-width row; the symbol -> row mapping is the only
+    per-symbol Python object, so thousands of updates per second do not churn
+    dicts or models. Rows of removed symbols are recycled.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._data = array("d", [_NAN]) * (capacity * _WIDTH)
+        self._capacity = capacity
+        self._rows: Dict[str, int] = {}
+        self._free = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def symbols(self):
+        return list(self._rows)
+
+    def _row(self, symbol: str) -> int:
+        # Caller holds the lock
+        row = self._rows.get(symbol)
+        if row is not None:
+            return row
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._rows)
+            if row >= self._capacity:
+                self._data.extend(array("d", [_NAN]) * (self._capacity * _WIDTH))
+                self._capacity *= 2
+        self._rows[symbol] = row
+        return row
+
+    def _write(self, symbol: str, first_col: str, values) -> None:
+        with self._lock:
+            offset = self._row(symbol) * _WIDTH + _COL[first_col]
+            self._data[offset:offset + len(values)] = array("d", values)
+
+    def update_trade(self, symbol: str, price: float, size: float, ts: float) -> None:
+        self._write(symbol, "trade_price", (price, size, ts))
+
+    def update_quote(self, symbol: str, bid_price: float, bid_size: float,
+                     ask_price: float, ask_size: float, ts: float) -> None:
+        self._write(symbol, "bid_price", (bid_price, bid_size, ask_price, ask_size, ts))
+
+    def update_bar(self, symbol: str, open_: float, high: float, low: float,
+                   close: float, volume: float, ts: float) -> None:
+        self._write(symbol, "bar_open", (open_, high, low, close, volume, ts))
+
+    def remove(self, symbol: str) -> None:
+        with self._lock:
+            row = self._rows.pop(symbol, None)
+            if row is None:
+                return
+            offset = row * _WIDTH
+            self._data[offset:offset + _WIDTH] = array("d", [_NAN]) * _WIDTH
+            self._free.append(row)
+
+    def get(self, symbol: str) -> Optional[dict]:
+        """Returns the row for a symbol as a dict (missing values are None)."""
+        with self._lock:
+            row = self._rows.get(symbol)
+            if row is None:
+                return None
+            values = self._data[row * _WIDTH:(row + 1) * _WIDTH]
+        # NaN is the only value that is not equal to itself
+        return {name: (v if v == v else None) for name, v in zip(FIELDS, values)}
+
+    def snapshot(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        result = {}
+        for symbol in symbols:
+            row = self.get(symbol)
+            if row is not None:
+                result[symbol] = row
+        return result
@@ -1,16 +1,40 @@
 import os
-from fastapi import FastAPI, HTTPException
+import sys
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
+from typing import Dict, Optional
 from dotenv import load_dotenv
-from alpaca.data.historical import StockHistoricalDataClient
-
-# Importiere deine eigenen Funktionen
-from data_handler import get_historical_data
 
 # .env-Datei aus dem Hauptverzeichnis laden
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path=dotenv_path)
 
+# Shared StockM8 library (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import (
+    TIMEFRAMES, Warmup, add_conditional_responses, add_health_routes, add_negotiation, cache_metrics,
+    close_async_data_client, close_clients, cpu_metrics, data_only_requested, get_async_data_client, get_cache,
+    get_daily_bars, get_data_client, precondition, shutdown_cpu_pool, throttle_metrics
+)
+from stockm8_common.bars import MARKET_TIMEZONE
+from stockm8_common.messages import chart_links_message, intraday_message
+
+# Importiere deine eigenen Funktionen
+from data_handler import get_historical_data, get_recent_sessions
+from renderer import FORMATS, RENDERER_VERSION, render_candlestick
+
+# pandas, numpy and alpaca-py are imported in the background after startup (or on first use)
+warmup = Warmup(
+    modules=["pandas", "numpy", "httpx", "stockm8_common.bar_series", "indicators", "alpaca.data.historical", "alpaca.data.requests", "alpaca.data.timeframe"],
+    hooks=[("async_data_client", get_async_data_client), ("data_client", get_data_client)]
+)
+
 # Pydantic models
 class SymbolRequest(BaseModel):
     symbol: str
@@ -23,59 +47,350 @@ class ChartResponse(BaseModel):
     change_percent: float = None
     formatted_message: str = None  # Ready-to-send WhatsApp message
 
-# Initialize FastAPI and Alpaca clients
-app = FastAPI(title="Alpaca Stock Info API")
-data_client = StockHistoricalDataClient(
-    os.getenv("APCA_API_KEY_ID"),
-    os.getenv("APCA_API_SECRET_KEY")
-)
+class ChartImageRequest(BaseModel):
+    symbol: str
+    range: str = "3M"             # 1D, 5D, 1M, 3M, 6M, 1Y
+    format: str = "png"           # png, svg
+    timeframe: Optional[str] = None  # 1Min, 5Min, 15Min, Hour, Day (default depends on range)
+
+class IntradayRequest(BaseModel):
+    symbol: str
+    timeframe: str = "5Min"
+    days: int = 1
+
+class IntradayResponse(BaseModel):
+    symbol: str
+    timeframe: str
+    open: float
+    high: float
+    low: float
+    last_price: float
+    change_percent: float
+    bars: int
+    last_bar: str
+    formatted_message: str = None
+
+class IndicatorResponse(BaseModel):
+    symbol: str
+    last_bar: str
+    close: float
+    indicators: Dict[str, Optional[float]]
+    formatted_message: str = None
+
+# Alpaca clients are created per worker process by the warm-up
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    yield
+    await close_async_data_client()
+    close_clients()
+    shutdown_cpu_pool()
+    if render_pool is not None:
+        render_pool.shutdown(cancel_futures=True)
+
+# Initialize FastAPI
+app = FastAPI(title="Alpaca Stock Info API", lifespan=lifespan)
+# JSON by default, MessagePack and data-only answers for the orchestrator
+add_negotiation(app)
+# ETag/304 and compression for repeated chart-link queries
+add_conditional_responses(app, ["/chart-links"])
+add_health_routes(app, warmup)
+
+# Chart data is built from daily bars, cache it per symbol and day
+cache = get_cache("chart")
+CHART_CACHE_TTL = int(os.getenv("CHART_CACHE_TTL", "900"))
+
+@app.get("/metrics")
+def metrics():
+    """Alpaca rate-limit, cache and CPU pool counters"""
+    return {"alpaca": throttle_metrics(), "cache": cache_metrics(), "cpu": cpu_metrics.as_dict()}
 
 @app.post("/chart-links", response_model=ChartResponse)
-def get_chart_links(request: SymbolRequest):
+async def get_chart_links(body: SymbolRequest, request: Request, response: Response):
     """Returns professional chart links for a stock symbol."""
-    symbol = request.symbol.upper()
-    
+    return await chart_links(body.symbol, request, response)
+
+@app.get("/chart-links", response_model=ChartResponse)
+async def get_chart_links_get(symbol: str, request: Request, response: Response):
+    """The same as GET (/chart-links?symbol=AAPL), for polling with ETag and 304."""
+    return await chart_links(symbol, request, response)
+
+async def chart_links(symbol: str, request: Request, response: Response):
+    symbol = symbol.upper()
+    day = datetime.now().date().isoformat()
+    # The links are cached per symbol and day, so that pair validates the answer
+    not_modified = precondition(request, response, symbol, day)
+    if not_modified is not None:
+        return not_modified
+    chart_data = await cache.get_or_set_async(
+        f"chart-links:{symbol}:{day}",
+        lambda: fetch_chart_links(symbol),
+        ttl=CHART_CACHE_TTL
+    )
+    return ChartResponse(**chart_data)
+
+async def fetch_chart_links(symbol: str) -> dict:
+    """Fetches recent daily bars without blocking and builds the chart response."""
     # Get basic data to verify symbol exists
-    stock_df = get_historical_data(data_client, symbol, days_back=5)
+    end_date = datetime.now() - timedelta(days=1)
+    try:
+        series = await get_daily_bars(symbol, start=end_date - timedelta(days=5), end=end_date)
+    except Exception as e:
+        print(f"Fehler beim Datenabruf: {e}")
+        series = None
     
-    if stock_df is None or stock_df.empty:
+    if series is None or series.empty:
         raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
-    
+    return build_chart_links(series)
+
+def build_chart_links(series) -> dict:
+    """Builds the chart response for a symbol from its recent bars (a BarSeries)."""
+    symbol = series.symbol
     # Calculate basic metrics
-    latest = stock_df.iloc[-1]
-    previous = stock_df.iloc[-2] if len(stock_df) > 1 else latest
-    current_price = float(latest['close'])
-    change_percent = ((current_price - float(previous['close'])) / float(previous['close'])) * 100
-    
-    # Format data
-    price_rounded = round(current_price, 2)
-    change_rounded = round(change_percent, 2)
-    
-    # Emojis based on performance
-    trend_emoji = "🟢" if change_percent >= 0 else "🔴"
-    change_sign = "+" if change_percent >= 0 else ""
+    current_price = series.last_close
+    change_percent = series.change_percent(1)
     
     # TradingView URL
     tv_url = f"https://www.tradingview.com/chart/?symbol={symbol}"
     yf_url = f"https://finance.yahoo.com/quote/{symbol}"
     
-    # Create formatted message for WhatsApp
-    formatted_msg = f"""📊 *{symbol} Stock Update*
+    data = {
+        "symbol": symbol,
+        "tradingview_url": tv_url,
+        "yahoo_finance_url": yf_url,
+        "current_price": round(current_price, 2),
+        "change_percent": round(change_percent, 2)
+    }
+    # Create formatted message for WhatsApp (stockm8_common.messages, shared with the orchestrator)
+    data["formatted_message"] = chart_links_message(data)
+    return data
 
-💰 Aktueller Preis: ${price_rounded}
-{trend_emoji} Veränderung: {change_sign}{change_rounded}%
+# Indicators: per-symbol rolling state, seeded once from INDICATOR_DAYS_BACK
+# days of bars and then advanced bar by bar (state lives per worker process)
+INDICATOR_DAYS_BACK = int(os.getenv("INDICATOR_DAYS_BACK", "100"))
+# A result never changes for a given last bar; only the "latest bar" pointer expires
+INDICATOR_RESULT_TTL = int(os.getenv("INDICATOR_RESULT_TTL", "86400"))
+indicator_states = {}
+indicator_locks = {}
+indicator_locks_guard = threading.Lock()
 
-🔗 *Charts ansehen:*
-📊 TradingView: {tv_url}
-📈 Yahoo Finance: {yf_url}
+@app.post("/indicators", response_model=IndicatorResponse)
+def get_indicators(request: SymbolRequest):
+    """Returns SMA, EMA, RSI, MACD, Bollinger Bands and ATR from daily bars."""
+    symbol = request.symbol.upper()
+    last_ts = cache.get(f"indicators:{symbol}:last-bar")
+    if last_ts is not None:
+        cached = cache.get(f"indicators:{symbol}:{last_ts}")
+        if cached is not None:
+            return IndicatorResponse(**cached)
+
+    state = update_indicator_state(symbol)
+    result = cache.get_or_set(
+        f"indicators:{symbol}:{state.last_ts}",
+        lambda: build_indicator_response(symbol, state),
+        ttl=INDICATOR_RESULT_TTL
+    )
+    cache.set(f"indicators:{symbol}:last-bar", state.last_ts, ttl=CHART_CACHE_TTL)
+    return IndicatorResponse(**result)
+
+def bar_arrays(stock_df):
+    """Timestamps (ns since epoch) and high/low/close columns as NumPy arrays."""
+    import numpy as np
+
+    ts = stock_df.index.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    return (
+        ts,
+        stock_df["high"].to_numpy(dtype=float),
+        stock_df["low"].to_numpy(dtype=float),
+        stock_df["close"].to_numpy(dtype=float)
+    )
+
+def update_indicator_state(symbol: str):
+    """Seeds the symbol's IndicatorState once, afterwards only fetches and applies new bars."""
+    from indicators import IndicatorState
+
+    with indicator_locks_guard:
+        lock = indicator_locks.setdefault(symbol, threading.Lock())
+    with lock:
+        state = indicator_states.get(symbol)
+        if state is None:
+            stock_df = get_historical_data(get_data_client(), symbol, days_back=INDICATOR_DAYS_BACK)
+            if stock_df is None or stock_df.empty:
+                raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
+            state = IndicatorState.from_bars(*bar_arrays(stock_df))
+            indicator_states[symbol] = state
+            return state
+
+        last_bar = datetime.fromtimestamp(state.last_ts / 1e9, tz=timezone.utc)
+        stock_df = get_historical_data(get_data_client(), symbol, start=last_bar)
+        if stock_df is not None and not stock_df.empty:
+            for ts, high, low, close in zip(*bar_arrays(stock_df)):
+                if ts > state.last_ts:
+                    state.update(int(ts), float(high), float(low), float(close))
+        return state
+
+def build_indicator_response(symbol: str, state) -> dict:
+    values = state.snapshot()
+    last_bar = datetime.fromtimestamp(state.last_ts / 1e9, tz=timezone.utc).date().isoformat()
+
+    def fmt(name):
+        value = values.get(name)
+        return f"{value:.2f}" if value is not None else "n/a"
+
+    formatted_msg = f"""📐 *{symbol} Technische Indikatoren* ({last_bar})
+
+💰 Schlusskurs: ${round(state.close, 2)}
+📈 SMA 20 / 50: {fmt('sma_20')} / {fmt('sma_50')}
+📉 EMA 12 / 26: {fmt('ema_12')} / {fmt('ema_26')}
+⚖️ RSI 14: {fmt('rsi_14')}
+🔀 MACD: {fmt('macd')} (Signal {fmt('macd_signal')})
+🎯 Bollinger: {fmt('bollinger_lower')} – {fmt('bollinger_upper')}
+🌊 ATR 14: {fmt('atr_14')}
 
 _Powered by StockM8 🚀_"""
-    
-    return ChartResponse(
-        symbol=symbol,
-        tradingview_url=tv_url,
-        yahoo_finance_url=yf_url,
-        current_price=price_rounded,
-        change_percent=change_rounded,
-        formatted_message=formatted_msg
-    )
\ No newline at end of file
+
+    return {
+        "symbol": symbol,
+        "last_bar": last_bar,
+        "close": round(state.close, 2),
+        "indicators": values,
+        "formatted_message": formatted_msg
+    }
+
+# Chart images: rendered in separate processes, cached by content key.
+# Range → (days of bars, default timeframe); 1D and 5D count trading sessions
+# instead, so a weekend request shows the last session like /intraday
+CHART_IMAGE_RANGES = {
+    "1D": (1, "5Min"), "5D": (5, "15Min"),
+    "1M": (31, "Day"), "3M": (92, "Day"), "6M": (183, "Day"), "1Y": (366, "Day")
+}
+CHART_IMAGE_SESSION_RANGES = {"1D", "5D"}
+CHART_RENDER_PROCESSES = int(os.getenv("CHART_RENDER_PROCESSES", "2"))
+CHART_RENDER_TIMEOUT = float(os.getenv("CHART_RENDER_TIMEOUT", "30"))
+# An image never changes for a given last bar; only the "latest image" pointer expires
+CHART_IMAGE_TTL = int(os.getenv("CHART_IMAGE_TTL", "86400"))
+# Intraday bars move every minute, so their pointers expire quickly
+CHART_INTRADAY_CACHE_TTL = int(os.getenv("CHART_INTRADAY_CACHE_TTL", "60"))
+render_pool = None
+render_pool_lock = threading.Lock()
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Process pool for rendering, created on first use in each worker."""
+    global render_pool
+    with render_pool_lock:
+        if render_pool is None:
+            # spawn: never fork a process that already runs threads and HTTP pools
+            render_pool = ProcessPoolExecutor(
+                max_workers=CHART_RENDER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return render_pool
+
+def parse_timeframe(timeframe: str) -> str:
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(status_code=400, detail=f"Unsupported timeframe {timeframe}, use one of {', '.join(TIMEFRAMES)}")
+    return timeframe
+
+@app.post("/chart-image")
+def get_chart_image(request: ChartImageRequest):
+    """Renders a candlestick chart (PNG or SVG) for a range and timeframe."""
+    symbol = request.symbol.upper()
+    range_label = request.range.upper()
+    fmt = request.format.lower()
+    if range_label not in CHART_IMAGE_RANGES:
+        raise HTTPException(status_code=400, detail=f"Unsupported range {request.range}, use one of {', '.join(CHART_IMAGE_RANGES)}")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format {request.format}, use one of {', '.join(FORMATS)}")
+    days_back, default_timeframe = CHART_IMAGE_RANGES[range_label]
+    timeframe = parse_timeframe(request.timeframe or default_timeframe)
+    pointer_ttl = CHART_CACHE_TTL if timeframe == "Day" else CHART_INTRADAY_CACHE_TTL
+
+    pointer_key = f"chart-image:{symbol}:{range_label}:{timeframe}:{fmt}:latest"
+    digest = cache.get(pointer_key)
+    image = cache.get(f"chart-image:{digest}") if digest else None
+    if image is None:
+        if range_label in CHART_IMAGE_SESSION_RANGES:
+            stock_df = get_recent_sessions(get_data_client(), symbol, days_back, timeframe)
+        else:
+            stock_df = get_historical_data(get_data_client(), symbol, days_back=days_back, timeframe=timeframe)
+        if stock_df is None or stock_df.empty:
+            raise HTTPException(status_code=404, detail=f"No data found for symbol {symbol}")
+        digest = chart_image_key(symbol, range_label, timeframe, stock_df.index[-1].isoformat(), fmt)
+        image = cache.get_or_set(
+            f"chart-image:{digest}",
+            lambda: render_chart(symbol, range_label, timeframe, fmt, stock_df),
+            ttl=CHART_IMAGE_TTL
+        )
+        cache.set(pointer_key, digest, ttl=pointer_ttl)
+
+    return Response(
+        content=image,
+        media_type=FORMATS[fmt],
+        headers={"Cache-Control": f"public, max-age={pointer_ttl}", "X-Chart-Key": digest}
+    )
+
+def chart_image_key(symbol: str, range_label: str, timeframe: str, last_bar: str, fmt: str) -> str:
+    """Content address of a chart image: same inputs, same picture."""
+    raw = f"{RENDERER_VERSION}|{symbol}|{range_label}|{timeframe}|{last_bar}|{fmt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def render_chart(symbol: str, range_label: str, timeframe: str, fmt: str, stock_df) -> bytes:
+    """Renders in the process pool; this request thread only waits for the bytes."""
+    if timeframe == "Day":
+        labels = [ts.strftime("%Y-%m-%d") for ts in stock_df.index]
+    else:
+        labels = [ts.tz_convert(MARKET_TIMEZONE).strftime("%m-%d %H:%M") for ts in stock_df.index]
+    future = get_render_pool().submit(
+        render_candlestick,
+        symbol,
+        range_label,
+        labels,
+        stock_df["open"].tolist(),
+        stock_df["high"].tolist(),
+        stock_df["low"].tolist(),
+        stock_df["close"].tolist(),
+        stock_df["volume"].tolist(),
+        fmt,
+        timeframe
+    )
+    return future.result(timeout=CHART_RENDER_TIMEOUT)
+
+@app.post("/intraday", response_model=IntradayResponse)
+def get_intraday(request: IntradayRequest):
+    """The latest trading session (or the last `days` sessions) in an intraday timeframe."""
+    symbol = request.symbol.upper()
+    timeframe = parse_timeframe(request.timeframe)
+    if timeframe == "Day":
+        raise HTTPException(status_code=400, detail="Use an intraday timeframe (1Min, 5Min, 15Min, Hour)")
+
+    stock_df = get_recent_sessions(get_data_client(), symbol, max(request.days, 1), timeframe)
+    if stock_df is None:
+        raise HTTPException(status_code=404, detail=f"No intraday data found for symbol {symbol}")
+
+    session_open = float(stock_df.iloc[0]["open"])
+    last_price = float(stock_df.iloc[-1]["close"])
+    high = float(stock_df["high"].max())
+    low = float(stock_df["low"].min())
+    change_percent = (last_price - session_open) / session_open * 100
+    last_bar = stock_df.index[-1].tz_convert(MARKET_TIMEZONE)
+
+    data = {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "open": round(session_open, 2),
+        "high": round(high, 2),
+        "low": round(low, 2),
+        "last_price": round(last_price, 2),
+        "change_percent": round(change_percent, 2),
+        "bars": len(stock_df),
+        "last_bar": last_bar.isoformat()
+    }
+    # The orchestrator asks for data only and renders the message itself
+    if not data_only_requested():
+        data["formatted_message"] = intraday_message(data)
+    return IntradayResponse(**data)
+
+# Local server run (WEB_CONCURRENCY sets the number of worker processes)
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("app:app", host="0.0.0.0", port=80, workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -1,28 +1,38 @@
 from datetime import datetime, timedelta
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
 
-def get_historical_data(data_client, symbol: str, days_back: int = 100):
-    """Holt historische Kursdaten für ein Symbol."""
+from stockm8_common.bars import MARKET_TIMEZONE, get_bars, intraday_end
+
+def get_historical_data(data_client, symbol: str, days_back: int = 100, start: datetime = None,
+                        timeframe: str = "Day"):
+    """
+    Holt historische Kursdaten für ein Symbol (ab `start`, sonst die letzten `days_back` Tage).
+
+    timeframe: 1Min, 5Min, 15Min, Hour oder Day. Intraday-Timeframes werden
+    aus gecachten 1-Minuten-Bars lokal berechnet (stockm8_common.bars).
+    """
     try:
-        # Use dates that are at least 15 minutes old for paper trading
-        end_date = datetime.now() - timedelta(days=1)  # Yesterday
-        start_date = end_date - timedelta(days=days_back)
-        
-        request_params = StockBarsRequest(
-            symbol_or_symbols=[symbol],
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=end_date
-        )
+        if timeframe == "Day":
+            # Use dates that are at least 15 minutes old for paper trading
+            end_date = datetime.now() - timedelta(days=1)  # Yesterday
+        else:
+            end_date = intraday_end()
+        start_date = start or end_date - timedelta(days=days_back)
 
-        bars = data_client.get_stock_bars(request_params)
-        df = bars.df
-        
-        if df.empty:
-            return None
-            
-        return df.reset_index(level=0, drop=True)
+        return get_bars(symbol, timeframe, start=start_date, end=end_date, data_client=data_client)
     except Exception as e:
         print(f"Fehler beim Datenabruf: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def get_recent_sessions(data_client, symbol: str, sessions: int, timeframe: str):
+    """
+    Bars der letzten `sessions` Handelstage (ohne Wochenenden und Feiertage).
+
+    Schaut sessions + 4 Kalendertage zurück und behält die letzten Handelstage,
+    so gibt es auch am Wochenende den letzten Handelstag statt keine Daten.
+    """
+    stock_df = get_historical_data(data_client, symbol, days_back=sessions + 4, timeframe=timeframe)
+    if stock_df is None or stock_df.empty:
+        return None
+    session_days = stock_df.index.tz_convert(MARKET_TIMEZONE).normalize()
+    return stock_df[session_days >= session_days.unique()[-sessions:][0]]
@@ -0,0 +1,289 @@
+"""
+Technische Indikatoren für den Chart Agent.
+
+Two ways to compute the same numbers:
+
+- vectorised NumPy functions over a whole bar window (sma, ema, rsi, macd,
+  bollinger, atr), used to seed a symbol
+- IndicatorState, which keeps the rolling state of every indicator and
+  absorbs one new bar in O(1)
+
+EMA-type indicators are seeded with the simple mean of their first `period`
+values; RSI and ATR use Wilder smoothing (alpha = 1 / period).
+"""
+
+from collections import deque
+from typing import Dict, Optional
+
+import numpy as np
+
+SMA_PERIODS = (20, 50)
+EMA_PERIODS = (12, 26)
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_PERIOD, BOLLINGER_STDDEV = 20, 2.0
+ATR_PERIOD = 14
+
+# Chunk length for the vectorised recursion below; keeps (1 - alpha) ** -k finite
+_EWM_CHUNK = 256
+
+
+def _ewm(values: np.ndarray, alpha: float, start: int, seed: float) -> np.ndarray:
+    """
+    y[start] = seed, y[t] = alpha * x[t] + (1 - alpha) * y[t-1] for t > start.
+
+    Solved in closed form per chunk instead of a Python loop:
+    y[t] = d^(t-s) * y[s] + alpha * sum_{k=s+1..t} d^(t-k) * x[k]
+    """
+    out = np.full(len(values), np.nan)
+    if start >= len(values):
+        return out
+    out[start] = seed
+    decay = 1.0 - alpha
+    carry = seed
+    position = start + 1
+    while position < len(values):
+        chunk = values[position:position + _EWM_CHUNK]
+        steps = np.arange(1, len(chunk) + 1)
+        powers = decay ** steps
+        weighted = np.cumsum(chunk / powers) * powers
+        result = powers * carry + alpha * weighted
+        out[position:position + len(chunk)] = result
+        carry = result[-1]
+        position += len(chunk)
+    return out
+
+
+def sma(close: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(close), np.nan)
+    if len(close) >= period:
+        sums = np.cumsum(np.insert(close, 0, 0.0))
+        out[period - 1:] = (sums[period:] - sums[:-period]) / period
+    return out
+
+
+def ema(close: np.ndarray, period: int) -> np.ndarray:
+    if len(close) < period:
+        return np.full(len(close), np.nan)
+    return _ewm(close, 2.0 / (period + 1), period - 1, float(close[:period].mean()))
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    delta = np.diff(close)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    alpha = 1.0 / period
+    avg_gain = _ewm(gains, alpha, period - 1, float(gains[:period].mean()))
+    avg_loss = _ewm(losses, alpha, period - 1, float(losses[:period].mean()))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + rs))
+    # delta[i] belongs to close[i + 1]
+    out[1:] = values
+    return out
+
+
+def macd(close: np.ndarray, fast: int = MACD_FAST, slow: int = MACD_SLOW, signal: int = MACD_SIGNAL):
+    """Returns (macd line, signal line, histogram)."""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = np.full(len(close), np.nan)
+    first = slow - 1
+    if len(close) >= first + signal:
+        valid = line[first:]
+        signal_line[first:] = _ewm(valid, 2.0 / (signal + 1), signal - 1, float(valid[:signal].mean()))
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close: np.ndarray, period: int = BOLLINGER_PERIOD, stddev: float = BOLLINGER_STDDEV):
+    """Returns (lower, middle, upper) with population standard deviation."""
+    middle = sma(close, period)
+    mean_of_squares = sma(close * close, period)
+    std = np.sqrt(np.maximum(mean_of_squares - middle * middle, 0.0))
+    return middle - stddev * std, middle, middle + stddev * std
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    previous = np.concatenate(([np.nan], close[:-1]))
+    ranges = np.vstack((high - low, np.abs(high - previous), np.abs(low - previous)))
+    tr = np.nanmax(ranges, axis=0)
+    tr[0] = high[0] - low[0]
+    return tr
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ATR_PERIOD) -> np.ndarray:
+    if len(close) <= period:
+        return np.full(len(close), np.nan)
+    # The first bar has no previous close, Wilder's ATR starts at bar `period`
+    tr = true_range(high, low, close)[1:]
+    out = np.full(len(close), np.nan)
+    out[1:] = _ewm(tr, 1.0 / period, period - 1, float(tr[:period].mean()))
+    return out
+
+
+class _Ewm:
+    """O(1) exponential average that seeds itself with the mean of its first values."""
+
+    __slots__ = ("alpha", "period", "value", "_seed_sum", "_seen")
+
+    def __init__(self, period: int, alpha: float):
+        self.period = period
+        self.alpha = alpha
+        self.value: Optional[float] = None
+        self._seed_sum = 0.0
+        self._seen = 0
+
+    def update(self, x: float) -> Optional[float]:
+        if self.value is None:
+            self._seed_sum += x
+            self._seen += 1
+            if self._seen == self.period:
+                self.value = self._seed_sum / self.period
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+
+class _Window:
+    """O(1) rolling mean and population standard deviation."""
+
+    __slots__ = ("period", "values", "total", "total_sq")
+
+    def __init__(self, period: int):
+        self.period = period
+        self.values = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, x: float) -> None:
+        if len(self.values) == self.period:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+
+    def mean(self) -> Optional[float]:
+        return self.total / self.period if len(self.values) == self.period else None
+
+    def std(self) -> Optional[float]:
+        mean = self.mean()
+        if mean is None:
+            return None
+        return max(self.total_sq / self.period - mean * mean, 0.0) ** 0.5
+
+
+class IndicatorState:
+    """
+    Rolling indicator state for one symbol.
+
+    update() consumes one bar in O(1); from_bars() seeds the state from a
+    whole window with the vectorised functions (same numbers, one pass).
+    """
+
+    __slots__ = ("last_ts", "close", "_prev_close", "_windows", "_emas", "_macd_signal",
+                 "_avg_gain", "_avg_loss", "_atr")
+
+    def __init__(self):
+        self.last_ts: Optional[int] = None
+        self.close: Optional[float] = None
+        self._prev_close: Optional[float] = None
+        self._windows = {period: _Window(period) for period in set(SMA_PERIODS) | {BOLLINGER_PERIOD}}
+        self._emas = {period: _Ewm(period, 2.0 / (period + 1)) for period in set(EMA_PERIODS) | {MACD_FAST, MACD_SLOW}}
+        self._macd_signal = _Ewm(MACD_SIGNAL, 2.0 / (MACD_SIGNAL + 1))
+        self._avg_gain = _Ewm(RSI_PERIOD, 1.0 / RSI_PERIOD)
+        self._avg_loss = _Ewm(RSI_PERIOD, 1.0 / RSI_PERIOD)
+        self._atr = _Ewm(ATR_PERIOD, 1.0 / ATR_PERIOD)
+
+    def update(self, ts: int, high: float, low: float, close: float) -> None:
+        """Adds one bar (timestamps must increase)."""
+        for window in self._windows.values():
+            window.update(close)
+        for average in self._emas.values():
+            average.update(close)
+        fast, slow = self._emas[MACD_FAST].value, self._emas[MACD_SLOW].value
+        if fast is not None and slow is not None:
+            self._macd_signal.update(fast - slow)
+        if self._prev_close is not None:
+            change = close - self._prev_close
+            self._avg_gain.update(max(change, 0.0))
+            self._avg_loss.update(max(-change, 0.0))
+            self._atr.update(max(high - low, abs(high - self._prev_close), abs(low - self._prev_close)))
+        self._prev_close = close
+        self.close = close
+        self.last_ts = ts
+
+    @classmethod
+    def from_bars(cls, ts: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> "IndicatorState":
+        """Seeds the state from a full bar window using the vectorised functions."""
+        state = cls()
+        n = len(close)
+        if n == 0:
+            return state
+        for period, window in state._windows.items():
+            for x in close[-period:]:
+                window.update(float(x))
+        for period, average in state._emas.items():
+            series = ema(close, period)
+            _seed(average, close, series)
+        line, signal_line, _ = macd(close)
+        first = MACD_SLOW - 1
+        _seed(state._macd_signal, line[first:] if n > first else line[:0], signal_line[first:] if n > first else line[:0])
+        delta = np.diff(close)
+        gains = np.where(delta > 0, delta, 0.0)
+        losses = np.where(delta < 0, -delta, 0.0)
+        _seed(state._avg_gain, gains, _ewm_or_nan(gains, RSI_PERIOD))
+        _seed(state._avg_loss, losses, _ewm_or_nan(losses, RSI_PERIOD))
+        tr = true_range(high, low, close)[1:]
+        _seed(state._atr, tr, _ewm_or_nan(tr, ATR_PERIOD))
+        state._prev_close = float(close[-1])
+        state.close = float(close[-1])
+        state.last_ts = int(ts[-1])
+        return state
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """Latest indicator values (None while not enough bars were seen)."""
+        fast, slow = self._emas[MACD_FAST].value, self._emas[MACD_SLOW].value
+        macd_line = fast - slow if fast is not None and slow is not None else None
+        signal = self._macd_signal.value
+        avg_gain, avg_loss = self._avg_gain.value, self._avg_loss.value
+        if avg_gain is None or avg_loss is None:
+            rsi_value = None
+        elif avg_loss == 0:
+            rsi_value = 100.0
+        else:
+            rsi_value = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+        bands = self._windows[BOLLINGER_PERIOD]
+        middle, std = bands.mean(), bands.std()
+        values = {f"sma_{period}": self._windows[period].mean() for period in SMA_PERIODS}
+        values.update({f"ema_{period}": self._emas[period].value for period in EMA_PERIODS})
+        values.update({
+            f"rsi_{RSI_PERIOD}": rsi_value,
+            "macd": macd_line,
+            "macd_signal": signal,
+            "macd_histogram": macd_line - signal if macd_line is not None and signal is not None else None,
+            "bollinger_lower": middle - BOLLINGER_STDDEV * std if middle is not None else None,
+            "bollinger_middle": middle,
+            "bollinger_upper": middle + BOLLINGER_STDDEV * std if middle is not None else None,
+            f"atr_{ATR_PERIOD}": self._atr.value,
+        })
+        return {name: (round(value, 4) if value is not None else None) for name, value in values.items()}
+
+
+def _ewm_or_nan(values: np.ndarray, period: int) -> np.ndarray:
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    return _ewm(values, 1.0 / period, period - 1, float(values[:period].mean()))
+
+
+def _seed(average: _Ewm, inputs: np.ndarray, series: np.ndarray) -> None:
+    """Puts an _Ewm into the state it would have after consuming `inputs`."""
+    if len(series) and not np.isnan(series[-1]):
+        average.value = float(series[-1])
+        average._seen = average.period
+    else:
+        for x in inputs:
+            average.update(float(x))
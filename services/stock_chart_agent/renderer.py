@@ -0,0 +1,61 @@
+"""
+Candlestick-Charts als PNG/SVG rendern (headless, nur CPU).
+
+render_candlestick() is a pure function of its arguments so it can run in a
+ProcessPoolExecutor: matplotlib is imported inside the worker process with
+the Agg backend and nothing is shared with the API process. Output is
+deterministic (no timestamps in the file metadata, fixed SVG hash salt),
+which keeps the content-addressed image cache stable.
+"""
+
+from typing import Sequence
+
+# Bump when the chart layout changes so cached images are not reused
+RENDERER_VERSION = 2
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+UP_COLOR = "#26a69a"
+DOWN_COLOR = "#ef5350"
+
+
+def render_candlestick(symbol: str, range_label: str, dates: Sequence[str], opens: Sequence[float],
+                       highs: Sequence[float], lows: Sequence[float], closes: Sequence[float],
+                       volumes: Sequence[float], fmt: str = "png", timeframe: str = "Day") -> bytes:
+    """Renders a candlestick chart with a volume pane and returns the image bytes."""
+    import io
+
+    import matplotlib
+    matplotlib.use("Agg")
+    matplotlib.rcParams["svg.hashsalt"] = "stockm8"
+    from matplotlib.figure import Figure
+
+    x = range(len(closes))
+    colors = [UP_COLOR if c >= o else DOWN_COLOR for o, c in zip(opens, closes)]
+    bottoms = [min(o, c) for o, c in zip(opens, closes)]
+    heights = [max(abs(c - o), 1e-6) for o, c in zip(opens, closes)]
+
+    # Figure() instead of pyplot: no global state, safe in long-lived workers
+    fig = Figure(figsize=(10, 6), dpi=100)
+    price_ax, volume_ax = fig.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+    price_ax.vlines(x, lows, highs, colors=colors, linewidth=1)
+    price_ax.bar(x, heights, bottom=bottoms, color=colors, width=0.6)
+    bar_label = "Tageskerzen" if timeframe == "Day" else f"{timeframe}-Kerzen"
+    price_ax.set_title(f"{symbol} · {range_label} · {bar_label}")
+    price_ax.set_ylabel("Preis ($)")
+    price_ax.grid(True, alpha=0.3)
+
+    volume_ax.bar(x, volumes, color=colors, width=0.6)
+    volume_ax.set_ylabel("Volumen")
+    volume_ax.grid(True, alpha=0.3)
+
+    step = max(len(dates) // 8, 1)
+    ticks = list(range(0, len(dates), step))
+    volume_ax.set_xticks(ticks)
+    volume_ax.set_xticklabels([dates[i] for i in ticks], rotation=30, ha="right")
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    metadata = {"Date": None} if fmt == "svg" else {"Software": None}
+    fig.savefig(buffer, format=fmt, metadata=metadata)
+    return buffer.getvalue()
@@ -1,25 +1,54 @@
+import asyncio
 import os
-import pandas as pd
-from fastapi import FastAPI, HTTPException
+import sys
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from pydantic import BaseModel
+from typing import Optional
 from dotenv import load_dotenv
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockBarsRequest
-from alpaca.data.timeframe import TimeFrame
 from datetime import datetime, timedelta
 
 # Load environment variables
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-app = FastAPI(title="Stock Comparison Agent")
+# Shared StockM8 library (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import (
+    Warmup, add_conditional_responses, add_health_routes, add_negotiation, cache_metrics, close_async_data_client,
+    close_clients, cpu_metrics, data_only_requested, get_async_data_client, get_cache, get_daily_bars, precondition,
+    shutdown_cpu_pool, throttle_metrics
+)
+from stockm8_common.messages import comparison_message
 
-# Initialize Alpaca client
-data_client = StockHistoricalDataClient(
-    os.getenv("APCA_API_KEY_ID"),
-    os.getenv("APCA_API_SECRET_KEY")
+# numpy and httpx are imported in the background after startup (or on first use)
+warmup = Warmup(
+    modules=["numpy", "httpx", "stockm8_common.bar_series"],
+    hooks=[("data_client", get_async_data_client)]
 )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The shared, rate-limit-aware async Alpaca client is created in each
+    # worker process by the warm-up, never at import time
+    warmup.start()
+    yield
+    await close_async_data_client()
+    close_clients()
+    shutdown_cpu_pool()
+
+app = FastAPI(title="Stock Comparison Agent", lifespan=lifespan)
+# JSON by default, MessagePack and data-only answers for the orchestrator
+add_negotiation(app)
+# ETag/304 and compression for repeated comparisons
+add_conditional_responses(app, ["/compare"])
+add_health_routes(app, warmup)
+
+# Daily bars only change once per day, so per-symbol data is shared across
+# requests, workers and replicas
+cache = get_cache("comparison")
+STOCK_DATA_TTL = int(os.getenv("COMPARISON_CACHE_TTL", "900"))
+
 class ComparisonRequest(BaseModel):
     symbol1: str
     symbol2: str
@@ -34,143 +63,101 @@ class StockData(BaseModel):
 class ComparisonResponse(BaseModel):
     stock1: StockData
     stock2: StockData
-    formatted_message: str
+    formatted_message: Optional[str] = None
+
+def bar_day() -> str:
+    """Letzter Tag der Tagesbars (gestern): Daten und Antwort ändern sich nur mit ihm"""
+    return (datetime.now() - timedelta(days=1)).date().isoformat()
+
+async def get_stock_data(symbol: str):
+    """Preisdaten und Performance für ein Symbol, aus dem Cache wenn möglich"""
+    return await cache.get_or_set_async(
+        f"stock:{symbol}:{bar_day()}",
+        lambda: fetch_stock_data(symbol),
+        ttl=STOCK_DATA_TTL
+    )
 
-def get_stock_data(symbol: str):
+async def fetch_stock_data(symbol: str):
     """Holt Preisdaten für ein Symbol und berechnet Performance"""
     try:
         # Zeiträume definieren
         end_date = datetime.now() - timedelta(days=1)  # Paper Trading
         start_date = end_date - timedelta(days=30)
         
-        # Daten holen
-        request = StockBarsRequest(
-            symbol_or_symbols=symbol,
-            timeframe=TimeFrame.Day,
-            start=start_date,
-            end=end_date
-        )
+        # Tagesbars asynchron über httpx, als NumPy-Spalten (stockm8_common.bar_series)
+        series = await get_daily_bars(symbol, start=start_date, end=end_date)
         
-        bars = data_client.get_stock_bars(request)
-        df = bars.df
-        
-        if df.empty:
+        if series is None:
             return None
         
-        # Multi-index für ein Symbol auflösen
-        if isinstance(df.index, pd.MultiIndex):
-            df = df.xs(symbol, level='symbol')
-        
-        # Preise extrahieren
-        current_price = float(df.iloc[-1]['close'])
-        price_1d_ago = float(df.iloc[-2]['close']) if len(df) > 1 else current_price
-        price_1w_ago = float(df.iloc[-5]['close']) if len(df) > 5 else current_price
-        price_1m_ago = float(df.iloc[0]['close'])
-        
-        # Änderungen berechnen
-        change_1d = ((current_price - price_1d_ago) / price_1d_ago) * 100
-        change_1w = ((current_price - price_1w_ago) / price_1w_ago) * 100
-        change_1m = ((current_price - price_1m_ago) / price_1m_ago) * 100
-        
-        return {
-            "symbol": symbol,
-            "current_price": round(current_price, 2),
-            "change_1d": round(change_1d, 2),
-            "change_1w": round(change_1w, 2),
-            "change_1m": round(change_1m, 2)
-        }
+        return stock_performance(series)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching data for {symbol}: {str(e)}")
 
+def stock_performance(series):
+    """Aktueller Preis und Veränderung über 1 Tag, 1 Woche und 1 Monat aus einer BarSeries"""
+    # Preise extrahieren
+    current_price = series.last_close
+    price_1d_ago = series.close_ago(1)
+    price_1w_ago = series.close_ago(4) if len(series) > 5 else current_price
+    price_1m_ago = float(series.close[0])
+    
+    # Änderungen berechnen
+    change_1d = ((current_price - price_1d_ago) / price_1d_ago) * 100
+    change_1w = ((current_price - price_1w_ago) / price_1w_ago) * 100
+    change_1m = ((current_price - price_1m_ago) / price_1m_ago) * 100
+    
+    return {
+        "symbol": series.symbol,
+        "current_price": round(current_price, 2),
+        "change_1d": round(change_1d, 2),
+        "change_1w": round(change_1w, 2),
+        "change_1m": round(change_1m, 2)
+    }
+
 @app.get("/")
 def read_root():
-    return {"status": "Stock Comparison Agent is running", "endpoints": ["/compare"]}
+    return {"status": "Stock Comparison Agent is running", "endpoints": ["/compare", "/metrics", "/healthz", "/readyz", "/startup-profile"]}
+
+@app.get("/metrics")
+def metrics():
+    """Alpaca rate-limit, cache and CPU pool counters"""
+    return {"alpaca": throttle_metrics(), "cache": cache_metrics(), "cpu": cpu_metrics.as_dict()}
 
 @app.post("/compare", response_model=ComparisonResponse)
-def compare_stocks(request: ComparisonRequest):
+async def compare_stocks(body: ComparisonRequest, request: Request, response: Response):
     """Vergleicht zwei Aktien nebeneinander"""
+    return await compare(body.symbol1, body.symbol2, request, response)
+
+@app.get("/compare", response_model=ComparisonResponse)
+async def compare_stocks_get(symbol1: str, symbol2: str, request: Request, response: Response):
+    """Dasselbe als GET (/compare?symbol1=AAPL&symbol2=MSFT), für Abfragen mit ETag und 304"""
+    return await compare(symbol1, symbol2, request, response)
+
+async def compare(symbol1: str, symbol2: str, request: Request, response: Response):
+    symbol1 = symbol1.upper()
+    symbol2 = symbol2.upper()
     
-    symbol1 = request.symbol1.upper()
-    symbol2 = request.symbol2.upper()
+    # Die Antwort hängt nur an den Symbolen und dem Bar-Tag: ETag prüfen, bevor etwas gebaut wird
+    not_modified = precondition(request, response, symbol1, symbol2, bar_day())
+    if not_modified is not None:
+        return not_modified
     
-    # Daten für beide Aktien holen
-    stock1_data = get_stock_data(symbol1)
-    stock2_data = get_stock_data(symbol2)
+    # Daten für beide Aktien gleichzeitig holen
+    stock1_data, stock2_data = await asyncio.gather(get_stock_data(symbol1), get_stock_data(symbol2))
     
     if not stock1_data or not stock2_data:
         raise HTTPException(status_code=404, detail="Could not fetch data for one or both symbols")
     
-    # Formatierte Nachricht erstellen
-    message_parts = []
-    
-    # Header
-    message_parts.append(f"📊 STOCK COMPARISON")
-    message_parts.append(f"{symbol1} vs {symbol2}")
-    message_parts.append("")
-    
-    # Vergleichstabelle
-    message_parts.append("📈 CURRENT PRICE")
-    message_parts.append(f"• {symbol1}: ${stock1_data['current_price']}")
-    message_parts.append(f"• {symbol2}: ${stock2_data['current_price']}")
-    message_parts.append("")
-    
-    # 1-Day Performance
-    emoji1_1d = "🟢" if stock1_data['change_1d'] >= 0 else "🔴"
-    emoji2_1d = "🟢" if stock2_data['change_1d'] >= 0 else "🔴"
-    sign1_1d = "+" if stock1_data['change_1d'] >= 0 else ""
-    sign2_1d = "+" if stock2_data['change_1d'] >= 0 else ""
-    
-    message_parts.append("📅 1-DAY CHANGE")
-    message_parts.append(f"• {symbol1}: {sign1_1d}{stock1_data['change_1d']}% {emoji1_1d}")
-    message_parts.append(f"• {symbol2}: {sign2_1d}{stock2_data['change_1d']}% {emoji2_1d}")
-    message_parts.append("")
-    
-    # 1-Week Performance
-    emoji1_1w = "🟢" if stock1_data['change_1w'] >= 0 else "🔴"
-    emoji2_1w = "🟢" if stock2_data['change_1w'] >= 0 else "🔴"
-    sign1_1w = "+" if stock1_data['change_1w'] >= 0 else ""
-    sign2_1w = "+" if stock2_data['change_1w'] >= 0 else ""
-    
-    message_parts.append("📆 1-WEEK CHANGE")
-    message_parts.append(f"• {symbol1}: {sign1_1w}{stock1_data['change_1w']}% {emoji1_1w}")
-    message_parts.append(f"• {symbol2}: {sign2_1w}{stock2_data['change_1w']}% {emoji2_1w}")
-    message_parts.append("")
+    data = {"stock1": stock1_data, "stock2": stock2_data}
+    # Formatierte Nachricht (stockm8_common.messages); der Orchestrator rendert sie selbst
+    if not data_only_requested():
+        data["formatted_message"] = comparison_message(data)
     
-    # 1-Month Performance
-    emoji1_1m = "🟢" if stock1_data['change_1m'] >= 0 else "🔴"
-    emoji2_1m = "🟢" if stock2_data['change_1m'] >= 0 else "🔴"
-    sign1_1m = "+" if stock1_data['change_1m'] >= 0 else ""
-    sign2_1m = "+" if stock2_data['change_1m'] >= 0 else ""
-    
-    message_parts.append("🗓️ 1-MONTH CHANGE")
-    message_parts.append(f"• {symbol1}: {sign1_1m}{stock1_data['change_1m']}% {emoji1_1m}")
-    message_parts.append(f"• {symbol2}: {sign2_1m}{stock2_data['change_1m']}% {emoji2_1m}")
-    message_parts.append("")
-    
-    # Winner
-    total1 = stock1_data['change_1d'] + stock1_data['change_1w'] + stock1_data['change_1m']
-    total2 = stock2_data['change_1d'] + stock2_data['change_1w'] + stock2_data['change_1m']
-    
-    if total1 > total2:
-        winner = f"🏆 {symbol1} is outperforming {symbol2}"
-    elif total2 > total1:
-        winner = f"🏆 {symbol2} is outperforming {symbol1}"
-    else:
-        winner = f"⚖️ Both stocks are performing equally"
-    
-    message_parts.append(winner)
-    message_parts.append("")
-    message_parts.append("🤖 Powered by StockM8")
-    
-    formatted_message = "\n".join(message_parts)
-    
-    return ComparisonResponse(
-        stock1=StockData(**stock1_data),
-        stock2=StockData(**stock2_data),
-        formatted_message=formatted_message
-    )
+    return ComparisonResponse(**data)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=80)
+    # WEB_CONCURRENCY sets the number of worker processes
+    uvicorn.run("app:app", host="0.0.0.0", port=80, workers=int(os.getenv("WEB_CONCURRENCY", "1")))
@@ -4,7 +4,10 @@ Stock Ordering Agent - Einfache Version für Anfänger
 
 Was macht dieser Agent?
 - Platziert Kauf/Verkauf Orders bei Alpaca (Paper Trading)
+- Prüft Orders vorher lokal (pretrade.py): Symbol, Bestand, Buying Power, Limit
 - Checkt ob die Börse offen ist
+- Verfolgt Orders live (Trade-Update-Stream) und meldet Fills an n8n
+- Führt bedingte und geplante Orders aus (rules.py), z.B. "Kaufe AAPL unter 180"
 - Gibt formatierte Nachrichten zurück
 
 Endpoints:
@@ -12,15 +15,33 @@ Endpoints:
 - GET  /market-status  → Ist die Börse offen?
 - POST /order/market   → Kaufe/Verkaufe zum aktuellen Preis
 - POST /order/limit    → Kaufe/Verkaufe nur zu bestimmtem Preis
+- POST /order/stop          → Stop Order (wird zur Market Order ab Stop-Preis)
+- POST /order/stop-limit    → Stop-Limit Order (wird zur Limit Order ab Stop-Preis)
+- POST /order/trailing-stop → Stop, der dem Kurs nachläuft ($ oder %)
+- POST /order/bracket  → Einstieg + Take-Profit und/oder Stop-Loss in EINER Order
+- POST /order/oco      → Ausstieg: Take-Profit ODER Stop-Loss (One-Cancels-Other)
+- GET  /orders/{id}    → Aktueller Stand einer Order
+- GET  /orders/events  → Long-Poll: wartet auf neue Order-Events
+- GET  /orders/stream  → Dieselben Events als Server-Sent Events (SSE)
+- POST /rules          → Neue Regel (Preis-Schwelle oder Zeitplan)
+- GET  /rules          → Alle Regeln
+- GET  /rules/{id}     → Eine Regel
+- DELETE /rules/{id}   → Regel löschen
+- GET  /metrics        → Rate-Limit, Cache, Pre-Trade und Regel Zähler
+- GET  /healthz        → Prozess lebt (Liveness)
+- GET  /readyz         → Bereit für Anfragen (Readiness)
 """
 
 import os
-from fastapi import FastAPI, HTTPException
+import sys
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
 from dotenv import load_dotenv
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest, LimitOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce
 
 # ============================================================================
 # SCHRITT 1: Umgebung einrichten
@@ -30,17 +51,107 @@ from alpaca.trading.enums import OrderSide, TimeInForce
 dotenv_path = os.path.join(os.path.dirname(__file__), '../../.env')
 load_dotenv(dotenv_path=dotenv_path)
 
-# Erstelle FastAPI App
-app = FastAPI(title="Stock Ordering Agent")
+# Gemeinsame StockM8 Bibliothek (services/stockm8_common)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from stockm8_common import (
+    Warmup, add_conditional_responses, add_health_routes, add_negotiation, cache_metrics, close_clients,
+    get_data_client, get_trading_client, precondition, throttle_metrics
+)
+
+# Lokale Prüfungen vor dem Senden einer Order
+import pretrade
+from pretrade import PreTradeError
+
+# Order-Status live über den Trade-Update-Stream
+from order_updates import N8N_FILL_WEBHOOK_URL, FillWebhook, OrderTable, TradeUpdateFeed, order_to_dict
+
+# Bedingte und geplante Orders
+from rules import RULES_DB_PATH, WEEKDAYS, RuleEngine, RuleError, RuleStore, parse_time_of_day
+
+def trading_client():
+    """
+    Geteilter Alpaca Client mit Rate-Limit, Retries und Connection-Pool
+
+    Wird pro Worker-Prozess beim ersten Aufruf erstellt, nie beim Import.
+    """
+    return get_trading_client(paper=True)  # WICHTIG: Paper Trading = virtuelles Geld!
+
+
+def connect_trading_client():
+    """Verbinde mit Alpaca Paper Trading Account (einmal pro Worker)"""
+    trading_client()
+    print(f"✅ Verbindung zu Alpaca Paper Trading hergestellt! (Worker PID {os.getpid()})")
+
+
+# Order-Tabelle im Speicher. WICHTIG: nur 1 Worker-Prozess (docker-compose),
+# sonst hätte jeder Worker seinen eigenen Stream und n8n bekäme Fills doppelt
+order_table = OrderTable()
+fill_webhook = FillWebhook(N8N_FILL_WEBHOOK_URL)
+trade_feed = None
+ORDER_UPDATES_STREAM = os.getenv("ORDER_UPDATES_STREAM", "true").lower() == "true"
+
+
+def start_trade_updates():
+    """Startet den Trade-Update-Stream und den Webhook-Thread (einmal beim Start)"""
+    global trade_feed
+    fill_webhook.start()
+    if ORDER_UPDATES_STREAM:
+        trade_feed = TradeUpdateFeed(
+            order_table, fill_webhook, os.getenv("APCA_API_KEY_ID"), os.getenv("APCA_API_SECRET_KEY"), paper=True
+        )
+        trade_feed.start()
+
+
+# Regel-Engine (eigener Thread, gleicher Grund für nur 1 Worker wie oben)
+rule_engine = None
+
 
-# Verbinde mit Alpaca Paper Trading Account
-trading_client = TradingClient(
-    api_key=os.getenv("APCA_API_KEY_ID"),      # Dein API Key
-    secret_key=os.getenv("APCA_API_SECRET_KEY"),  # Dein Secret Key
-    paper=True  # WICHTIG: Paper Trading = virtuelles Geld!
+def start_rule_engine():
+    """Lädt gespeicherte Regeln und startet den Regel-Thread (einmal beim Start)"""
+    global rule_engine
+    engine = RuleEngine(execute_rule, RuleStore(RULES_DB_PATH))
+    loaded = engine.load()
+    engine.start()
+    rule_engine = engine
+    print(f"✅ Regel-Engine läuft ({loaded} aktive Regeln geladen)")
+
+
+# alpaca-py wird nach dem Start im Hintergrund geladen (oder beim ersten Aufruf),
+# damit der Container sofort HTTP beantwortet. /readyz meldet, wann alles bereit ist.
+warmup = Warmup(
+    modules=[
+        "alpaca.trading.client", "alpaca.trading.requests", "alpaca.trading.enums",
+        "alpaca.data.requests", "alpaca.trading.stream"
+    ],
+    hooks=[
+        ("trading_client", connect_trading_client),
+        ("data_client", get_data_client),
+        ("trade_updates", start_trade_updates),
+        ("rule_engine", start_rule_engine),
+        ("asset_table", pretrade.load_asset_table)  # Pre-Trade Checks ab der ersten Order schnell
+    ]
 )
 
-print("✅ Verbindung zu Alpaca Paper Trading hergestellt!")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warmup.start()
+    yield
+    if trade_feed is not None:
+        trade_feed.stop()
+    if rule_engine is not None:
+        rule_engine.stop()
+    fill_webhook.stop()
+    close_clients()
+
+
+# Erstelle FastAPI App
+app = FastAPI(title="Stock Ordering Agent", lifespan=lifespan)
+# JSON by default, MessagePack and data-only answers for the orchestrator
+add_negotiation(app)
+# ETag/304 and compression for polled status reads
+add_conditional_responses(app, ["/market-status"])
+add_health_routes(app, warmup)
 
 
 # ============================================================================
@@ -49,26 +160,108 @@ print("✅ Verbindung zu Alpaca Paper Trading hergestellt!")
 
 class MarketOrderInput(BaseModel):
     """Was der User schickt für eine Market Order"""
-    symbol: str        # z.B. "AAPL", "TSLA"
-    qty: int = 1       # Anzahl Aktien (Standard: 1)
-    side: str = "buy"  # "buy" oder "sell"
+    symbol: str                       # z.B. "AAPL", "TSLA"
+    qty: Optional[float] = None       # Anzahl Aktien, auch Bruchteile wie 0.5 (Standard: 1)
+    notional: Optional[float] = None  # ODER Dollar-Betrag, z.B. 500 → für $500 kaufen
+    side: str = "buy"                 # "buy" oder "sell"
+    client_order_id: Optional[str] = None  # Alpaca lehnt eine zweite Order mit derselben ID ab
 
 class LimitOrderInput(BaseModel):
     """Was der User schickt für eine Limit Order"""
     symbol: str
-    qty: int = 1
+    qty: float = 1
     side: str = "buy"
     limit_price: float  # Preis bei dem gekauft/verkauft werden soll
+    client_order_id: Optional[str] = None
+
+class StopOrderInput(BaseModel):
+    """Stop Order: wird zur Market Order, sobald der Kurs stop_price erreicht"""
+    symbol: str
+    qty: float = 1
+    side: str = "sell"
+    stop_price: Optional[float] = None    # Stop-Preis in $
+    stop_percent: Optional[float] = None  # ODER Abstand zum aktuellen Kurs in %
+
+class StopLimitOrderInput(BaseModel):
+    """Stop-Limit Order: wird zur Limit Order, sobald der Kurs stop_price erreicht"""
+    symbol: str
+    qty: float = 1
+    side: str = "sell"
+    stop_price: float
+    limit_price: float
+
+class TrailingStopOrderInput(BaseModel):
+    """Trailing Stop: Stop-Preis läuft dem Kurs nach (fester $-Abstand oder %)"""
+    symbol: str
+    qty: float = 1
+    side: str = "sell"
+    trail_percent: Optional[float] = None
+    trail_price: Optional[float] = None
+
+class BracketOrderInput(BaseModel):
+    """
+    Einstieg mit Schutz: Take-Profit und/oder Stop-Loss werden mitgeschickt
+
+    Beide angegeben → Bracket Order, nur eins → OTO (One-Triggers-Other).
+    Preise absolut ($) oder in % vom Einstiegspreis.
+    """
+    symbol: str
+    qty: Optional[float] = None       # nur ganze Aktien
+    notional: Optional[float] = None  # ODER Dollar-Betrag (wird in ganze Aktien umgerechnet)
+    side: str = "buy"
+    limit_price: Optional[float] = None  # Einstieg als Limit Order (sonst Market)
+    take_profit: Optional[float] = None
+    take_profit_percent: Optional[float] = None
+    stop_loss: Optional[float] = None
+    stop_loss_percent: Optional[float] = None
+    stop_loss_limit: Optional[float] = None  # Stop-Loss als Stop-Limit
+
+class OcoOrderInput(BaseModel):
+    """Ausstieg aus einer Position: Take-Profit ODER Stop-Loss, der andere wird storniert"""
+    symbol: str
+    qty: float = 1  # nur ganze Aktien
+    side: str = "sell"
+    take_profit: Optional[float] = None
+    take_profit_percent: Optional[float] = None
+    stop_loss: Optional[float] = None
+    stop_loss_percent: Optional[float] = None
+    stop_loss_limit: Optional[float] = None
+
+class RuleInput(BaseModel):
+    """
+    Regel: Order wird gesendet, wenn der Auslöser eintritt
+    
+    trigger:
+    - "price_below" / "price_above" mit price → einmalig, wenn der Kurs die Schwelle erreicht
+    - "schedule" mit every ("monday" ... "sunday", "weekday", "day") und at → wiederkehrend
+    - "once" mit run_at (ISO-Zeitpunkt) → einmalig zu diesem Zeitpunkt
+    """
+    symbol: str
+    side: str = "buy"
+    qty: Optional[float] = None
+    notional: Optional[float] = None
+    limit_price: Optional[float] = None  # Limit Order statt Market Order
+    trigger: str
+    price: Optional[float] = None
+    every: Optional[str] = None
+    at: str = "09:35"                    # Uhrzeit New York (Börse öffnet 09:30)
+    run_at: Optional[str] = None
+
+class RuleResponse(BaseModel):
+    rule: dict
+    formatted_message: str
 
 class OrderResponse(BaseModel):
     """Was der Agent zurückgibt"""
-    order_id: str           # Eindeutige Order ID
-    symbol: str             # Aktien-Symbol
-    qty: int                # Anzahl
-    side: str               # "buy" oder "sell"
-    status: str             # "accepted", "filled", etc.
-    order_type: str         # "market" oder "limit"
-    formatted_message: str  # Schöne Nachricht für User
+    order_id: str                     # Eindeutige Order ID
+    symbol: str                       # Aktien-Symbol
+    qty: Optional[float] = None       # Anzahl (None bei Dollar-Betrag)
+    notional: Optional[float] = None  # Dollar-Betrag (nur bei notional Orders)
+    side: str                         # "buy" oder "sell"
+    status: str                       # "accepted", "filled", etc.
+    order_type: str                   # "market", "limit", "stop", "bracket", ...
+    legs: List[str] = []              # IDs der Take-Profit/Stop-Loss Orders
+    formatted_message: str            # Schöne Nachricht für User
 
 
 # ============================================================================
@@ -83,7 +276,7 @@ def check_market_status():
         tuple: (is_open: bool, warning_message: str)
     """
     try:
-        clock = trading_client.get_clock()
+        clock = trading_client().get_clock()
         
         if not clock.is_open:
             warning = f"\n⚠️ Börse ist GESCHLOSSEN\n⏰ Öffnet wieder: {clock.next_open}\n📝 Order wird bei Öffnung ausgeführt\n"
@@ -94,6 +287,129 @@ def check_market_status():
         return True, ""  # Falls Check fehlschlägt, trotzdem Order erlauben
 
 
+def order_side(side: str):
+    """Text aus der Anfrage ("buy"/"sell") → OrderSide.BUY/SELL"""
+    from alpaca.trading.enums import OrderSide
+
+    return OrderSide.BUY if side.lower() == "buy" else OrderSide.SELL
+
+
+def order_time_in_force(qty: Optional[float] = None, notional: Optional[float] = None):
+    """
+    Bruchteile und Dollar-Beträge erlaubt Alpaca nur als Tages-Order (DAY),
+    ganze Aktien bleiben bis zur Ausführung oder Stornierung (GTC)
+    """
+    from alpaca.trading.enums import TimeInForce
+
+    if notional is not None or (qty is not None and qty != int(qty)):
+        return TimeInForce.DAY
+    return TimeInForce.GTC
+
+
+def round_price(price: float) -> float:
+    """Alpaca akzeptiert ab $1 nur 2 Nachkommastellen, darunter 4"""
+    return round(price, 2 if price >= 1 else 4)
+
+
+def reference_price(symbol: str, limit_price: Optional[float] = None, required: bool = True) -> Optional[float]:
+    """Einstiegspreis für %-Angaben: Limit-Preis, sonst aktueller Kurs (aus dem Cache)"""
+    try:
+        price = pretrade.estimate_price(symbol, limit_price)
+    except Exception:
+        price = None
+    if price is None and required:
+        raise PreTradeError(f"❌ Kein aktueller Kurs für {symbol} verfügbar, bitte Preise in $ angeben")
+    return price
+
+
+def price_level(price: Optional[float], percent: Optional[float], reference: Optional[float], above: bool) -> Optional[float]:
+    """
+    Preis in $ aus absoluter Angabe oder %-Abstand zum Referenzpreis
+
+    Beispiel: percent=5, reference=100, above=False → 95.0
+    """
+    if price is not None:
+        return round_price(price)
+    if percent is None:
+        return None
+    if not 0 < percent < 100:
+        raise PreTradeError("❌ Prozent-Angaben müssen zwischen 0 und 100 liegen")
+    factor = 1 + percent / 100 if above else 1 - percent / 100
+    return round_price(reference * factor)
+
+
+def whole_shares(qty: float, order_label: str) -> int:
+    """Bracket, OCO und Trailing Stop gehen bei Alpaca nur mit ganzen Aktien"""
+    if qty != int(qty):
+        raise PreTradeError(f"❌ {order_label} Orders gehen nur mit ganzen Aktien (nicht {qty:g})")
+    return int(qty)
+
+
+def submit(order_data):
+    """Sendet die Order an Alpaca, leert den Konto-Cache und trägt sie in die Order-Tabelle ein"""
+    result = trading_client().submit_order(order_data=order_data)
+    pretrade.invalidate_account()
+    order_table.upsert(order_to_dict(result))
+    return result
+
+
+def order_failure(error: Exception) -> HTTPException:
+    """
+    Fehler beim Platzieren → HTTP-Antwort
+
+    Eindeutige Ablehnungen sind 4xx, die Order existiert dann nicht:
+    - Alpaca antwortet 4xx (z.B. zu wenig Buying Power, Asset nicht handelbar,
+      ungültiger Preis) → 422 mit der Meldung des Brokers (429 bleibt 429)
+    - Die Order-Daten sind ungültig (ValueError, pydantic ValidationError der
+      Request-Modelle) → 422
+    Nur Verbindungs- und unbekannte Fehler werden 500: dort ist unklar, ob
+    die Order bei Alpaca angekommen ist.
+    """
+    from alpaca.common.exceptions import APIError
+    from pydantic import ValidationError
+
+    if isinstance(error, APIError) and error.status_code is not None and 400 <= error.status_code < 500:
+        try:
+            message = error.message
+        except (ValueError, KeyError, TypeError):
+            message = str(error)
+        status = 429 if error.status_code == 429 else 422
+        return HTTPException(status_code=status, detail=f"❌ Von Alpaca abgelehnt: {message}")
+    if isinstance(error, ValidationError) and not error.title.endswith("Response"):
+        # Nicht die OrderResponse: die entsteht erst nach dem Senden
+        return HTTPException(status_code=422, detail=f"❌ Ungültige Order: {error.errors()[0]['msg']}")
+    if isinstance(error, ValueError) and not isinstance(error, ValidationError):
+        return HTTPException(status_code=422, detail=f"❌ Ungültige Order: {error}")
+    return HTTPException(status_code=500, detail=f"Fehler beim Platzieren der Order: {str(error)}")
+
+
+def order_response(result, order_type: str, formatted_msg: str) -> OrderResponse:
+    """Alpaca Order-Objekt → OrderResponse"""
+    return OrderResponse(
+        order_id=str(result.id),
+        symbol=result.symbol,
+        qty=float(result.qty) if result.qty is not None else None,
+        notional=float(result.notional) if result.notional is not None else None,
+        side=result.side.value,
+        status=result.status.value,
+        order_type=order_type,
+        legs=[str(leg.id) for leg in (result.legs or [])],
+        formatted_message=formatted_msg
+    )
+
+
+def amount_text(result) -> str:
+    """Anzahl für Nachrichten: 5 Stück, 0.5 Stück oder $500.00 (Bruchteil-Aktien)"""
+    if result.qty is None and result.notional is not None:
+        return f"${float(result.notional):,.2f} (Bruchteil-Aktien)"
+    return f"{float(result.qty):g} Stück"
+
+
+def validity_text(result) -> str:
+    tif = getattr(result.time_in_force, "value", result.time_in_force)
+    return "Handelsschluss heute (Tages-Order)" if tif == "day" else "Ausführung oder Stornierung"
+
+
 def format_market_order_message(result, side, market_warning=""):
     """
     Erstellt schöne formatierte Nachricht für Market Order
@@ -106,6 +422,8 @@ def format_market_order_message(result, side, market_warning=""):
     Returns:
         str: Formatierte Nachricht
     """
+    from alpaca.trading.enums import OrderSide
+
     action = "KAUFEN" if side == OrderSide.BUY else "VERKAUFEN"
     emoji = "🟢" if side == OrderSide.BUY else "🔴"
     
@@ -113,12 +431,12 @@ def format_market_order_message(result, side, market_warning=""):
 
 📝 Order-Art: MARKET {action}
 🏷️ Aktie: {result.symbol}
-📊 Anzahl: {result.qty} Stück
+📊 Anzahl: {amount_text(result)}
 ⏰ Status: {result.status.value}
 🆔 Order-ID: {result.id}
 {market_warning}
 💰 Wird zum aktuellen Marktpreis ausgeführt
-⌛ Gültig bis: Ausführung oder Stornierung
+⌛ Gültig bis: {validity_text(result)}
 
 🤖 Powered by StockM8"""
     
@@ -138,6 +456,8 @@ def format_limit_order_message(result, side, limit_price, market_warning=""):
     Returns:
         str: Formatierte Nachricht
     """
+    from alpaca.trading.enums import OrderSide
+
     action = "KAUFEN" if side == OrderSide.BUY else "VERKAUFEN"
     emoji = "🟢" if side == OrderSide.BUY else "🔴"
     condition = "bei oder unter" if side == OrderSide.BUY else "bei oder über"
@@ -146,13 +466,48 @@ def format_limit_order_message(result, side, limit_price, market_warning=""):
 
 📝 Order-Art: LIMIT {action}
 🏷️ Aktie: {result.symbol}
-📊 Anzahl: {result.qty} Stück
+📊 Anzahl: {amount_text(result)}
 💵 Limit-Preis: ${limit_price}
 ⏰ Status: {result.status.value}
 🆔 Order-ID: {result.id}
 {market_warning}
 ⚡ Wird nur ausgeführt {condition} ${limit_price}
-⌛ Gültig bis: Ausführung oder Stornierung
+⌛ Gültig bis: {validity_text(result)}
+
+🤖 Powered by StockM8"""
+    
+    return message
+
+
+def format_order_message(result, title, order_label, details, note, market_warning=""):
+    """
+    Nachricht für Stop-, Trailing-, Bracket- und OCO-Orders
+    
+    Args:
+        result: Order-Objekt von Alpaca
+        title: z.B. "BRACKET ORDER PLATZIERT"
+        order_label: z.B. "BRACKET KAUFEN"
+        details: Zeilen mit Preisen (Stop, Take-Profit, ...)
+        note: Erklärung, wann die Order ausgeführt wird
+        market_warning: Optional Warnung wenn Markt geschlossen
+    
+    Returns:
+        str: Formatierte Nachricht
+    """
+    emoji = "🟢" if result.side.value == "buy" else "🔴"
+    detail_lines = "\n".join(details)
+    
+    message = f"""{emoji} {title}
+
+📝 Order-Art: {order_label}
+🏷️ Aktie: {result.symbol}
+📊 Anzahl: {amount_text(result)}
+{detail_lines}
+⏰ Status: {result.status.value}
+🆔 Order-ID: {result.id}
+{market_warning}
+⚡ {note}
+⌛ Gültig bis: {validity_text(result)}
 
 🤖 Powered by StockM8"""
     
@@ -172,23 +527,23 @@ def root():
         curl http://localhost:80/
     """
     try:
-        clock = trading_client.get_clock()
+        clock = trading_client().get_clock()
         return {
             "status": "Stock Ordering Agent läuft",
             "market_open": clock.is_open,
             "next_open": str(clock.next_open) if not clock.is_open else None,
             "next_close": str(clock.next_close) if clock.is_open else None,
-            "endpoints": ["/market-status", "/order/market", "/order/limit"]
+            "endpoints": ["/market-status", "/order/market", "/order/limit", "/order/stop", "/order/stop-limit", "/order/trailing-stop", "/order/bracket", "/order/oco", "/orders/{id}", "/orders/events", "/orders/stream", "/rules", "/metrics", "/healthz", "/readyz"]
         }
     except:
         return {
             "status": "Stock Ordering Agent läuft",
-            "endpoints": ["/market-status", "/order/market", "/order/limit"]
+            "endpoints": ["/market-status", "/order/market", "/order/limit", "/order/stop", "/order/stop-limit", "/order/trailing-stop", "/order/bracket", "/order/oco", "/orders/{id}", "/orders/events", "/orders/stream", "/rules", "/metrics", "/healthz", "/readyz"]
         }
 
 
 @app.get("/market-status")
-def market_status():
+def market_status(request: Request, response: Response):
     """
     Detaillierter Börsen-Status
     
@@ -199,7 +554,13 @@ def market_status():
         dict: Status mit formatierter Nachricht
     """
     try:
-        clock = trading_client.get_clock()
+        clock = trading_client().get_clock()
+        
+        # Die Uhrzeit ändert sich bei jedem Aufruf, der Status nicht: ETag nur aus dem Status,
+        # geprüft bevor die Antwort gebaut wird
+        not_modified = precondition(request, response, clock.is_open, str(clock.next_open), str(clock.next_close))
+        if not_modified is not None:
+            return not_modified
         
         status_emoji = "🟢" if clock.is_open else "🔴"
         status_text = "OFFEN" if clock.is_open else "GESCHLOSSEN"
@@ -229,6 +590,28 @@ def market_status():
         raise HTTPException(status_code=500, detail=f"Fehler beim Status-Check: {str(e)}")
 
 
+@app.get("/metrics")
+def metrics():
+    """
+    Rate-Limit, Cache und Pre-Trade Zähler
+
+    Beispiel:
+        curl http://localhost:80/metrics
+    """
+    return {
+        "alpaca": throttle_metrics(),
+        "cache": cache_metrics(),
+        "pretrade": dict(pretrade.stats),
+        "order_updates": {
+            "stream": trade_feed is not None,
+            "last_seq": order_table.last_seq,
+            "webhook_sent": fill_webhook.sent,
+            "webhook_failed": fill_webhook.failed
+        },
+        "rules": rule_engine.summary() if rule_engine is not None else None
+    }
+
+
 @app.post("/order/market", response_model=OrderResponse)
 def place_market_order(order: MarketOrderInput):
     """
@@ -239,46 +622,59 @@ def place_market_order(order: MarketOrderInput):
           -H "Content-Type: application/json" \\
           -d '{"symbol": "AAPL", "qty": 1, "side": "buy"}'
     
+    Für einen Dollar-Betrag statt Stückzahl (Bruchteil-Aktien):
+        -d '{"symbol": "NVDA", "notional": 500, "side": "buy"}'
+    
     Args:
-        order: MarketOrderInput mit symbol, qty, side
+        order: MarketOrderInput mit symbol, qty oder notional, side
     
     Returns:
         OrderResponse: Details der platzierten Order
     """
+    from alpaca.trading.requests import MarketOrderRequest
+
     try:
+        # Beides angegeben: vor allem anderen ablehnen (422), sonst scheitert erst
+        # Alpacas MarketOrderRequest daran
+        if order.qty is not None and order.notional is not None:
+            raise PreTradeError("❌ Bitte entweder Anzahl (qty) oder Dollar-Betrag (notional) angeben")
+        
+        # Ohne Angabe: 1 Aktie
+        qty = order.qty if order.qty is not None or order.notional is not None else 1
+        
+        # 0. Lokale Prüfung (ohne Alpaca-Aufruf)
+        pretrade.check_order(order.symbol.upper(), qty, order.side.lower(), notional=order.notional)
+        
         # 1. Check ob Börse offen ist
         is_open, market_warning = check_market_status()
         
         # 2. Bestimme Kauf oder Verkauf
-        side = OrderSide.BUY if order.side.lower() == "buy" else OrderSide.SELL
+        side = order_side(order.side)
         
         # 3. Erstelle Order-Request für Alpaca
         market_order_data = MarketOrderRequest(
             symbol=order.symbol.upper(),  # Großbuchstaben (AAPL, TSLA)
-            qty=order.qty,                # Anzahl Aktien
+            qty=qty,                      # Anzahl Aktien (auch Bruchteile)
+            notional=order.notional,      # ODER Dollar-Betrag
             side=side,                    # BUY oder SELL
-            time_in_force=TimeInForce.GTC # Good-Till-Canceled (bleibt bis ausgeführt)
+            time_in_force=order_time_in_force(qty, order.notional),  # GTC, bei Bruchteilen DAY
+            client_order_id=order.client_order_id
         )
         
-        # 4. Sende Order an Alpaca
-        result = trading_client.submit_order(order_data=market_order_data)
+        # 4. Sende Order an Alpaca (danach Konto-Cache leeren)
+        result = submit(market_order_data)
         
         # 5. Erstelle schöne Nachricht
         formatted_msg = format_market_order_message(result, side, market_warning)
         
         # 6. Gib Antwort zurück
-        return OrderResponse(
-            order_id=str(result.id),
-            symbol=result.symbol,
-            qty=int(result.qty),
-            side=result.side.value,
-            status=result.status.value,
-            order_type="market",
-            formatted_message=formatted_msg
-        )
+        return order_response(result, "market", formatted_msg)
         
+    except PreTradeError as e:
+        # Regelverstoß: 422, die Order wurde nie an Alpaca geschickt
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Fehler beim Platzieren der Order: {str(e)}")
+        raise order_failure(e)
 
 
 @app.post("/order/limit", response_model=OrderResponse)
@@ -297,12 +693,17 @@ def place_limit_order(order: LimitOrderInput):
     Returns:
         OrderResponse: Details der platzierten Order
     """
+    from alpaca.trading.requests import LimitOrderRequest
+
     try:
+        # 0. Lokale Prüfung (ohne Alpaca-Aufruf)
+        pretrade.check_order(order.symbol.upper(), order.qty, order.side.lower(), order.limit_price)
+        
         # 1. Check ob Börse offen ist
         is_open, market_warning = check_market_status()
         
         # 2. Bestimme Kauf oder Verkauf
-        side = OrderSide.BUY if order.side.lower() == "buy" else OrderSide.SELL
+        side = order_side(order.side)
         
         # 3. Erstelle Order-Request für Alpaca
         limit_order_data = LimitOrderRequest(
@@ -310,28 +711,585 @@ def place_limit_order(order: LimitOrderInput):
             qty=order.qty,
             side=side,
             limit_price=order.limit_price,  # Gewünschter Preis
-            time_in_force=TimeInForce.GTC
+            time_in_force=order_time_in_force(order.qty),
+            client_order_id=order.client_order_id
         )
         
-        # 4. Sende Order an Alpaca
-        result = trading_client.submit_order(order_data=limit_order_data)
+        # 4. Sende Order an Alpaca (danach Konto-Cache leeren)
+        result = submit(limit_order_data)
         
         # 5. Erstelle schöne Nachricht
         formatted_msg = format_limit_order_message(result, side, order.limit_price, market_warning)
         
         # 6. Gib Antwort zurück
-        return OrderResponse(
-            order_id=str(result.id),
-            symbol=result.symbol,
-            qty=int(result.qty),
-            side=result.side.value,
-            status=result.status.value,
-            order_type="limit",
-            formatted_message=formatted_msg
+        return order_response(result, "limit", formatted_msg)
+        
+    except PreTradeError as e:
+        # Regelverstoß: 422, die Order wurde nie an Alpaca geschickt
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise order_failure(e)
+
+
+@app.post("/order/stop", response_model=OrderResponse)
+def place_stop_order(order: StopOrderInput):
+    """
+    Platziert eine Stop Order (wird zur Market Order, sobald der Stop-Preis erreicht ist)
+    
+    Beispiel (Verkaufen, falls AAPL auf $180 fällt):
+        curl -X POST http://localhost:80/order/stop \\
+          -H "Content-Type: application/json" \\
+          -d '{"symbol": "AAPL", "qty": 5, "side": "sell", "stop_price": 180}'
+    
+    Statt stop_price geht auch stop_percent (Abstand zum aktuellen Kurs in %).
+    """
+    from alpaca.trading.requests import StopOrderRequest
+
+    try:
+        symbol = order.symbol.upper()
+        is_buy = order.side.lower() == "buy"
+        
+        # 0. Stop-Preis bestimmen und lokal prüfen
+        if (order.stop_price is None) == (order.stop_percent is None):
+            raise PreTradeError("❌ Bitte entweder stop_price oder stop_percent angeben")
+        reference = reference_price(symbol, required=order.stop_percent is not None)
+        # Kauf-Stop liegt über dem Kurs, Verkaufs-Stop darunter
+        stop_price = price_level(order.stop_price, order.stop_percent, reference, above=is_buy)
+        pretrade.check_order(symbol, order.qty, order.side.lower(), stop_price)
+        
+        # 1. Check ob Börse offen ist
+        is_open, market_warning = check_market_status()
+        
+        # 2. + 3. Order-Request für Alpaca
+        stop_order_data = StopOrderRequest(
+            symbol=symbol,
+            qty=order.qty,
+            side=order_side(order.side),
+            stop_price=stop_price,
+            time_in_force=order_time_in_force(order.qty)
+        )
+        
+        # 4. Senden
+        result = submit(stop_order_data)
+        
+        # 5. Nachricht
+        action = "KAUFEN" if is_buy else "VERKAUFEN"
+        movement = "steigt" if is_buy else "fällt"
+        formatted_msg = format_order_message(
+            result, "STOP ORDER PLATZIERT", f"STOP {action}",
+            [f"🛑 Stop-Preis: ${stop_price:,.2f}"],
+            f"Wird zur Market Order, sobald der Kurs auf ${stop_price:,.2f} {movement}",
+            market_warning
+        )
+        return order_response(result, "stop", formatted_msg)
+        
+    except PreTradeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise order_failure(e)
+
+
+@app.post("/order/stop-limit", response_model=OrderResponse)
+def place_stop_limit_order(order: StopLimitOrderInput):
+    """
+    Platziert eine Stop-Limit Order (ab dem Stop-Preis wird eine Limit Order aktiv)
+    
+    Beispiel:
+        curl -X POST http://localhost:80/order/stop-limit \\
+          -H "Content-Type: application/json" \\
+          -d '{"symbol": "AAPL", "qty": 5, "side": "sell", "stop_price": 180, "limit_price": 178}'
+    """
+    from alpaca.trading.requests import StopLimitOrderRequest
+
+    try:
+        symbol = order.symbol.upper()
+        
+        # 0. Lokale Prüfung
+        pretrade.check_order(symbol, order.qty, order.side.lower(), order.limit_price)
+        if order.stop_price <= 0:
+            raise PreTradeError("❌ Stop-Preis muss größer als 0 sein")
+        
+        # 1. Check ob Börse offen ist
+        is_open, market_warning = check_market_status()
+        
+        # 2. + 3. Order-Request für Alpaca
+        stop_limit_order_data = StopLimitOrderRequest(
+            symbol=symbol,
+            qty=order.qty,
+            side=order_side(order.side),
+            stop_price=round_price(order.stop_price),
+            limit_price=round_price(order.limit_price),
+            time_in_force=order_time_in_force(order.qty)
+        )
+        
+        # 4. Senden
+        result = submit(stop_limit_order_data)
+        
+        # 5. Nachricht
+        action = "KAUFEN" if order.side.lower() == "buy" else "VERKAUFEN"
+        formatted_msg = format_order_message(
+            result, "STOP-LIMIT ORDER PLATZIERT", f"STOP-LIMIT {action}",
+            [f"🛑 Stop-Preis: ${order.stop_price:,.2f}", f"💵 Limit-Preis: ${order.limit_price:,.2f}"],
+            f"Ab ${order.stop_price:,.2f} wird eine Limit Order zu ${order.limit_price:,.2f} aktiv",
+            market_warning
+        )
+        return order_response(result, "stop_limit", formatted_msg)
+        
+    except PreTradeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise order_failure(e)
+
+
+@app.post("/order/trailing-stop", response_model=OrderResponse)
+def place_trailing_stop_order(order: TrailingStopOrderInput):
+    """
+    Platziert einen Trailing Stop (Stop-Preis läuft dem Kurs im festen Abstand nach)
+    
+    Beispiel (Gewinne absichern, 5% unter dem Höchstkurs verkaufen):
+        curl -X POST http://localhost:80/order/trailing-stop \\
+          -H "Content-Type: application/json" \\
+          -d '{"symbol": "NVDA", "qty": 3, "side": "sell", "trail_percent": 5}'
+    """
+    from alpaca.trading.requests import TrailingStopOrderRequest
+    from alpaca.trading.enums import TimeInForce
+
+    try:
+        symbol = order.symbol.upper()
+        
+        # 0. Lokale Prüfung
+        if (order.trail_percent is None) == (order.trail_price is None):
+            raise PreTradeError("❌ Bitte entweder trail_percent oder trail_price angeben")
+        if order.trail_percent is not None and not 0 < order.trail_percent < 100:
+            raise PreTradeError("❌ trail_percent muss zwischen 0 und 100 liegen")
+        if order.trail_price is not None and order.trail_price <= 0:
+            raise PreTradeError("❌ trail_price muss größer als 0 sein")
+        qty = whole_shares(order.qty, "Trailing-Stop")
+        pretrade.check_order(symbol, qty, order.side.lower())
+        
+        # 1. Check ob Börse offen ist
+        is_open, market_warning = check_market_status()
+        
+        # 2. + 3. Order-Request für Alpaca
+        trailing_order_data = TrailingStopOrderRequest(
+            symbol=symbol,
+            qty=qty,
+            side=order_side(order.side),
+            trail_percent=order.trail_percent,
+            trail_price=order.trail_price,
+            time_in_force=TimeInForce.GTC
+        )
+        
+        # 4. Senden
+        result = submit(trailing_order_data)
+        
+        # 5. Nachricht
+        is_buy = order.side.lower() == "buy"
+        action = "KAUFEN" if is_buy else "VERKAUFEN"
+        distance = f"{order.trail_percent:g}%" if order.trail_percent is not None else f"${order.trail_price:,.2f}"
+        trigger = f"um {distance} über den Tiefstkurs steigt" if is_buy else f"um {distance} unter den Höchstkurs fällt"
+        formatted_msg = format_order_message(
+            result, "TRAILING STOP PLATZIERT", f"TRAILING STOP {action}",
+            [f"📏 Abstand: {distance}"],
+            f"Stop läuft dem Kurs nach und löst aus, sobald der Kurs {trigger}",
+            market_warning
+        )
+        return order_response(result, "trailing_stop", formatted_msg)
+        
+    except PreTradeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise order_failure(e)
+
+
+@app.post("/order/bracket", response_model=OrderResponse)
+def place_bracket_order(order: BracketOrderInput):
+    """
+    Einstieg mit Take-Profit und/oder Stop-Loss in EINER Order an Alpaca
+    
+    Beide Ausstiege → Bracket Order, nur einer → OTO. Die Schutz-Orders
+    werden aktiv, sobald der Einstieg ausgeführt ist.
+    
+    Beispiel ("Kaufe für $500 NVDA mit 5% Stop"):
+        curl -X POST http://localhost:80/order/bracket \\
+          -H "Content-Type: application/json" \\
+          -d '{"symbol": "NVDA", "notional": 500, "side": "buy", "stop_loss_percent": 5}'
+    """
+    from alpaca.trading.requests import LimitOrderRequest, MarketOrderRequest, StopLossRequest, TakeProfitRequest
+    from alpaca.trading.enums import OrderClass, TimeInForce
+
+    try:
+        symbol = order.symbol.upper()
+        is_long = order.side.lower() == "buy"
+        
+        # 0. Einstiegspreis, Stückzahl und Ausstiege bestimmen
+        if order.take_profit is None and order.take_profit_percent is None \
+                and order.stop_loss is None and order.stop_loss_percent is None:
+            raise PreTradeError("❌ Bitte Take-Profit und/oder Stop-Loss angeben")
+        if order.qty is not None and order.notional is not None:
+            raise PreTradeError("❌ Bitte entweder Anzahl (qty) oder Dollar-Betrag (notional) angeben")
+        
+        needs_reference = (
+            order.notional is not None or order.take_profit_percent is not None or order.stop_loss_percent is not None
+        )
+        reference = reference_price(symbol, order.limit_price, required=needs_reference)
+        
+        notes = []
+        if order.notional is not None:
+            # Bracket/OTO nur mit ganzen Aktien: Dollar-Betrag abrunden
+            qty = int(order.notional // reference)
+            if qty < 1:
+                raise PreTradeError(
+                    f"❌ ${order.notional:,.2f} reicht nicht für eine ganze {symbol} Aktie (~${reference:,.2f})"
+                )
+            notes.append(f"💡 ${order.notional:,.2f} → {qty} ganze Aktien (Bracket-Orders nur mit ganzen Aktien)")
+        else:
+            qty = whole_shares(order.qty if order.qty is not None else 1, "Bracket")
+        
+        take_profit = price_level(order.take_profit, order.take_profit_percent, reference, above=is_long)
+        stop_loss = price_level(order.stop_loss, order.stop_loss_percent, reference, above=not is_long)
+        stop_loss_limit = round_price(order.stop_loss_limit) if order.stop_loss_limit is not None else None
+        pretrade.check_exit_prices(is_long, take_profit, stop_loss, reference)
+        pretrade.check_order(symbol, qty, order.side.lower(), order.limit_price)
+        
+        # 1. Check ob Börse offen ist
+        is_open, market_warning = check_market_status()
+        
+        # 2. + 3. EIN Request mit Einstieg und Ausstiegen
+        order_class = OrderClass.BRACKET if take_profit is not None and stop_loss is not None else OrderClass.OTO
+        order_fields = dict(
+            symbol=symbol,
+            qty=qty,
+            side=order_side(order.side),
+            time_in_force=TimeInForce.GTC,
+            order_class=order_class,
+            take_profit=TakeProfitRequest(limit_price=take_profit) if take_profit is not None else None,
+            stop_loss=StopLossRequest(stop_price=stop_loss, limit_price=stop_loss_limit) if stop_loss is not None else None
+        )
+        if order.limit_price is not None:
+            bracket_order_data = LimitOrderRequest(limit_price=round_price(order.limit_price), **order_fields)
+        else:
+            bracket_order_data = MarketOrderRequest(**order_fields)
+        
+        # 4. Senden
+        result = submit(bracket_order_data)
+        
+        # 5. Nachricht
+        action = "KAUFEN" if is_long else "VERKAUFEN"
+        entry = f"LIMIT ${order.limit_price:,.2f}" if order.limit_price is not None else "MARKET"
+        label = "BRACKET" if order_class == OrderClass.BRACKET else "OTO"
+        details = []
+        if take_profit is not None:
+            details.append(f"🎯 Take-Profit: ${take_profit:,.2f}")
+        if stop_loss is not None:
+            limit_text = f" (Limit ${stop_loss_limit:,.2f})" if stop_loss_limit is not None else ""
+            details.append(f"🛑 Stop-Loss: ${stop_loss:,.2f}{limit_text}")
+        details.extend(notes)
+        if order_class == OrderClass.BRACKET:
+            note = "Take-Profit und Stop-Loss werden nach dem Einstieg aktiv; wird einer ausgeführt, wird der andere storniert"
+        else:
+            note = "Die Ausstiegs-Order wird aktiv, sobald der Einstieg ausgeführt ist"
+        formatted_msg = format_order_message(
+            result, f"{label} ORDER PLATZIERT", f"{label} {action} (Einstieg: {entry})", details, note, market_warning
+        )
+        return order_response(result, order_class.value, formatted_msg)
+        
+    except PreTradeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise order_failure(e)
+
+
+@app.post("/order/oco", response_model=OrderResponse)
+def place_oco_order(order: OcoOrderInput):
+    """
+    Ausstieg aus einer bestehenden Position: Take-Profit ODER Stop-Loss
+    
+    Beispiel (100 AAPL: bei $220 Gewinn mitnehmen, bei $180 absichern):
+        curl -X POST http://localhost:80/order/oco \\
+          -H "Content-Type: application/json" \\
+          -d '{"symbol": "AAPL", "qty": 100, "side": "sell", "take_profit": 220, "stop_loss": 180}'
+    """
+    from alpaca.trading.requests import LimitOrderRequest, StopLossRequest, TakeProfitRequest
+    from alpaca.trading.enums import OrderClass, TimeInForce
+
+    try:
+        symbol = order.symbol.upper()
+        # Verkauf schließt eine Long-Position (Ziel darüber, Stop darunter)
+        is_long = order.side.lower() == "sell"
+        
+        # 0. Preise bestimmen und lokal prüfen
+        qty = whole_shares(order.qty, "OCO")
+        needs_reference = order.take_profit_percent is not None or order.stop_loss_percent is not None
+        reference = reference_price(symbol, required=needs_reference)
+        take_profit = price_level(order.take_profit, order.take_profit_percent, reference, above=is_long)
+        stop_loss = price_level(order.stop_loss, order.stop_loss_percent, reference, above=not is_long)
+        if take_profit is None or stop_loss is None:
+            raise PreTradeError("❌ OCO braucht Take-Profit UND Stop-Loss")
+        stop_loss_limit = round_price(order.stop_loss_limit) if order.stop_loss_limit is not None else None
+        pretrade.check_exit_prices(is_long, take_profit, stop_loss, reference)
+        pretrade.check_order(symbol, qty, order.side.lower(), take_profit)
+        
+        # 1. Check ob Börse offen ist
+        is_open, market_warning = check_market_status()
+        
+        # 2. + 3. EIN Request mit beiden Ausstiegen
+        oco_order_data = LimitOrderRequest(
+            symbol=symbol,
+            qty=qty,
+            side=order_side(order.side),
+            time_in_force=TimeInForce.GTC,
+            order_class=OrderClass.OCO,
+            take_profit=TakeProfitRequest(limit_price=take_profit),
+            stop_loss=StopLossRequest(stop_price=stop_loss, limit_price=stop_loss_limit)
+        )
+        
+        # 4. Senden
+        result = submit(oco_order_data)
+        
+        # 5. Nachricht
+        action = "VERKAUFEN" if is_long else "KAUFEN"
+        limit_text = f" (Limit ${stop_loss_limit:,.2f})" if stop_loss_limit is not None else ""
+        formatted_msg = format_order_message(
+            result, "OCO ORDER PLATZIERT", f"OCO {action}",
+            [f"🎯 Take-Profit: ${take_profit:,.2f}", f"🛑 Stop-Loss: ${stop_loss:,.2f}{limit_text}"],
+            "Wird eine der beiden ausgeführt, wird die andere automatisch storniert",
+            market_warning
         )
+        return order_response(result, "oco", formatted_msg)
         
+    except PreTradeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Fehler beim Platzieren der Order: {str(e)}")
+        raise order_failure(e)
+
+
+@app.get("/orders/events")
+def order_events(since: int = 0, timeout: float = 25.0):
+    """
+    Long-Poll: wartet bis zu `timeout` Sekunden auf Order-Events nach `since`
+    
+    Beispiel (immer mit dem letzten last_seq weitermachen):
+        curl "http://localhost:80/orders/events?since=0"
+    
+    Returns:
+        dict: {"events": [...], "last_seq": Nummer des letzten Events}
+    """
+    # Agent wurde neu gestartet (Nummern beginnen wieder bei 0)
+    if since > order_table.last_seq:
+        since = 0
+    events = order_table.wait_events(since, min(max(timeout, 0.0), 60.0))
+    return {"events": events, "last_seq": events[-1]["seq"] if events else since}
+
+
+@app.get("/orders/stream")
+async def order_stream(request: Request, since: int = 0):
+    """
+    Order-Events als Server-Sent Events (SSE), z.B. für n8n oder Browser
+    
+    Beispiel:
+        curl -N http://localhost:80/orders/stream
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    if since > order_table.last_seq:
+        since = 0
+
+    async def events():
+        cursor = since
+        while not await request.is_disconnected():
+            batch = await asyncio.to_thread(order_table.wait_events, cursor, 15.0)
+            if not batch:
+                yield ": keep-alive\n\n"
+                continue
+            for event in batch:
+                cursor = event["seq"]
+                yield f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/orders/{order_id}")
+def get_order_status(order_id: str):
+    """
+    Aktueller Stand einer Order (aus dem Speicher, sonst einmal von Alpaca)
+    
+    Beispiel:
+        curl http://localhost:80/orders/<order-id>
+    """
+    order = order_table.get(order_id)
+    if order is None:
+        try:
+            order = order_to_dict(trading_client().get_order_by_id(order_id))
+        except Exception:
+            raise HTTPException(status_code=404, detail=f"Order {order_id} nicht gefunden")
+        order_table.upsert(order)
+
+    filled = f"{order['filled_qty']:g}"
+    ordered = f"{order['qty']:g}" if order.get("qty") is not None else f"${order.get('notional') or 0:,.2f}"
+    price = f"${order['filled_avg_price']:,.2f}" if order.get("filled_avg_price") else "-"
+    order["formatted_message"] = f"""📋 ORDER-STATUS
+
+🏷️ Aktie: {order['symbol']} ({order['side']})
+⏰ Status: {order['status']}
+📊 Ausgeführt: {filled} von {ordered}
+💵 Durchschnittspreis: {price}
+🆔 Order-ID: {order['order_id']}
+
+🤖 Powered by StockM8"""
+    return order
+
+
+# ============================================================================
+# Regeln: bedingte und geplante Orders
+# ============================================================================
+
+def execute_rule(rule: dict) -> dict:
+    """
+    Ausgelöste Regel → Market oder Limit Order (mit denselben Prüfungen wie per API)
+
+    Die client_order_id (Regel + Lauf) ist pro Ausführung fest: wird derselbe
+    Lauf nach einem Absturz nochmal gesendet, lehnt Alpaca ihn ab.
+    """
+    client_order_id = f"rule-{rule['rule_id']}-{rule['runs']}"
+    if rule.get("limit_price") is not None:
+        response = place_limit_order(LimitOrderInput(
+            symbol=rule["symbol"], qty=rule["qty"], side=rule["side"], limit_price=rule["limit_price"],
+            client_order_id=client_order_id
+        ))
+    else:
+        response = place_market_order(MarketOrderInput(
+            symbol=rule["symbol"], qty=rule.get("qty"), notional=rule.get("notional"), side=rule["side"],
+            client_order_id=client_order_id
+        ))
+    return response.model_dump()
+
+
+def require_rule_engine() -> RuleEngine:
+    if rule_engine is None:
+        raise HTTPException(status_code=503, detail="Regel-Engine startet noch, bitte gleich nochmal versuchen")
+    return rule_engine
+
+
+WEEKDAY_NAMES = ["Montag", "Dienstag", "Mittwoch", "Donnerstag", "Freitag", "Samstag", "Sonntag"]
+
+
+def describe_rule_trigger(rule: dict) -> str:
+    """z.B. "Wenn der Kurs auf $180.00 oder tiefer fällt" oder "Jeden Montag um 09:35 (New York)" """
+    trigger = rule["trigger"]
+    if trigger == "price_below":
+        return f"Wenn der Kurs auf ${rule['price']:,.2f} oder tiefer fällt"
+    if trigger == "price_above":
+        return f"Wenn der Kurs auf ${rule['price']:,.2f} oder höher steigt"
+    if trigger == "once":
+        return f"Einmalig am {rule['run_at']}"
+    if rule["every"] == "day":
+        days = "Jeden Tag"
+    elif rule["every"] == "weekday":
+        days = "Jeden Werktag (Mo-Fr)"
+    else:
+        days = "Jeden " + WEEKDAY_NAMES[WEEKDAYS[rule["every"]]]
+    return f"{days} um {rule['at']} (New York)"
+
+
+def format_rule_message(rule: dict, title: str = "REGEL ANGELEGT") -> str:
+    emoji = "🟢" if rule["side"] == "buy" else "🔴"
+    action = "KAUFEN" if rule["side"] == "buy" else "VERKAUFEN"
+    amount = f"{rule['qty']:g} Stück" if rule.get("qty") is not None else f"${rule['notional']:,.2f}"
+    order_type = f"LIMIT ${rule['limit_price']:,.2f}" if rule.get("limit_price") is not None else "MARKET"
+    next_run = f"\n⏰ Nächste Ausführung: {rule['next_run']}" if rule.get("next_run") and rule["status"] == "active" else ""
+    error = f"\n⚠️ Letzter Fehler: {rule['last_error']}" if rule.get("last_error") else ""
+    
+    return f"""📌 {title}
+
+{emoji} {action}: {rule['symbol']} ({amount}, {order_type})
+⚡ {describe_rule_trigger(rule)}{next_run}
+📋 Status: {rule['status']} ({rule['runs']}x ausgeführt){error}
+🆔 Regel-ID: {rule['rule_id']}
+
+🤖 Powered by StockM8"""
+
+
+@app.post("/rules", response_model=RuleResponse)
+def create_rule(rule: RuleInput):
+    """
+    Legt eine Regel an (bedingte oder geplante Order)
+    
+    Beispiele:
+        # Kaufe 5 AAPL, wenn der Kurs unter $180 fällt
+        curl -X POST http://localhost:80/rules \\
+          -H "Content-Type: application/json" \\
+          -d '{"symbol": "AAPL", "qty": 5, "side": "buy", "trigger": "price_below", "price": 180}'
+        
+        # Kaufe jeden Montag 1 SPY
+        -d '{"symbol": "SPY", "qty": 1, "side": "buy", "trigger": "schedule", "every": "monday"}'
+    """
+    engine = require_rule_engine()
+    try:
+        symbol = rule.symbol.upper()
+        side = rule.side.lower()
+        # Ohne Angabe: 1 Aktie
+        qty = rule.qty if rule.qty is not None or rule.notional is not None else 1
+        if rule.limit_price is not None and qty is None:
+            raise RuleError("❌ Limit-Regeln brauchen eine Anzahl (qty), keinen Dollar-Betrag")
+        
+        # Symbol, Bestand und Volumen schon jetzt prüfen (bei Preis-Regeln zum Schwellenpreis)
+        pretrade.check_order(symbol, qty, side, rule.limit_price or rule.price, notional=rule.notional)
+        
+        created = engine.add({
+            "symbol": symbol,
+            "side": side,
+            "qty": qty,
+            "notional": rule.notional,
+            "limit_price": rule.limit_price,
+            "trigger": rule.trigger,
+            "price": rule.price,
+            "every": rule.every.lower() if rule.every else None,
+            "at": "%02d:%02d" % parse_time_of_day(rule.at),
+            "run_at": rule.run_at
+        })
+        return RuleResponse(rule=created, formatted_message=format_rule_message(created))
+        
+    except (PreTradeError, RuleError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/rules")
+def list_rules(status: Optional[str] = None):
+    """
+    Alle Regeln (optional nur ?status=active, triggered, canceled, failed, expired)
+    
+    Beispiel:
+        curl http://localhost:80/rules?status=active
+    """
+    rules = require_rule_engine().rules(status)
+    if rules:
+        lines = "\n".join(f"• {r['side'].upper()} {r['symbol']}: {describe_rule_trigger(r)} [{r['status']}]" for r in rules)
+    else:
+        lines = "Keine Regeln vorhanden"
+    return {
+        "rules": rules,
+        "formatted_message": f"📌 REGELN ({len(rules)})\n\n{lines}\n\n🤖 Powered by StockM8"
+    }
+
+
+@app.get("/rules/{rule_id}", response_model=RuleResponse)
+def get_rule(rule_id: str):
+    """Eine Regel mit Status, Anzahl Ausführungen und letzter Order-ID"""
+    rule = require_rule_engine().get(rule_id)
+    if rule is None:
+        raise HTTPException(status_code=404, detail=f"Regel {rule_id} nicht gefunden")
+    return RuleResponse(rule=rule, formatted_message=format_rule_message(rule, "REGEL"))
+
+
+@app.delete("/rules/{rule_id}", response_model=RuleResponse)
+def delete_rule(rule_id: str):
+    """Deaktiviert eine Regel (bleibt zur Nachverfolgung mit Status "canceled" gespeichert)"""
+    rule = require_rule_engine().cancel(rule_id)
+    if rule is None:
+        raise HTTPException(status_code=404, detail=f"Regel {rule_id} nicht gefunden")
+    return RuleResponse(rule=rule, formatted_message=format_rule_message(rule, "REGEL GELÖSCHT"))
 
 
 # ============================================================================
@@ -354,4 +1312,5 @@ if __name__ == "__main__":
     print('     -d \'{"symbol": "AAPL", "qty": 1, "side": "buy"}\'')
     print("\n" + "="*60 + "\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=80)
+    # WEB_CONCURRENCY = Anzahl Worker-Prozesse
+    uvicorn.run("app:app", host="0.0.0.0", port=80, workers=int(os.getenv("WEB_CONCURRENCY", "1")))
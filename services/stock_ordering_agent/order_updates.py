@@ -0,0 +1,239 @@
+"""
+Order-Status live verfolgen (Trade-Update-Stream von Alpaca)
+============================================================
+
+Was passiert hier?
+- Ein Websocket (TradingStream) meldet jede Änderung unserer Orders:
+  new, partial_fill, fill, canceled, rejected, ...
+- OrderTable merkt sich den letzten Stand jeder Order (im Speicher)
+  und ein Protokoll der letzten Events mit fortlaufender Nummer (seq)
+- Clients warten per Long-Poll oder SSE auf neue Events statt zu pollen
+- Fills werden zusätzlich per Webhook an n8n geschickt (N8N_FILL_WEBHOOK_URL)
+
+Der Stream läuft in einem eigenen Thread, Webhooks in einem zweiten,
+damit ein langsames n8n den Stream nie aufhält.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+import requests
+
+log = logging.getLogger("ordering.order_updates")
+
+MAX_ORDERS = int(os.getenv("ORDER_TABLE_MAX_ORDERS", "5000"))
+MAX_EVENTS = int(os.getenv("ORDER_EVENT_LOG_SIZE", "1000"))
+N8N_FILL_WEBHOOK_URL = os.getenv("N8N_FILL_WEBHOOK_URL", "")
+
+# Order ist abgeschlossen, kein weiteres Update erwartet
+TERMINAL_STATUSES = {"filled", "canceled", "expired", "rejected", "replaced", "done_for_day"}
+FILL_EVENTS = {"fill", "partial_fill"}
+
+
+def _value(field):
+    """Enum → Text (alpaca-py liefert Enums, unsere Tabelle speichert Text)"""
+    return getattr(field, "value", field)
+
+
+def _number(field) -> Optional[float]:
+    return float(field) if field not in (None, "") else None
+
+
+def order_to_dict(order) -> dict:
+    """Alpaca Order-Objekt → einfaches dict für Tabelle und API"""
+    return {
+        "order_id": str(order.id),
+        "client_order_id": order.client_order_id,
+        "symbol": order.symbol,
+        "side": _value(order.side),
+        "order_type": _value(order.order_type or order.type),
+        "qty": _number(order.qty),
+        "notional": _number(order.notional),
+        "filled_qty": _number(order.filled_qty) or 0.0,
+        "filled_avg_price": _number(order.filled_avg_price),
+        "limit_price": _number(order.limit_price),
+        "stop_price": _number(order.stop_price),
+        "status": _value(order.status),
+        "submitted_at": str(order.submitted_at) if order.submitted_at else None,
+        "updated_at": str(order.updated_at) if order.updated_at else None,
+    }
+
+
+class OrderTable:
+    """
+    Letzter Stand jeder Order + Event-Protokoll
+
+    - get(order_id): aktueller Stand (oder None)
+    - wait_events(since, timeout): Events mit seq > since, wartet bis eins kommt
+    Thread-sicher; Wartende werden über eine Condition geweckt.
+    """
+
+    def __init__(self, max_orders: int = MAX_ORDERS, max_events: int = MAX_EVENTS):
+        self.max_orders = max_orders
+        self._orders: "OrderedDict[str, dict]" = OrderedDict()
+        self._events = deque(maxlen=max_events)
+        self._seq = 0
+        self._changed = threading.Condition()
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def get(self, order_id: str) -> Optional[dict]:
+        with self._changed:
+            order = self._orders.get(order_id)
+            return dict(order) if order else None
+
+    def upsert(self, order: dict, event: Optional[str] = None, event_data: Optional[dict] = None) -> Optional[dict]:
+        """
+        Speichert den neuen Stand einer Order
+
+        Mit `event` wird zusätzlich ein Event protokolliert und alle Wartenden
+        geweckt. Gibt das Event zurück (oder None).
+        """
+        with self._changed:
+            self._orders[order["order_id"]] = order
+            self._orders.move_to_end(order["order_id"])
+            self._evict()
+            if event is None:
+                return None
+            self._seq += 1
+            record = {"seq": self._seq, "event": event, **order, **(event_data or {})}
+            self._events.append(record)
+            self._changed.notify_all()
+            return record
+
+    def _evict(self) -> None:
+        # Zuerst die ältesten abgeschlossenen Orders entfernen
+        if len(self._orders) <= self.max_orders:
+            return
+        for order_id, order in list(self._orders.items()):
+            if order["status"] in TERMINAL_STATUSES:
+                del self._orders[order_id]
+                if len(self._orders) <= self.max_orders:
+                    return
+        while len(self._orders) > self.max_orders:
+            self._orders.popitem(last=False)
+
+    def events_since(self, since: int) -> List[dict]:
+        with self._changed:
+            return [event for event in self._events if event["seq"] > since]
+
+    def wait_events(self, since: int, timeout: float) -> List[dict]:
+        """Long-Poll: wartet bis zu `timeout` Sekunden auf Events nach `since`"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self._seq <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+            return [event for event in self._events if event["seq"] > since]
+
+
+class FillWebhook:
+    """Schickt Fill-Events an n8n (eigener Thread, 3 Versuche pro Event)"""
+
+    def __init__(self, url: str, attempts: int = 3):
+        self.url = url
+        self.attempts = attempts
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self.sent = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self.url and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="n8n-fill-webhook", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+
+    def push(self, event: dict) -> None:
+        if not self.url:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.failed += 1
+            log.warning("Webhook queue full, dropping fill event %s", event.get("seq"))
+
+    def _run(self) -> None:
+        session = requests.Session()
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+            for attempt in range(self.attempts):
+                try:
+                    response = session.post(self.url, json=event, timeout=5)
+                    if response.status_code < 500:
+                        self.sent += 1
+                        break
+                except requests.RequestException as e:
+                    log.warning("Webhook attempt %s failed: %s", attempt + 1, e)
+                time.sleep(2 ** attempt)
+            else:
+                self.failed += 1
+
+
+def format_fill_message(event: dict) -> str:
+    """Nachricht für Telegram/WhatsApp, wenn eine Order (teilweise) ausgeführt wurde"""
+    full = event["event"] == "fill"
+    emoji = "🟢" if event["side"] == "buy" else "🔴"
+    action = "GEKAUFT" if event["side"] == "buy" else "VERKAUFT"
+    title = "ORDER AUSGEFÜHRT" if full else "ORDER TEILWEISE AUSGEFÜHRT"
+    price = event.get("fill_price") or event.get("filled_avg_price") or 0.0
+    ordered = f"{event['qty']:g}" if event.get("qty") is not None else f"${event.get('notional') or 0:,.2f}"
+
+    return f"""✅ {title}
+
+{emoji} {action}: {event['symbol']}
+📊 Ausgeführt: {event['filled_qty']:g} von {ordered}
+💵 Preis: ${price:,.2f}
+🆔 Order-ID: {event['order_id']}
+
+🤖 Powered by StockM8"""
+
+
+class TradeUpdateFeed:
+    """Alpaca TradingStream in einem Hintergrund-Thread → OrderTable + Webhook"""
+
+    def __init__(self, table: OrderTable, webhook: FillWebhook, api_key: str, secret_key: str, paper: bool = True):
+        from alpaca.trading.stream import TradingStream
+
+        self.table = table
+        self.webhook = webhook
+        self._stream = TradingStream(api_key, secret_key, paper=paper)
+        self._stream.subscribe_trade_updates(self._on_update)
+        self._thread: Optional[threading.Thread] = None
+
+    async def _on_update(self, data) -> None:
+        order = order_to_dict(data.order)
+        event = _value(data.event)
+        event_data = {
+            "fill_price": _number(getattr(data, "price", None)),
+            "fill_qty": _number(getattr(data, "qty", None)),
+            "position_qty": _number(getattr(data, "position_qty", None)),
+            "event_time": str(data.timestamp) if getattr(data, "timestamp", None) else None,
+        }
+        record = self.table.upsert(order, event, event_data)
+        if event in FILL_EVENTS:
+            self.webhook.push({**record, "formatted_message": format_fill_message(record)})
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._stream.run, name="alpaca-trade-updates", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        try:
+            self._stream.stop()
+        except Exception as e:
+            log.warning("Error stopping trade update stream: %s", e)
@@ -0,0 +1,270 @@
+"""
+Pre-Trade Checks - Orders lokal prüfen, bevor sie zu Alpaca gehen
+=================================================================
+
+Was wird geprüft?
+- Symbol, Seite (buy/sell) und Anzahl bzw. Dollar-Betrag sind gültig
+- Aktie ist handelbar (bei Bruchteilen und Dollar-Beträgen: fractionable)
+- Verkauf: nicht mehr als im Depot (außer Leerverkauf ist erlaubt)
+- Kauf: genug Buying Power
+- Ordervolumen (Anzahl x Preis) unter MAX_ORDER_NOTIONAL
+- Take-Profit / Stop-Loss liegen auf der richtigen Seite des Einstiegspreises
+
+Alle Daten kommen aus Caches (Asset-Tabelle, Konto, Preise), daher dauert
+eine Prüfung Mikrosekunden und fehlerhafte Orders erreichen Alpaca gar nicht.
+Kann ein Cache nicht geladen werden, wird die Prüfung übersprungen und
+Alpaca entscheidet (wie beim Börsen-Status-Check).
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+
+from stockm8_common import get_cache, get_data_client, get_trading_client
+
+# Maximales Ordervolumen in $ pro Order (0 = keine Grenze)
+MAX_ORDER_NOTIONAL = float(os.getenv("MAX_ORDER_NOTIONAL", "10000"))
+# Leerverkäufe (mehr verkaufen als im Depot) nur wenn ausdrücklich erlaubt
+ALLOW_SHORT = os.getenv("PRETRADE_ALLOW_SHORT", "false").lower() == "true"
+
+ASSET_TTL = int(os.getenv("PRETRADE_ASSET_TTL", str(6 * 3600)))  # Asset-Liste ändert sich selten
+ACCOUNT_TTL = float(os.getenv("PRETRADE_ACCOUNT_TTL", "5"))      # Konto: kurz, wird nach Orders geleert
+PRICE_TTL = float(os.getenv("PRETRADE_PRICE_TTL", "15"))
+QUOTE_HUB_URL = os.getenv("QUOTE_HUB_URL", "")                   # z.B. http://quote-hub:80
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z][A-Z0-9.]{0,9}$")
+
+cache = get_cache("ordering")
+
+
+class PreTradeError(Exception):
+    """Order verstößt gegen eine Regel (wird als HTTP 422 zurückgegeben)"""
+
+
+# Zähler für /metrics
+stats = {"checked": 0, "rejected": 0, "skipped_checks": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        stats[name] += 1
+
+
+# ============================================================================
+# Asset-Tabelle (tradable, fractionable, shortable)
+# ============================================================================
+
+_assets: Dict[str, list] = {}
+_assets_loaded_at = 0.0
+_assets_lock = threading.Lock()
+
+
+def fetch_asset_table() -> Dict[str, list]:
+    """Alle aktiven US-Aktien von Alpaca: symbol → [tradable, fractionable, shortable]"""
+    from alpaca.trading.requests import GetAssetsRequest
+    from alpaca.trading.enums import AssetClass, AssetStatus
+
+    assets = get_trading_client(paper=True).get_all_assets(
+        GetAssetsRequest(asset_class=AssetClass.US_EQUITY, status=AssetStatus.ACTIVE)
+    )
+    return {a.symbol: [bool(a.tradable), bool(a.fractionable), bool(a.shortable)] for a in assets}
+
+
+def load_asset_table() -> Dict[str, list]:
+    """
+    Asset-Tabelle im Prozess-Speicher (schnell), geteilt über den Cache
+
+    Wird beim Start im Hintergrund geladen (Warm-up), danach alle ASSET_TTL Sekunden.
+    """
+    global _assets, _assets_loaded_at
+    with _assets_lock:
+        if not _assets or time.monotonic() - _assets_loaded_at > ASSET_TTL:
+            _assets = cache.get_or_set("assets", fetch_asset_table, ttl=ASSET_TTL)
+            _assets_loaded_at = time.monotonic()
+        return _assets
+
+
+# ============================================================================
+# Konto (Buying Power, Positionen) und Preise
+# ============================================================================
+
+def fetch_account_snapshot() -> dict:
+    client = get_trading_client(paper=True)
+    account = client.get_account()
+    positions = {}
+    for position in client.get_all_positions():
+        # qty_available: Stück, die nicht schon in offenen Verkaufs-Orders stecken
+        available = getattr(position, "qty_available", None) or position.qty
+        positions[position.symbol] = {"qty": float(available), "price": float(position.current_price or 0)}
+    return {"buying_power": float(account.buying_power), "positions": positions}
+
+
+def account_snapshot() -> dict:
+    return cache.get_or_set("account-snapshot", fetch_account_snapshot, ttl=ACCOUNT_TTL)
+
+
+def invalidate_account() -> None:
+    """Nach einer Order: Buying Power und Positionen neu laden"""
+    cache.delete("account-snapshot")
+
+
+def fetch_price(symbol: str) -> Optional[float]:
+    # 1. Quote Hub (lokal, kein API-Aufruf), falls konfiguriert
+    if QUOTE_HUB_URL:
+        try:
+            response = requests.get(f"{QUOTE_HUB_URL}/quote/{symbol}", timeout=0.5)
+            if response.ok:
+                data = response.json()
+                price = data.get("trade_price") or data.get("ask_price")
+                if price:
+                    return float(price)
+        except requests.RequestException:
+            pass
+    # 2. Letzter Trade über die Market-Data API
+    from alpaca.data.requests import StockLatestTradeRequest
+
+    trades = get_data_client().get_stock_latest_trade(StockLatestTradeRequest(symbol_or_symbols=symbol))
+    trade = trades.get(symbol)
+    return float(trade.price) if trade else None
+
+
+def estimate_price(symbol: str, limit_price: Optional[float] = None) -> Optional[float]:
+    """Preis für die Volumen-Prüfung: Limit-Preis, sonst zuletzt gehandelter Preis"""
+    if limit_price:
+        return float(limit_price)
+    return cache.get_or_set(f"price:{symbol}", lambda: fetch_price(symbol), ttl=PRICE_TTL)
+
+
+# ============================================================================
+# Die eigentliche Prüfung
+# ============================================================================
+
+def check_order(
+    symbol: str,
+    qty: Optional[float],
+    side: str,
+    limit_price: Optional[float] = None,
+    notional: Optional[float] = None
+) -> dict:
+    """
+    Prüft eine Order vor dem Senden
+
+    Entweder `qty` (Stück, auch Bruchteile) oder `notional` (Dollar-Betrag).
+    `limit_price` ist der Preis für die Volumen-Schätzung (Limit- oder Stop-Preis).
+
+    Returns:
+        dict: {"price": geschätzter Preis, "notional": geschätztes Volumen}
+
+    Raises:
+        PreTradeError: mit verständlicher Fehlermeldung
+    """
+    _count("checked")
+    try:
+        return _check_order(symbol, qty, side, limit_price, notional)
+    except PreTradeError:
+        _count("rejected")
+        raise
+
+
+def _check_order(
+    symbol: str, qty: Optional[float], side: str, limit_price: Optional[float], notional: Optional[float]
+) -> dict:
+    # 1. Eingaben
+    if not SYMBOL_PATTERN.match(symbol):
+        raise PreTradeError(f"❌ Ungültiges Symbol: {symbol}")
+    if side not in ("buy", "sell"):
+        raise PreTradeError(f"❌ Ungültige Seite: {side} (erlaubt: buy, sell)")
+    if (qty is None) == (notional is None):
+        raise PreTradeError("❌ Bitte entweder Anzahl (qty) oder Dollar-Betrag (notional) angeben")
+    if qty is not None and qty <= 0:
+        raise PreTradeError("❌ Anzahl muss größer als 0 sein")
+    if notional is not None and notional <= 0:
+        raise PreTradeError("❌ Dollar-Betrag muss größer als 0 sein")
+    if limit_price is not None and limit_price <= 0:
+        raise PreTradeError("❌ Limit-Preis muss größer als 0 sein")
+
+    # 2. Asset-Tabelle
+    try:
+        assets = load_asset_table()
+    except Exception:
+        assets = {}
+        _count("skipped_checks")
+    if assets:
+        asset = assets.get(symbol)
+        if asset is None:
+            raise PreTradeError(f"❌ {symbol} ist keine handelbare US-Aktie bei Alpaca")
+        tradable, fractionable, shortable = asset
+        if not tradable:
+            raise PreTradeError(f"❌ {symbol} ist derzeit nicht handelbar")
+        if (notional is not None or qty != int(qty)) and not fractionable:
+            raise PreTradeError(f"❌ {symbol} unterstützt keine Bruchteil-Aktien")
+    else:
+        shortable = False
+
+    # 3. Konto und Preis
+    try:
+        account = account_snapshot()
+    except Exception:
+        account = None
+        _count("skipped_checks")
+    try:
+        price = estimate_price(symbol, limit_price)
+    except Exception:
+        price = None
+        _count("skipped_checks")
+    if notional is None:
+        notional = qty * price if price else None
+    elif price:
+        qty = notional / price
+
+    if account is not None:
+        if side == "sell" and qty is not None:
+            held = account["positions"].get(symbol, {}).get("qty", 0.0)
+            if qty > held and not (ALLOW_SHORT and shortable):
+                raise PreTradeError(f"❌ Du besitzt nur {held:g} {symbol}, Verkauf von {qty:g} nicht möglich")
+        elif notional is not None and notional > account["buying_power"]:
+            raise PreTradeError(
+                f"❌ Nicht genug Buying Power: ~${notional:,.2f} benötigt, ${account['buying_power']:,.2f} verfügbar"
+            )
+
+    # 4. Volumen-Grenze
+    if MAX_ORDER_NOTIONAL and notional is not None and notional > MAX_ORDER_NOTIONAL:
+        raise PreTradeError(
+            f"❌ Ordervolumen ~${notional:,.2f} über dem Limit von ${MAX_ORDER_NOTIONAL:,.2f} pro Order"
+        )
+
+    return {"price": price, "notional": notional}
+
+
+def check_exit_prices(
+    long: bool, take_profit: Optional[float], stop_loss: Optional[float], reference: Optional[float] = None
+) -> None:
+    """
+    Prüft Take-Profit und Stop-Loss einer Bracket-, OTO- oder OCO-Order
+
+    long=True: Position ist/wird long (Kauf-Bracket oder OCO-Verkauf),
+    Take-Profit muss also über und Stop-Loss unter dem Einstiegspreis liegen.
+    `reference` ist der Einstiegspreis (Limit-Preis oder aktueller Kurs).
+    """
+    for label, price in (("Take-Profit", take_profit), ("Stop-Loss", stop_loss)):
+        if price is not None and price <= 0:
+            raise PreTradeError(f"❌ {label} muss größer als 0 sein")
+
+    if take_profit is not None and stop_loss is not None:
+        if long and take_profit <= stop_loss:
+            raise PreTradeError(f"❌ Take-Profit (${take_profit:,.2f}) muss über dem Stop-Loss (${stop_loss:,.2f}) liegen")
+        if not long and take_profit >= stop_loss:
+            raise PreTradeError(f"❌ Take-Profit (${take_profit:,.2f}) muss unter dem Stop-Loss (${stop_loss:,.2f}) liegen")
+
+    if reference is None:
+        return
+    above, below = ("über", "unter") if long else ("unter", "über")
+    if take_profit is not None and (take_profit <= reference if long else take_profit >= reference):
+        raise PreTradeError(f"❌ Take-Profit muss {above} dem Einstiegspreis (~${reference:,.2f}) liegen")
+    if stop_loss is not None and (stop_loss >= reference if long else stop_loss <= reference):
+        raise PreTradeError(f"❌ Stop-Loss muss {below} dem Einstiegspreis (~${reference:,.2f}) liegen")
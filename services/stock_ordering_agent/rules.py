@@ -0,0 +1,477 @@
+"""
+Regel-Engine - bedingte und geplante Orders
+===========================================
+
+Was passiert hier?
+- Preis-Regeln: "Kaufe AAPL, wenn der Kurs unter 180 fällt"
+- Zeit-Regeln:  "Kaufe 1 SPY jeden Montag um 09:35" oder einmalig zu einem Zeitpunkt
+- Ein Hintergrund-Thread holt jede Sekunde die Kurse vom Quote Hub und
+  führt fällige Regeln aus (Callback `execute`, z.B. Market Order senden)
+
+Warum Heaps und Timer-Rad?
+- Pro Symbol zwei Heaps: "unter"-Regeln mit dem höchsten Schwellwert oben,
+  "über"-Regeln mit dem niedrigsten. Pro Kurs wird nur die Spitze geprüft,
+  jede ausgelöste Regel kostet O(log n), egal wie viele Regeln warten.
+- Zeit-Regeln liegen in einem Timer-Rad (Slot = Sekunde modulo Radgröße).
+  Pro Tick wird nur ein Slot angeschaut, Einfügen ist O(1).
+- Gelöschte Regeln bleiben im Heap/Rad liegen und werden beim Herausnehmen
+  übersprungen (lazy deletion), Löschen ist also O(1).
+
+Regeln werden in SQLite gespeichert (RULES_DB_PATH) und beim Start neu geladen.
+"""
+
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import requests
+
+log = logging.getLogger("ordering.rules")
+
+RULES_DB_PATH = os.getenv("RULES_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "rules.sqlite3"))
+RULE_TICK_SECONDS = float(os.getenv("RULE_TICK_SECONDS", "1"))
+RULE_WHEEL_SLOTS = int(os.getenv("RULE_WHEEL_SLOTS", "3600"))
+QUOTE_HUB_URL = os.getenv("QUOTE_HUB_URL", "")
+
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+PRICE_TRIGGERS = ("price_below", "price_above")
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "montag": 0, "dienstag": 1, "mittwoch": 2, "donnerstag": 3, "freitag": 4, "samstag": 5, "sonntag": 6
+}
+# "day" = jeden Tag, "weekday" = Montag bis Freitag, sonst ein Wochentag
+SCHEDULES = {"day", "weekday", *WEEKDAYS}
+
+
+class RuleError(Exception):
+    """Regel ist ungültig (wird als HTTP 422 zurückgegeben)"""
+
+
+# ============================================================================
+# Zeitplan
+# ============================================================================
+
+def parse_time_of_day(at: str) -> Tuple[int, int]:
+    try:
+        hour, minute = (int(part) for part in at.split(":"))
+    except ValueError:
+        raise RuleError(f"❌ Ungültige Uhrzeit: {at} (Format HH:MM, New Yorker Zeit)")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise RuleError(f"❌ Ungültige Uhrzeit: {at} (Format HH:MM, New Yorker Zeit)")
+    return hour, minute
+
+
+def next_run(every: str, at: str, after: datetime) -> datetime:
+    """
+    Nächster Termin nach `after` für einen wiederkehrenden Zeitplan (New Yorker Zeit)
+
+    Beispiel: next_run("monday", "09:35", jetzt) → kommender Montag 09:35 ET
+    """
+    hour, minute = parse_time_of_day(at)
+    local = after.astimezone(MARKET_TIMEZONE)
+    candidate = local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    for _ in range(8):
+        weekday = candidate.weekday()
+        matches = every == "day" or (every == "weekday" and weekday < 5) or WEEKDAYS.get(every) == weekday
+        if matches and candidate > local:
+            return candidate
+        # Datum weiterzählen, Uhrzeit bleibt (auch über Sommer-/Winterzeit)
+        candidate = datetime.combine(candidate.date() + timedelta(days=1), candidate.timetz())
+    raise RuleError(f"❌ Ungültiger Zeitplan: {every}")
+
+
+# ============================================================================
+# Index-Strukturen
+# ============================================================================
+
+class PriceIndex:
+    """
+    Preis-Regeln pro Symbol in zwei Heaps
+
+    below: (-schwelle, seq, rule_id) → höchste Schwelle oben (löst als erste aus, wenn der Kurs fällt)
+    above: (schwelle, seq, rule_id)  → niedrigste Schwelle oben
+    """
+
+    def __init__(self):
+        self._below: Dict[str, list] = {}
+        self._above: Dict[str, list] = {}
+        self._live: Dict[str, int] = {}
+        self._seq = 0
+
+    def symbols(self) -> List[str]:
+        return list(self._live)
+
+    def add(self, symbol: str, trigger: str, price: float, rule_id: str) -> None:
+        self._seq += 1
+        if trigger == "price_below":
+            heapq.heappush(self._below.setdefault(symbol, []), (-price, self._seq, rule_id))
+        else:
+            heapq.heappush(self._above.setdefault(symbol, []), (price, self._seq, rule_id))
+        self._live[symbol] = self._live.get(symbol, 0) + 1
+
+    def discard(self, symbol: str) -> None:
+        """Eine Regel des Symbols ist weg (Eintrag bleibt im Heap und wird später übersprungen)"""
+        remaining = self._live.get(symbol, 0) - 1
+        if remaining > 0:
+            self._live[symbol] = remaining
+            return
+        self._live.pop(symbol, None)
+        self._below.pop(symbol, None)
+        self._above.pop(symbol, None)
+
+    def due(self, symbol: str, price: float) -> List[str]:
+        """Nimmt alle Regeln heraus, die beim Kurs `price` auslösen"""
+        fired = []
+        below = self._below.get(symbol, [])
+        while below and -below[0][0] >= price:
+            fired.append(heapq.heappop(below)[2])
+        above = self._above.get(symbol, [])
+        while above and above[0][0] <= price:
+            fired.append(heapq.heappop(above)[2])
+        return fired
+
+
+class TimerWheel:
+    """
+    Hashed Timer Wheel: Slot = Tick-Nummer modulo Anzahl Slots
+
+    Einträge, die weiter als eine Umdrehung entfernt sind, bleiben im Slot
+    liegen, bis ihre Tick-Nummer erreicht ist.
+    """
+
+    def __init__(self, slots: int = RULE_WHEEL_SLOTS, tick: float = RULE_TICK_SECONDS, now: Optional[float] = None):
+        self.tick = tick
+        self._slots: List[List[Tuple[int, str]]] = [[] for _ in range(slots)]
+        self._current = int((time.time() if now is None else now) // tick)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def schedule(self, when: float, rule_id: str) -> None:
+        due_tick = max(int(when // self.tick), self._current + 1)
+        self._slots[due_tick % len(self._slots)].append((due_tick, rule_id))
+        self._size += 1
+
+    def advance(self, now: float) -> List[str]:
+        """Dreht das Rad bis `now` weiter und gibt die fälligen rule_ids zurück"""
+        target = int(now // self.tick)
+        fired = []
+        # Nach einer langen Pause reicht eine Umdrehung, um alle Slots zu sehen
+        first = max(self._current + 1, target - len(self._slots) + 1)
+        for tick in range(first, target + 1):
+            slot = self._slots[tick % len(self._slots)]
+            if not slot:
+                continue
+            keep = []
+            for entry in slot:
+                (fired if entry[0] <= target else keep).append(entry)
+            slot[:] = keep
+        self._current = max(self._current, target)
+        self._size -= len(fired)
+        return [rule_id for _, rule_id in fired]
+
+
+# ============================================================================
+# Speicher
+# ============================================================================
+
+class RuleStore:
+    """Regeln als JSON in SQLite (eine Zeile pro Regel)"""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS rules (id TEXT PRIMARY KEY, status TEXT NOT NULL, spec TEXT NOT NULL)")
+        self._lock = threading.Lock()
+
+    def save(self, rule: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rules (id, status, spec) VALUES (?, ?, ?)",
+                (rule["rule_id"], rule["status"], json.dumps(rule))
+            )
+
+    def load_all(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT spec FROM rules").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+# ============================================================================
+# Engine
+# ============================================================================
+
+def fetch_prices(symbols: List[str]) -> Dict[str, float]:
+    """Letzter Trade-Preis pro Symbol vom Quote Hub (ein Request für alle Symbole)"""
+    if not QUOTE_HUB_URL or not symbols:
+        return {}
+    response = requests.get(f"{QUOTE_HUB_URL}/quotes", params={"symbols": ",".join(symbols)}, timeout=2)
+    response.raise_for_status()
+    prices = {}
+    for symbol, quote in response.json().get("quotes", {}).items():
+        price = quote.get("trade_price") or quote.get("bar_close")
+        if price:
+            prices[symbol] = float(price)
+    return prices
+
+
+class RuleEngine:
+    """
+    Hält alle aktiven Regeln, prüft sie pro Tick und ruft `execute(rule)` auf
+
+    execute gibt ein dict zurück (z.B. {"order_id": ..., "formatted_message": ...})
+    oder wirft eine Exception; beides wird an der Regel gespeichert.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[dict], dict],
+        store: Optional[RuleStore] = None,
+        price_source: Callable[[List[str]], Dict[str, float]] = fetch_prices,
+        now: Optional[float] = None
+    ):
+        self.execute = execute
+        self.store = store
+        self.price_source = price_source
+        self.prices = PriceIndex()
+        self.wheel = TimerWheel(now=now)
+        self._rules: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"ticks": 0, "fired": 0, "failed": 0, "quote_errors": 0}
+
+    # ------------------------------------------------------------------
+    # Regeln verwalten
+    # ------------------------------------------------------------------
+
+    def load(self) -> int:
+        """Aktive Regeln aus dem Speicher wieder einhängen (beim Start)"""
+        if self.store is None:
+            return 0
+        count, now = 0, time.time()
+        with self._lock:
+            for rule in self.store.load_all():
+                self._rules[rule["rule_id"]] = rule
+                if rule["status"] != "active":
+                    continue
+                # Während der Dienst aus war verpasste Termine nicht nachholen
+                if rule.get("next_run") and datetime.fromisoformat(rule["next_run"]).timestamp() <= now:
+                    if rule["trigger"] == "once":
+                        rule["status"] = "expired"
+                        self._save(rule)
+                        continue
+                    rule["next_run"] = None
+                self._index(rule, now)
+                count += 1
+        return count
+
+    def add(self, rule: dict, now: Optional[float] = None) -> dict:
+        """
+        Neue Regel anlegen
+
+        rule: symbol, side, qty/notional, limit_price und ein Auslöser:
+        - trigger="price_below"/"price_above" mit price
+        - trigger="schedule" mit every ("monday", "weekday", "day", ...) und at ("09:35")
+        - trigger="once" mit run_at (ISO-Zeitpunkt)
+        """
+        now = time.time() if now is None else now
+        rule = {
+            **rule,
+            "rule_id": uuid.uuid4().hex[:12],
+            "status": "active",
+            "created_at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "runs": 0,
+            "last_run": None,
+            "last_order_id": None,
+            "last_error": None
+        }
+        validate_rule(rule, now)
+        with self._lock:
+            self._rules[rule["rule_id"]] = rule
+            self._index(rule, now)
+            self._save(rule)
+        return dict(rule)
+
+    def get(self, rule_id: str) -> Optional[dict]:
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            return dict(rule) if rule else None
+
+    def rules(self, status: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            return [dict(r) for r in self._rules.values() if status is None or r["status"] == status]
+
+    def cancel(self, rule_id: str) -> Optional[dict]:
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            if rule is None:
+                return None
+            if rule["status"] == "active":
+                rule["status"] = "canceled"
+                if rule["trigger"] in PRICE_TRIGGERS:
+                    self.prices.discard(rule["symbol"])
+                self._save(rule)
+            return dict(rule)
+
+    def _index(self, rule: dict, now: float) -> None:
+        trigger = rule["trigger"]
+        if trigger in PRICE_TRIGGERS:
+            self.prices.add(rule["symbol"], trigger, rule["price"], rule["rule_id"])
+        else:
+            if trigger == "schedule" and not rule.get("next_run"):
+                after = datetime.fromtimestamp(now, timezone.utc)
+                rule["next_run"] = next_run(rule["every"], rule["at"], after).isoformat()
+            self.wheel.schedule(datetime.fromisoformat(rule["next_run"]).timestamp(), rule["rule_id"])
+
+    def _save(self, rule: dict) -> None:
+        if self.store is not None:
+            self.store.save(rule)
+
+    # ------------------------------------------------------------------
+    # Auswerten
+    # ------------------------------------------------------------------
+
+    def tick(self, now: Optional[float] = None) -> List[dict]:
+        """Ein Durchlauf: fällige Zeit-Regeln + Kurs-Regeln. Gibt die ausgeführten Regeln zurück."""
+        now = time.time() if now is None else now
+        self.stats["ticks"] += 1
+        with self._lock:
+            due = [(rule_id, None) for rule_id in self.wheel.advance(now)]
+            symbols = self.prices.symbols()
+
+        if symbols:
+            try:
+                quotes = self.price_source(symbols)
+            except Exception as e:
+                self.stats["quote_errors"] += 1
+                log.warning("Quote fetch failed: %s", e)
+                quotes = {}
+            with self._lock:
+                for symbol, price in quotes.items():
+                    due.extend((rule_id, price) for rule_id in self.prices.due(symbol, price))
+
+        fired = []
+        for rule_id, price in due:
+            rule = self._claim(rule_id, price, now)
+            if rule is not None:
+                fired.append(self._fire(rule, now))
+        return fired
+
+    def _claim(self, rule_id: str, price: Optional[float], now: float) -> Optional[dict]:
+        """
+        Regel für die Ausführung übernehmen (gelöschte Einträge überspringen)
+
+        Der neue Stand wird gespeichert, BEVOR die Order rausgeht: stirbt der
+        Prozess danach, ist die Regel nach dem Neustart nicht mehr aktiv (bzw.
+        hat schon den nächsten Termin) und die Order wird nicht doppelt gesendet.
+        """
+        with self._lock:
+            rule = self._rules.get(rule_id)
+            if rule is None or rule["status"] != "active":
+                return None
+            if rule["trigger"] in PRICE_TRIGGERS:
+                self.prices.discard(rule["symbol"])
+                rule["status"] = "triggered"
+                rule["trigger_price"] = price
+            elif rule["trigger"] == "once":
+                rule["status"] = "triggered"
+            else:
+                # Wiederkehrend: sofort den nächsten Termin einplanen
+                after = datetime.fromtimestamp(now, timezone.utc)
+                rule["next_run"] = next_run(rule["every"], rule["at"], after).isoformat()
+                self.wheel.schedule(datetime.fromisoformat(rule["next_run"]).timestamp(), rule_id)
+            rule["runs"] += 1
+            rule["last_run"] = datetime.fromtimestamp(now, timezone.utc).isoformat()
+            self._save(rule)
+            return rule
+
+    def _fire(self, rule: dict, now: float) -> dict:
+        # Order außerhalb des Locks senden: ein langsamer Broker hält keine anderen Regeln auf
+        try:
+            result = self.execute(dict(rule))
+            self.stats["fired"] += 1
+            with self._lock:
+                rule["last_order_id"] = result.get("order_id")
+                rule["last_error"] = None
+                rule["last_message"] = result.get("formatted_message")
+        except Exception as e:
+            self.stats["failed"] += 1
+            log.warning("Rule %s failed: %s", rule["rule_id"], e)
+            with self._lock:
+                rule["last_error"] = getattr(e, "detail", None) or str(e)
+                if rule["trigger"] != "schedule":
+                    rule["status"] = "failed"
+        with self._lock:
+            self._save(rule)
+            return dict(rule)
+
+    # ------------------------------------------------------------------
+    # Hintergrund-Thread
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rule-engine", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.wheel.tick):
+            try:
+                self.tick()
+            except Exception:
+                log.exception("Rule engine tick failed")
+
+    def summary(self) -> dict:
+        with self._lock:
+            active = [r for r in self._rules.values() if r["status"] == "active"]
+            return {
+                **self.stats,
+                "active": len(active),
+                "price_symbols": len(self.prices.symbols()),
+                "scheduled": len(self.wheel)
+            }
+
+
+def validate_rule(rule: dict, now: float) -> None:
+    """Prüft Auslöser und Order-Angaben einer neuen Regel"""
+    trigger = rule.get("trigger")
+    if rule.get("side") not in ("buy", "sell"):
+        raise RuleError(f"❌ Ungültige Seite: {rule.get('side')} (erlaubt: buy, sell)")
+    if (rule.get("qty") is None) == (rule.get("notional") is None):
+        raise RuleError("❌ Bitte entweder Anzahl (qty) oder Dollar-Betrag (notional) angeben")
+
+    if trigger in PRICE_TRIGGERS:
+        if not rule.get("price") or rule["price"] <= 0:
+            raise RuleError("❌ Preis-Regeln brauchen einen Preis größer als 0")
+    elif trigger == "schedule":
+        if rule.get("every") not in SCHEDULES:
+            raise RuleError(f"❌ Ungültiger Zeitplan: {rule.get('every')} (z.B. monday, weekday, day)")
+        parse_time_of_day(rule.get("at") or "")
+    elif trigger == "once":
+        try:
+            run_at = datetime.fromisoformat(rule.get("run_at") or "")
+        except ValueError:
+            raise RuleError(f"❌ Ungültiger Zeitpunkt: {rule.get('run_at')} (ISO-Format)")
+        if run_at.tzinfo is None:
+            run_at = run_at.replace(tzinfo=MARKET_TIMEZONE)
+        if run_at.timestamp() <= now:
+            raise RuleError("❌ Zeitpunkt liegt in der Vergangenheit")
+        rule["next_run"] = run_at.isoformat()
+    else:
+        raise RuleError(f"❌ Ungültiger Auslöser: {trigger} (price_below, price_above, schedule, once)")
@@ -0,0 +1,53 @@
+"""Shared building blocks for the StockM8 services."""
+
+from .alpaca_clients import close_clients, get_data_client, get_session, get_trading_client, throttle_metrics
+from .async_data import AsyncDataClient, close_async_data_client, get_async_data_client, get_daily_bars
+from .bars import TIMEFRAMES, get_bars, validate_timeframe
+from .cache import TieredCache, cache_metrics, get_cache, set_shared_client
+from .conditional import add_conditional_responses, etag_for, precondition
+from .cpu import cpu_metrics, run_cpu, shutdown_cpu_pool
+from .encoding import (
+    COMPACT_ACCEPT, DATA_ONLY_HEADERS, add_negotiation, data_only_requested, decode_response, negotiated_representation
+)
+from .rate_limit import ThrottledSession, TokenBucket
+from .resilience import CircuitBreaker, CircuitOpenError, hedge_metrics, hedged_call
+from .startup import Warmup, add_health_routes
+
+__all__ = [
+    "add_conditional_responses",
+    "add_health_routes",
+    "add_negotiation",
+    "cache_metrics",
+    "close_async_data_client",
+    "close_clients",
+    "cpu_metrics",
+    "data_only_requested",
+    "decode_response",
+    "etag_for",
+    "get_async_data_client",
+    "get_bars",
+    "get_cache",
+    "get_daily_bars",
+    "get_data_client",
+    "get_session",
+    "get_trading_client",
+    "hedge_metrics",
+    "hedged_call",
+    "negotiated_representation",
+    "precondition",
+    "run_cpu",
+    "set_shared_client",
+    "shutdown_cpu_pool",
+    "throttle_metrics",
+    "validate_timeframe",
+    "AsyncDataClient",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "ThrottledSession",
+    "TieredCache",
+    "TokenBucket",
+    "Warmup",
+    "COMPACT_ACCEPT",
+    "DATA_ONLY_HEADERS",
+    "TIMEFRAMES",
+]
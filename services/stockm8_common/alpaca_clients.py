@@ -0,0 +1,109 @@
+"""
+Pooled, rate-limit-aware Alpaca clients shared by all StockM8 services.
+
+Trading and market-data APIs have separate per-minute budgets, so each gets
+its own ThrottledSession (one HTTP connection pool and one token bucket per
+process). Every client handed out by this module talks through that session.
+
+Clients are created on first use, never at import time, and are dropped in
+forked children: HTTP connection pools must not be shared between worker
+processes. Services call them from their lifespan hooks and handlers.
+"""
+
+import os
+import threading
+from typing import Dict
+
+from .rate_limit import ThrottledSession, TokenBucket
+
+# Alpaca's default budget is 200 requests per minute per API key
+TRADING_RATE_PER_MINUTE = int(os.getenv("ALPACA_TRADING_RATE_PER_MINUTE", "200"))
+DATA_RATE_PER_MINUTE = int(os.getenv("ALPACA_DATA_RATE_PER_MINUTE", "200"))
+POOL_SIZE = int(os.getenv("ALPACA_POOL_SIZE", "20"))
+MAX_RETRIES = int(os.getenv("ALPACA_MAX_RETRIES", "4"))
+
+_lock = threading.Lock()
+_sessions: Dict[str, ThrottledSession] = {}
+_clients: Dict[tuple, object] = {}
+
+
+def get_session(api: str) -> ThrottledSession:
+    """Returns the shared session for "trading" or "data"."""
+    with _lock:
+        session = _sessions.get(api)
+        if session is None:
+            rate = TRADING_RATE_PER_MINUTE if api == "trading" else DATA_RATE_PER_MINUTE
+            session = ThrottledSession(TokenBucket(rate), max_retries=MAX_RETRIES, pool_size=POOL_SIZE)
+            _sessions[api] = session
+        return session
+
+
+def _attach(client, api: str):
+    # alpaca-py has no hook for a custom session; swap the private one and
+    # disable its own fixed-interval 429 retries, ThrottledSession handles them
+    client._session = get_session(api)
+    client._retry = 0
+    return client
+
+
+def _credentials():
+    return os.getenv("APCA_API_KEY_ID"), os.getenv("APCA_API_SECRET_KEY")
+
+
+def get_trading_client(paper: bool = True):
+    """Shared TradingClient (paper trading by default)."""
+    key = ("trading", paper)
+    with _lock:
+        client = _clients.get(key)
+    if client is None:
+        from alpaca.trading.client import TradingClient
+
+        api_key, secret_key = _credentials()
+        client = _attach(TradingClient(api_key=api_key, secret_key=secret_key, paper=paper), "trading")
+        with _lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def get_data_client():
+    """Shared StockHistoricalDataClient."""
+    key = ("data",)
+    with _lock:
+        client = _clients.get(key)
+    if client is None:
+        from alpaca.data.historical import StockHistoricalDataClient
+
+        api_key, secret_key = _credentials()
+        client = _attach(StockHistoricalDataClient(api_key, secret_key), "data")
+        with _lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def close_clients() -> None:
+    """Closes the shared sessions (lifespan shutdown) and forgets all clients."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+        _clients.clear()
+    for session in sessions:
+        session.close()
+
+
+def _reset_after_fork() -> None:
+    # The child inherits the parent's sockets; start over with fresh pools
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+    _clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def throttle_metrics() -> dict:
+    """Rate-limit counters per API, for the services' /metrics endpoints."""
+    with _lock:
+        sessions = dict(_sessions)
+    return {api: session.metrics.as_dict() for api, session in sessions.items()}
@@ -0,0 +1,186 @@
+"""
+Async Alpaca market data (bars, latest trade and quote) over httpx.
+
+alpaca-py's StockHistoricalDataClient blocks, so handlers using it must be
+sync and each in-flight request holds one of Starlette's threadpool threads.
+AsyncDataClient talks to the same REST API from the event loop instead:
+
+    client = get_async_data_client()
+    raw = await client.get_bars("AAPL", "Day", start, end)   # list of bar dicts
+    series = await get_daily_bars("AAPL", start, end)        # BarSeries (NumPy columns)
+
+It spends tokens from the same bucket as the sync data client (one budget per
+API key and process, see alpaca_clients) and retries 429 and 5xx like
+ThrottledSession. Bars become a BarSeries straight from the JSON payload;
+large payloads are converted in the bounded CPU pool (cpu.run_cpu), never
+on the loop.
+
+With ALPACA_DATA_FAKE=true the client is wired to FakeAlpacaData (synthetic
+daily bars, no API keys or network); tests pass their own transport.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from .alpaca_clients import MAX_RETRIES, POOL_SIZE, get_session
+from .cpu import run_cpu
+from .rate_limit import RETRY_ALWAYS, RETRY_IDEMPOTENT, backoff_delay, follow_rate_limit_headers, retry_after
+
+log = logging.getLogger("stockm8.async_data")
+
+DATA_URL = os.getenv("ALPACA_DATA_URL", "https://data.alpaca.markets")
+# iex, sip or unset (the account's default feed), like alpaca-py's `feed`
+DATA_FEED = os.getenv("ALPACA_DATA_FEED") or None
+FAKE_DATA = os.getenv("ALPACA_DATA_FAKE", "false").lower() == "true"
+REQUEST_TIMEOUT = float(os.getenv("ALPACA_DATA_TIMEOUT", "10"))
+ACQUIRE_TIMEOUT = 60.0
+PAGE_LIMIT = 10000
+
+# stockm8_common.bars timeframes → Alpaca REST timeframes
+TIMEFRAMES = {"1Min": "1Min", "5Min": "5Min", "15Min": "15Min", "Hour": "1Hour", "Day": "1Day"}
+
+# Up to this many bars are converted on the loop (microseconds), more in the CPU pool
+INLINE_BARS = 2000
+
+
+def _rfc3339(value: datetime) -> str:
+    # Naive datetimes are UTC, as in stockm8_common.bars
+    value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class AsyncDataClient:
+    """Alpaca market data REST client for coroutines (one per worker process)."""
+
+    def __init__(self, api_key: Optional[str], secret_key: Optional[str], transport=None,
+                 base_url: str = DATA_URL, feed: Optional[str] = DATA_FEED, max_retries: int = MAX_RETRIES):
+        import httpx
+
+        self.feed = feed
+        self.max_retries = max_retries
+        # Shared with the sync data client: same token bucket, same counters in /metrics
+        session = get_session("data")
+        self.bucket = session.bucket
+        self.metrics = session.metrics
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"APCA-API-KEY-ID": api_key or "", "APCA-API-SECRET-KEY": secret_key or ""},
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+            transport=transport,
+        )
+
+    async def _get(self, path: str, params: Optional[Dict] = None) -> Dict:
+        """GET with rate limiting and retries; raises httpx.HTTPStatusError on errors."""
+        retryable = RETRY_ALWAYS | RETRY_IDEMPOTENT
+        attempt = 0
+        while True:
+            waited = await self.bucket.acquire_async(timeout=ACQUIRE_TIMEOUT)
+            self.metrics.record_request(waited)
+            response = await self.client.get(path, params=params)
+            follow_rate_limit_headers(response, self.bucket, self.metrics)
+
+            if response.status_code not in retryable or attempt >= self.max_retries:
+                response.raise_for_status()
+                return response.json()
+
+            delay = backoff_delay(attempt, retry_after(response), 0.5, 20.0)
+            self.metrics.record_retry(response.status_code)
+            log.warning("GET %s returned %s, retrying in %.2fs", path, response.status_code, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get_bars(self, symbol: str, timeframe: str, start: datetime,
+                       end: Optional[datetime] = None, adjustment: str = "raw") -> List[Dict]:
+        """All bars in [start, end] as Alpaca returns them ({"t", "o", "h", ...}), following pages."""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Unsupported timeframe {timeframe}, use one of {', '.join(TIMEFRAMES)}")
+        params = {
+            "timeframe": TIMEFRAMES[timeframe],
+            "start": _rfc3339(start),
+            "limit": PAGE_LIMIT,
+            "adjustment": adjustment,
+        }
+        if end is not None:
+            params["end"] = _rfc3339(end)
+        if self.feed:
+            params["feed"] = self.feed
+
+        bars: List[Dict] = []
+        while True:
+            page = await self._get(f"/v2/stocks/{symbol}/bars", params)
+            bars.extend(page.get("bars") or [])
+            token = page.get("next_page_token")
+            if not token:
+                return bars
+            params["page_token"] = token
+
+    async def latest_trade(self, symbol: str) -> Dict:
+        """Latest trade ({"t", "p", "s", ...})."""
+        params = {"feed": self.feed} if self.feed else None
+        return (await self._get(f"/v2/stocks/{symbol}/trades/latest", params))["trade"]
+
+    async def latest_quote(self, symbol: str) -> Dict:
+        """Latest quote ({"t", "bp", "bs", "ap", "as", ...})."""
+        params = {"feed": self.feed} if self.feed else None
+        return (await self._get(f"/v2/stocks/{symbol}/quotes/latest", params))["quote"]
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_client: Optional[AsyncDataClient] = None
+
+
+def get_async_data_client() -> AsyncDataClient:
+    """Shared AsyncDataClient of this worker process (fake with ALPACA_DATA_FAKE=true)."""
+    global _client
+    if _client is None:
+        transport = None
+        if FAKE_DATA:
+            from .fake_data import FakeAlpacaData
+
+            transport = FakeAlpacaData().transport()
+        _client = AsyncDataClient(os.getenv("APCA_API_KEY_ID"), os.getenv("APCA_API_SECRET_KEY"), transport)
+    return _client
+
+
+async def close_async_data_client() -> None:
+    """Closes the shared client's connections (lifespan shutdown)."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+def _reset_after_fork() -> None:
+    # Connections belong to the parent; the child opens its own
+    global _client
+    _client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def get_daily_bars(symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         client: Optional[AsyncDataClient] = None):
+    """
+    Async counterpart of get_bars(symbol, "Day", ...): daily bars as a
+    BarSeries (series.to_pandas() for a DataFrame), or None.
+
+    end defaults to yesterday, start to 100 days before end.
+    """
+    from .bar_series import BarSeries
+
+    client = client or get_async_data_client()
+    end = end or datetime.now() - timedelta(days=1)
+    bars = await client.get_bars(symbol, "Day", start or end - timedelta(days=100), end)
+    if not bars:
+        return None
+    if len(bars) <= INLINE_BARS:
+        return BarSeries.from_alpaca(symbol, bars)
+    return await run_cpu(BarSeries.from_alpaca, symbol, bars)
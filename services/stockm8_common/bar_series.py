@@ -0,0 +1,96 @@
+"""
+Columnar bars: one NumPy array per field, no DataFrame.
+
+Most handlers read a handful of closes from a few dozen bars. Building a
+pandas DataFrame for that (index parsing, block manager, MultiIndex reset)
+costs far more than the arithmetic. BarSeries is built straight from
+Alpaca's JSON bars ({"t", "o", "h", "l", "c", "v", ...}) into contiguous
+arrays:
+
+    series = BarSeries.from_alpaca("AAPL", raw_bars)
+    series.last_close, series.change_percent(5)
+    series.to_pandas()    # same frame as alpaca-py's .df, only when needed
+
+Timestamps are int64 nanoseconds since the epoch (UTC), like the minute-bar
+cache in stockm8_common.bars.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+FIELDS = ("open", "high", "low", "close", "volume")
+# Alpaca's short bar keys
+ALPACA_KEYS = {"open": "o", "high": "h", "low": "l", "close": "c", "volume": "v"}
+
+
+class BarSeries:
+    """Bars of one symbol as a struct of arrays, oldest first."""
+
+    __slots__ = ("symbol", "timeframe", "t", "open", "high", "low", "close", "volume")
+
+    def __init__(self, symbol: str, timeframe: str, t: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.t = t
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_alpaca(cls, symbol: str, bars: List[Dict], timeframe: str = "Day") -> "BarSeries":
+        """From the "bars" list of Alpaca's REST response (RFC 3339 "t", UTC)."""
+        count = len(bars)
+        # numpy parses ISO 8601 itself; it only rejects the "Z" suffix
+        t = np.array([bar["t"].rstrip("Z") for bar in bars], dtype="datetime64[ns]").astype(np.int64)
+        columns = {
+            field: np.fromiter((bar[key] for bar in bars), dtype=np.float64, count=count)
+            for field, key in ALPACA_KEYS.items()
+        }
+        return cls(symbol, timeframe, t, **columns)
+
+    @classmethod
+    def from_encoded(cls, symbol: str, encoded: Dict[str, list], timeframe: str = "1Min") -> "BarSeries":
+        """From the cached {"t": [...], "open": [...], ...} form used by stockm8_common.bars."""
+        return cls(
+            symbol, timeframe, np.asarray(encoded["t"], dtype=np.int64),
+            **{field: np.asarray(encoded[field], dtype=np.float64) for field in FIELDS}
+        )
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    def __repr__(self) -> str:
+        return f"BarSeries({self.symbol!r}, {self.timeframe!r}, {len(self)} bars)"
+
+    @property
+    def empty(self) -> bool:
+        return len(self.t) == 0
+
+    @property
+    def last_close(self) -> float:
+        return float(self.close[-1])
+
+    def close_ago(self, bars: int) -> float:
+        """Close `bars` bars before the last one (the first close if the series is shorter)."""
+        return float(self.close[max(0, len(self.close) - 1 - bars)])
+
+    def change_percent(self, bars: int) -> float:
+        """Change of the last close against close_ago(bars), in percent."""
+        previous = self.close_ago(bars)
+        return (self.last_close - previous) / previous * 100
+
+    def to_encoded(self) -> Dict[str, list]:
+        """Plain lists (msgpack-friendly), the inverse of from_encoded()."""
+        return {"t": self.t.tolist(), **{field: getattr(self, field).tolist() for field in FIELDS}}
+
+    def to_pandas(self):
+        """DataFrame indexed by timestamp (UTC) with open/high/low/close/volume. Imports pandas."""
+        import pandas as pd
+
+        index = pd.to_datetime(self.t, unit="ns", utc=True)
+        index.name = "timestamp"
+        return pd.DataFrame({field: getattr(self, field) for field in FIELDS}, index=index)
@@ -0,0 +1,210 @@
+"""
+Historical bars in several timeframes: 1Min, 5Min, 15Min, Hour, Day.
+
+Daily bars are requested as such. Intraday timeframes are all derived from
+one source, 1-minute bars, which are cached per (symbol, New York trading
+day) in the shared "bars" cache:
+
+- only days missing from the cache are requested, contiguous missing days
+  in a single request (alpaca-py follows the page tokens)
+- 5Min, 15Min and Hour are resampled locally from the cached minute bars,
+  so switching timeframe never costs another API call
+
+Past days never change and are kept for a week; today's bars expire after a
+minute. Requires pandas, which is imported on first use.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from .alpaca_clients import get_data_client
+from .cache import get_cache
+
+TIMEFRAMES = ("1Min", "5Min", "15Min", "Hour", "Day")
+RESAMPLE_RULES = {"5Min": "5min", "15Min": "15min", "Hour": "1h"}
+MARKET_TIMEZONE = "America/New_York"
+
+# Free data plans only serve SIP data older than 15 minutes
+INTRADAY_DELAY_MINUTES = int(os.getenv("INTRADAY_DELAY_MINUTES", "16"))
+MINUTE_BARS_TTL = int(os.getenv("MINUTE_BARS_TTL", str(7 * 24 * 3600)))
+MINUTE_BARS_TODAY_TTL = int(os.getenv("MINUTE_BARS_TODAY_TTL", "60"))
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+
+_cache = None
+
+
+def _bars_cache():
+    global _cache
+    if _cache is None:
+        _cache = get_cache("bars")
+    return _cache
+
+
+def is_intraday(timeframe: str) -> bool:
+    return timeframe != "Day"
+
+
+def validate_timeframe(timeframe: str) -> str:
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unsupported timeframe {timeframe}, use one of {', '.join(TIMEFRAMES)}")
+    return timeframe
+
+
+def intraday_end() -> datetime:
+    """Latest point in time intraday bars may be requested for."""
+    return datetime.now(timezone.utc) - timedelta(minutes=INTRADAY_DELAY_MINUTES)
+
+
+def get_bars(symbol: str, timeframe: str = "Day", start: Optional[datetime] = None,
+             end: Optional[datetime] = None, data_client=None):
+    """
+    Bars for one symbol as a DataFrame indexed by timestamp (UTC), or None.
+
+    start/end default to the last day (intraday) or the last 100 days (Day).
+    """
+    validate_timeframe(timeframe)
+    data_client = data_client or get_data_client()
+    if not is_intraday(timeframe):
+        end = end or datetime.now() - timedelta(days=1)
+        return _daily_bars(data_client, symbol, start or end - timedelta(days=100), end)
+
+    end = min(_as_utc(end), intraday_end()) if end else intraday_end()
+    start = _as_utc(start) if start else end - timedelta(days=1)
+    df = minute_bars(data_client, symbol, start, end)
+    if df is None or timeframe == "1Min":
+        return df
+    return resample(df, timeframe)
+
+
+def resample(df, timeframe: str):
+    """Aggregates minute bars into a coarser timeframe (bars labelled by their start)."""
+    rule = RESAMPLE_RULES[timeframe]
+    resampled = df.resample(rule, label="left", closed="left").agg({
+        "open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"
+    })
+    # Buckets without any trade (overnight, halts) are dropped, like Alpaca does
+    return resampled.dropna(subset=["open"])
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _daily_bars(data_client, symbol: str, start: datetime, end: datetime):
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    request = StockBarsRequest(symbol_or_symbols=[symbol], timeframe=TimeFrame.Day, start=start, end=end)
+    df = data_client.get_stock_bars(request).df
+    if df.empty:
+        return None
+    return df.reset_index(level=0, drop=True)
+
+
+def _trading_days(start: datetime, end: datetime) -> List[str]:
+    """Weekdays (New York dates) touched by [start, end]; holidays are cached as empty."""
+    import pandas as pd
+
+    first = pd.Timestamp(start).tz_convert(MARKET_TIMEZONE).date()
+    last = pd.Timestamp(end).tz_convert(MARKET_TIMEZONE).date()
+    days = []
+    day = first
+    while day <= last:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def _day_bounds(day: str):
+    import pandas as pd
+
+    open_ = pd.Timestamp(day, tz=MARKET_TIMEZONE)
+    return open_.tz_convert("UTC").to_pydatetime(), (open_ + pd.Timedelta(days=1)).tz_convert("UTC").to_pydatetime()
+
+
+def _encode(df) -> Dict[str, list]:
+    encoded = {"t": df.index.to_numpy(dtype="datetime64[ns]").astype("int64").tolist()}
+    for column in COLUMNS:
+        encoded[column] = df[column].astype(float).tolist()
+    return encoded
+
+
+def _decode(encoded: Dict[str, list]):
+    import pandas as pd
+
+    index = pd.to_datetime(encoded["t"], unit="ns", utc=True)
+    index.name = "timestamp"
+    return pd.DataFrame({column: encoded[column] for column in COLUMNS}, index=index)
+
+
+def _missing_runs(days: List[str], cached: Dict[str, dict]) -> List[List[str]]:
+    """Groups missing days into runs of consecutive trading days."""
+    runs, current = [], []
+    for day in days:
+        if day in cached:
+            if current:
+                runs.append(current)
+                current = []
+        else:
+            current.append(day)
+    if current:
+        runs.append(current)
+    return runs
+
+
+def _fetch_minute_run(data_client, symbol: str, days: List[str]) -> Dict[str, dict]:
+    """One request for consecutive days of minute bars, split per trading day."""
+    import pandas as pd
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+
+    start, _ = _day_bounds(days[0])
+    _, end = _day_bounds(days[-1])
+    request = StockBarsRequest(
+        symbol_or_symbols=[symbol],
+        timeframe=TimeFrame.Minute,
+        start=start,
+        end=min(end, intraday_end())
+    )
+    df = data_client.get_stock_bars(request).df
+    per_day = {day: {"t": [], **{column: [] for column in COLUMNS}} for day in days}
+    if df.empty:
+        return per_day
+    df = df.reset_index(level=0, drop=True)
+    market_days = df.index.tz_convert(MARKET_TIMEZONE).strftime("%Y-%m-%d")
+    for day, group in df.groupby(pd.Index(market_days)):
+        if day in per_day:
+            per_day[day] = _encode(group)
+    return per_day
+
+
+def minute_bars(data_client, symbol: str, start: datetime, end: datetime):
+    """1-minute bars for [start, end], served per trading day from the cache."""
+    import pandas as pd
+
+    cache = _bars_cache()
+    days = _trading_days(start, end)
+    if not days:
+        return None
+    cached = {}
+    for day in days:
+        encoded = cache.get(f"1Min:{symbol}:{day}")
+        if encoded is not None:
+            cached[day] = encoded
+
+    today = pd.Timestamp.now(tz=MARKET_TIMEZONE).date().isoformat()
+    for run in _missing_runs(days, cached):
+        for day, encoded in _fetch_minute_run(data_client, symbol, run).items():
+            ttl = MINUTE_BARS_TODAY_TTL if day >= today else MINUTE_BARS_TTL
+            cache.set(f"1Min:{symbol}:{day}", encoded, ttl=ttl)
+            cached[day] = encoded
+
+    frames = [_decode(cached[day]) for day in days if cached[day]["t"]]
+    if not frames:
+        return None
+    df = pd.concat(frames)
+    df = df[(df.index >= pd.Timestamp(start)) & (df.index <= pd.Timestamp(end))]
+    return df if not df.empty else None
@@ -0,0 +1,421 @@
+"""
+Two-tier response cache shared by the StockM8 services.
+
+    TieredCache
+      ├─ LocalLRU     in-process, bounded, no serialisation
+      └─ RedisTier    optional, shared by all workers and replicas
+
+Values are stored in an envelope (expires_at, compute_seconds, value) and kept
+for a grace period after they expire. get_or_set() protects against stampedes
+on expiry in three ways:
+
+- only one caller per key recomputes (thread lock locally, SET NX lock in Redis)
+- while it does, everyone else is served the stale value
+- a fresh value is recomputed early with a probability that grows towards
+  expiry ("XFetch"), so hot keys are usually refreshed before they expire
+
+get_or_set_async() does the same for async handlers with a coroutine loader;
+it deduplicates loads per process only (see its docstring).
+
+Set CACHE_REDIS_URL to enable the shared tier. Tests can pass any client with
+the redis-py interface (for example fakeredis) to set_shared_client().
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+log = logging.getLogger("stockm8.cache")
+
+LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "1024"))
+STALE_GRACE_SECONDS = float(os.getenv("CACHE_STALE_GRACE_SECONDS", "60"))
+
+# (expires_at epoch seconds, seconds it took to compute, value)
+Envelope = Tuple[float, float, Any]
+
+try:
+    import msgpack
+
+    def dumps(envelope: Envelope) -> bytes:
+        return msgpack.packb(envelope, use_bin_type=True)
+
+    def loads(data: bytes) -> Envelope:
+        return tuple(msgpack.unpackb(data, raw=False))
+except ImportError:  # pragma: no cover - msgpack is in stockm8_common/requirements.txt
+    import json
+
+    def dumps(envelope: Envelope) -> bytes:
+        return json.dumps(envelope, separators=(",", ":")).encode()
+
+    def loads(data: bytes) -> Envelope:
+        return tuple(json.loads(data))
+
+
+class LocalLRU:
+    """Bounded in-process LRU of envelopes. Entries also carry a hard deadline."""
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Envelope]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Envelope]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            deadline, envelope = item
+            if deadline <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return envelope
+
+    def set(self, key: str, envelope: Envelope, deadline: float) -> None:
+        with self._lock:
+            self._data[key] = (deadline, envelope)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisTier:
+    """Shared tier on top of a redis-py compatible client. Errors degrade to a miss."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[Envelope]:
+        try:
+            data = self.client.get(key)
+        except Exception as e:
+            log.warning("Shared cache get failed for %s: %s", key, e)
+            return None
+        return loads(data) if data is not None else None
+
+    def set(self, key: str, envelope: Envelope, deadline: float) -> None:
+        ttl_ms = max(1, int((deadline - time.time()) * 1000))
+        try:
+            self.client.set(key, dumps(envelope), px=ttl_ms)
+        except Exception as e:
+            log.warning("Shared cache set failed for %s: %s", key, e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(key)
+        except Exception as e:
+            log.warning("Shared cache delete failed for %s: %s", key, e)
+
+    def try_lock(self, key: str, timeout: float) -> bool:
+        try:
+            return bool(self.client.set(f"lock:{key}", b"1", nx=True, px=int(timeout * 1000)))
+        except Exception as e:
+            log.warning("Shared cache lock failed for %s: %s", key, e)
+            # Without the shared tier the local lock is the best we can do
+            return True
+
+    def unlock(self, key: str) -> None:
+        try:
+            self.client.delete(f"lock:{key}")
+        except Exception:
+            pass
+
+
+class CacheMetrics:
+    FIELDS = ("local_hits", "shared_hits", "misses", "stale_served", "early_refreshes", "loads", "load_errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+class TieredCache:
+    """Cache for one namespace (service), see module docstring."""
+
+    def __init__(self, namespace: str, local: Optional[LocalLRU] = None,
+                 shared: Optional[RedisTier] = None, stale_grace: float = STALE_GRACE_SECONDS):
+        self.namespace = namespace
+        self.local = local if local is not None else LocalLRU()
+        self.shared = shared
+        self.stale_grace = stale_grace
+        self.metrics = CacheMetrics()
+        # key -> [lock, number of callers holding a reference]
+        self._key_locks: Dict[str, list] = {}
+        self._key_locks_guard = threading.Lock()
+        # key -> in-flight load of get_or_set_async (event loop only, no lock needed)
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _ref_key_lock(self, key: str) -> threading.Lock:
+        with self._key_locks_guard:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _unref_key_lock(self, key: str) -> None:
+        # Drop per-key locks nobody references, so the dict stays bounded
+        with self._key_locks_guard:
+            entry = self._key_locks.get(key)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._key_locks[key]
+
+    def _lookup(self, full_key: str) -> Optional[Envelope]:
+        envelope = self.local.get(full_key)
+        if envelope is not None:
+            self.metrics.incr("local_hits")
+            return envelope
+        if self.shared is not None:
+            envelope = self.shared.get(full_key)
+            if envelope is not None:
+                self.metrics.incr("shared_hits")
+                # Promote into the local tier for the rest of its lifetime
+                self.local.set(full_key, envelope, envelope[0] + self.stale_grace)
+                return envelope
+        return None
+
+    def _store(self, full_key: str, value: Any, ttl: float, compute_seconds: float = 0.0) -> None:
+        expires_at = time.time() + ttl
+        envelope = (expires_at, compute_seconds, value)
+        deadline = expires_at + self.stale_grace
+        self.local.set(full_key, envelope, deadline)
+        if self.shared is not None:
+            self.shared.set(full_key, envelope, deadline)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Returns a fresh value or `default`."""
+        envelope = self._lookup(self._key(key))
+        if envelope is None or envelope[0] <= time.time():
+            return default
+        return envelope[2]
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._store(self._key(key), value, ttl)
+
+    def delete(self, key: str) -> None:
+        full_key = self._key(key)
+        self.local.delete(full_key)
+        if self.shared is not None:
+            self.shared.delete(full_key)
+
+    def try_lock(self, key: str, timeout: float) -> bool:
+        """
+        Claims `key` for `timeout` seconds across workers (e.g. one run of a
+        scheduled job). The lock expires unless released with unlock. Without the
+        shared tier every process gets it.
+        """
+        if self.shared is None:
+            return True
+        return self.shared.try_lock(self._key(key), timeout)
+
+    def unlock(self, key: str) -> None:
+        """Releases a try_lock claim before it expires"""
+        if self.shared is not None:
+            self.shared.unlock(self._key(key))
+
+    @staticmethod
+    def _should_refresh(envelope: Envelope, beta: float) -> bool:
+        expires_at, compute_seconds, _ = envelope
+        now = time.time()
+        if now >= expires_at:
+            return True
+        # XFetch: refresh early with probability rising as expiry approaches,
+        # earlier for values that are slow to compute
+        return now - compute_seconds * beta * math.log(random.random() or 1e-12) >= expires_at
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl: float,
+                   beta: float = 1.0, lock_timeout: float = 30.0) -> Any:
+        """
+        Returns the cached value for `key`, calling `loader()` at most once
+        across workers when it is missing or due for a refresh.
+        """
+        full_key = self._key(key)
+        envelope = self._lookup(full_key)
+        if envelope is not None and not self._should_refresh(envelope, beta):
+            return envelope[2]
+
+        key_lock = self._ref_key_lock(full_key)
+        try:
+            return self._refresh(full_key, key_lock, envelope, loader, ttl, lock_timeout)
+        finally:
+            self._unref_key_lock(full_key)
+
+    def _refresh(self, full_key: str, key_lock: threading.Lock, envelope: Optional[Envelope],
+                 loader: Callable[[], Any], ttl: float, lock_timeout: float) -> Any:
+        if envelope is not None:
+            # Somebody may already be refreshing; serve stale instead of queueing
+            if not key_lock.acquire(blocking=False):
+                self.metrics.incr("stale_served")
+                return envelope[2]
+        else:
+            if not key_lock.acquire(timeout=lock_timeout):
+                return self._load(full_key, loader, ttl)
+            # Another thread may have filled it while we waited
+            envelope = self._lookup(full_key)
+            if envelope is not None and envelope[0] > time.time():
+                key_lock.release()
+                return envelope[2]
+
+        try:
+            if self.shared is not None and not self.shared.try_lock(full_key, lock_timeout):
+                # Another worker or replica is loading this key
+                if envelope is not None:
+                    self.metrics.incr("stale_served")
+                    return envelope[2]
+                waited = self._wait_for_shared(full_key, lock_timeout)
+                if waited is not None:
+                    return waited[2]
+                return self._load(full_key, loader, ttl)
+            try:
+                if envelope is not None and envelope[0] > time.time():
+                    self.metrics.incr("early_refreshes")
+                return self._load(full_key, loader, ttl)
+            finally:
+                if self.shared is not None:
+                    self.shared.unlock(full_key)
+        finally:
+            key_lock.release()
+
+    async def get_or_set_async(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: float,
+                               beta: float = 1.0) -> Any:
+        """
+        get_or_set() for coroutines: `loader` is awaited at most once per key
+        and process; concurrent callers await the same load or get the stale
+        value. There is no lock across workers, waiting on it would block or
+        poll the event loop; a rare duplicate load per worker is cheaper.
+        """
+        full_key = self._key(key)
+        envelope = self._lookup(full_key)
+        if envelope is not None and not self._should_refresh(envelope, beta):
+            return envelope[2]
+
+        pending = self._pending.get(full_key)
+        if pending is not None and envelope is not None:
+            self.metrics.incr("stale_served")
+            return envelope[2]
+        if pending is None:
+            if envelope is not None and envelope[0] > time.time():
+                self.metrics.incr("early_refreshes")
+            pending = asyncio.ensure_future(self._load_async(full_key, loader, ttl))
+            self._pending[full_key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(full_key, None))
+        # A cancelled caller must not cancel the load others are waiting for
+        return await asyncio.shield(pending)
+
+    async def _load_async(self, full_key: str, loader: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        self.metrics.incr("misses")
+        started = time.monotonic()
+        try:
+            value = await loader()
+        except Exception:
+            self.metrics.incr("load_errors")
+            raise
+        self.metrics.incr("loads")
+        self._store(full_key, value, ttl, time.monotonic() - started)
+        return value
+
+    def _wait_for_shared(self, full_key: str, timeout: float) -> Optional[Envelope]:
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            envelope = self.shared.get(full_key)
+            if envelope is not None and envelope[0] > time.time():
+                self.local.set(full_key, envelope, envelope[0] + self.stale_grace)
+                return envelope
+            delay = min(delay * 2, 0.5)
+        return None
+
+    def _load(self, full_key: str, loader: Callable[[], Any], ttl: float) -> Any:
+        self.metrics.incr("misses")
+        started = time.monotonic()
+        try:
+            value = loader()
+        except Exception:
+            self.metrics.incr("load_errors")
+            raise
+        self.metrics.incr("loads")
+        self._store(full_key, value, ttl, time.monotonic() - started)
+        return value
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+_caches: Dict[str, TieredCache] = {}
+
+
+def set_shared_client(client) -> None:
+    """Overrides the shared-tier client (e.g. fakeredis.FakeRedis() in tests)."""
+    global _shared_client
+    with _shared_client_lock:
+        _shared_client = client
+        for cache in _caches.values():
+            cache.shared = RedisTier(client) if client is not None else None
+
+
+def _default_shared_client():
+    url = os.getenv("CACHE_REDIS_URL")
+    if not url:
+        return None
+    try:
+        import redis
+    except ImportError:
+        log.warning("CACHE_REDIS_URL is set but the redis package is not installed")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+
+def get_cache(namespace: str, local_tier: bool = True) -> TieredCache:
+    """
+    Returns the process-wide cache for a namespace (usually the service name).
+
+    local_tier=False is for mutable state that several workers update (e.g.
+    per-chat context): with Redis configured every read goes to Redis, a
+    local copy would hide the other workers' writes. Without Redis the
+    local tier is the only store and is always used. The flag applies when
+    the namespace is first created.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            if _shared_client is None:
+                _shared_client = _default_shared_client()
+            shared = RedisTier(_shared_client) if _shared_client is not None else None
+            # An LRU of size 0 drops every entry right away: Redis only
+            local = LocalLRU(max_entries=0) if not local_tier and shared is not None else None
+            cache = _caches[namespace] = TieredCache(namespace, local=local, shared=shared)
+        return cache
+
+
+def cache_metrics() -> dict:
+    """Hit/miss counters per namespace, for the services' /metrics endpoints."""
+    with _shared_client_lock:
+        caches = dict(_caches)
+    return {name: cache.metrics.as_dict() for name, cache in caches.items()}
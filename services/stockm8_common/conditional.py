@@ -0,0 +1,214 @@
+"""
+ETags, conditional requests and compression for read-only endpoints.
+
+n8n workflows poll /account-info, /market-status, /chart-links and /compare
+and usually get the same answer again. For the paths a service registers,
+ConditionalMiddleware buffers the (small) response body and
+
+- adds a weak ETag to GET/HEAD responses, a hash of body and media type,
+  unless the handler set its own (etag_for(), see precondition())
+- answers 304 Not Modified without a body when If-None-Match matches; other
+  methods get 412 Precondition Failed instead (RFC 9110, 13.1.2), so
+  pollers use the GET variants of /chart-links and /compare
+- compresses bodies of COMPRESS_MIN_BYTES or more with brotli or gzip,
+  whichever the caller accepts (brotli only if the module is installed)
+
+Where the answer follows from a few cheap values (symbols and bar day, the
+cached account version), the handler calls precondition() first and skips
+building and serialising the body when the client's copy is current.
+
+    add_conditional_responses(app, ["/account-info", "/market-status"])
+"""
+
+import gzip
+import hashlib
+import os
+from typing import Iterable, List, Optional, Tuple
+
+from starlette.responses import Response
+
+from .encoding import NEGOTIATION_VARY, negotiated_representation
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+SAFE_METHODS = ("GET", "HEAD")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # fast enough per request, still smaller than gzip
+
+
+def etag_for(*parts) -> str:
+    """
+    Weak ETag from the values that define a response (handler-set ETags).
+
+    The representation negotiated for the current request is hashed along,
+    so a JSON answer's ETag never revalidates a MessagePack or data-only one.
+    """
+    digest = hashlib.blake2b(repr((negotiated_representation(),) + parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def precondition(request, response, *parts) -> Optional[Response]:
+    """
+    Checks If-None-Match against etag_for(*parts) before the body is built.
+
+    Returns the response to send instead when the client's copy is current
+    (304 for GET/HEAD, 412 for other methods); otherwise sets the ETag on
+    `response` for GET/HEAD and returns None.
+    """
+    etag = etag_for(*parts)
+    safe = request.method in SAFE_METHODS
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        if safe:
+            return Response(status_code=304, headers={"ETag": etag, "Vary": NEGOTIATION_VARY})
+        return Response(status_code=412)
+    if safe:
+        response.headers["ETag"] = etag
+    return None
+
+
+def _body_etag(body: bytes, media_type: bytes) -> str:
+    digest = hashlib.blake2b(body, digest_size=12)
+    digest.update(media_type)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+def _encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class ConditionalMiddleware:
+    """Pure ASGI middleware, see module docstring. Other paths pass through untouched."""
+
+    def __init__(self, app, paths: Iterable[str], minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = {name: value.decode("latin-1") for name, value in scope["headers"]}
+        safe = scope["method"] in SAFE_METHODS
+        start: Optional[dict] = None
+        chunks: List[bytes] = []
+
+        async def buffer(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                await self._finish(start, b"".join(chunks), request_headers, safe, send)
+
+        await self.app(scope, receive, buffer)
+
+    async def _finish(self, start: dict, body: bytes, request_headers: dict, safe: bool, send) -> None:
+        headers: List[Tuple[bytes, bytes]] = [
+            (name, value) for name, value in start["headers"] if name.lower() != b"content-length"
+        ]
+        present = {name.lower(): value for name, value in headers}
+        if start["status"] == 304:
+            # precondition() answered before the handler built a body
+            await self._send_empty(304, _revalidation_headers(headers, present), send)
+            return
+        if start["status"] != 200 or b"content-encoding" in present:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = present.get(b"etag", b"").decode("latin-1") or _body_etag(body, present.get(b"content-type", b""))
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match and _matches(if_none_match, etag):
+            if safe:
+                headers = _revalidation_headers(headers, present, etag)
+                await self._send_empty(304, [(n, v) for n, v in headers if n.lower() != b"content-type"], send)
+            else:
+                await self._send_empty(412, [(b"content-length", b"0")], send)
+            return
+
+        if safe:
+            headers = _revalidation_headers(headers, present, etag)
+        else:
+            headers = _vary(headers, present)
+
+        encoding = _encoding(request_headers.get(b"accept-encoding", "")) if len(body) >= self.minimum_size else None
+        if encoding is not None:
+            body = _compress(body, encoding)
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": start["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_empty(status: int, headers: List[Tuple[bytes, bytes]], send) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _vary(headers: List[Tuple[bytes, bytes]], present: dict) -> List[Tuple[bytes, bytes]]:
+    vary = present.get(b"vary", b"").decode("latin-1")
+    vary = f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"
+    headers = [(name, value) for name, value in headers if name.lower() != b"vary"]
+    headers.append((b"vary", vary.encode("latin-1")))
+    return headers
+
+
+def _revalidation_headers(
+    headers: List[Tuple[bytes, bytes]], present: dict, etag: Optional[str] = None
+) -> List[Tuple[bytes, bytes]]:
+    """ETag (if not set yet), Cache-Control and Vary for a GET/HEAD answer."""
+    headers = list(headers)
+    if etag and b"etag" not in present:
+        headers.append((b"etag", etag.encode("latin-1")))
+    # Stored responses must be revalidated, a 304 keeps the poll cheap
+    if b"cache-control" not in present:
+        headers.append((b"cache-control", b"private, no-cache"))
+    return _vary(headers, present)
+
+
+def add_conditional_responses(app, paths: Iterable[str], minimum_size: int = COMPRESS_MIN_BYTES) -> None:
+    """ETag/304 handling and compression for `paths` (read-only endpoints)."""
+    app.add_middleware(ConditionalMiddleware, paths=list(paths), minimum_size=minimum_size)
@@ -0,0 +1,105 @@
+"""
+Bounded executor for CPU work called from async handlers.
+
+DataFrame building, resampling and indicator maths must not run on the event
+loop, and should not compete with Starlette's request threadpool either. They
+go through one small thread pool per worker process instead (CPU_WORKERS
+threads, default: CPU count, at most 4): pandas and NumPy release the GIL in
+their inner loops, and a bounded pool caps how many of these jobs run at once
+however many requests are waiting on the loop.
+
+    df = await run_cpu(bars_frame, raw_bars)
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+class CpuMetrics:
+    """Jobs run, jobs currently queued or running, and time spent waiting for a thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.active = 0
+        self.queue_wait_seconds = 0.0
+
+    def submitted(self) -> None:
+        with self._lock:
+            self.active += 1
+
+    def started(self, waited: float) -> None:
+        with self._lock:
+            self.jobs += 1
+            self.queue_wait_seconds += waited
+
+    def finished(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "workers": CPU_WORKERS,
+                "jobs": self.jobs,
+                "active": self.active,
+                "queue_wait_seconds": round(self.queue_wait_seconds, 3),
+            }
+
+
+cpu_metrics = CpuMetrics()
+
+
+def _cpu_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+        return _pool
+
+
+def _timed(fn: Callable[[], Any], submitted_at: float) -> Any:
+    cpu_metrics.started(time.monotonic() - submitted_at)
+    return fn()
+
+
+async def run_cpu(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Runs fn(*args, **kwargs) in the bounded CPU pool and awaits the result."""
+    call = functools.partial(fn, *args, **kwargs)
+    cpu_metrics.submitted()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            _cpu_pool(), _timed, call, time.monotonic()
+        )
+    finally:
+        cpu_metrics.finished()
+
+
+def shutdown_cpu_pool() -> None:
+    """Stops the pool (lifespan shutdown); it is recreated on next use."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _reset_after_fork() -> None:
+    # Pool threads do not survive fork; the child creates its own pool
+    global _pool, _lock
+    _lock = threading.Lock()
+    _pool = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
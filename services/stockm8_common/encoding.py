@@ -0,0 +1,154 @@
+"""
+Negotiated response encodings for the internal hops between services.
+
+Experts answer JSON by default. A caller can ask for a more compact form
+with request headers:
+
+    Accept: application/msgpack      MessagePack instead of JSON
+    X-Response-Mode: data            structured data only, without the
+                                     pre-rendered formatted_message
+
+The orchestrator sends both (see COMPACT_ACCEPT / DATA_ONLY_HEADERS) and
+renders the text itself (stockm8_common.messages); n8n, curl and other
+callers keep getting the full JSON. JSON is written with orjson when it is
+installed.
+
+Services opt in once, before their routes are declared:
+
+    app = FastAPI(...)
+    add_negotiation(app)
+
+Handlers may skip building their message when data_only_requested().
+"""
+
+import json
+from contextvars import ContextVar
+from typing import Any, Optional, Tuple
+
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is a stockm8_common requirement
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK_TYPE, "application/x-msgpack")
+MODE_HEADER = "x-response-mode"
+
+# Request headers for callers that can decode MessagePack and render messages themselves
+COMPACT_ACCEPT = {"Accept": f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.9"}
+DATA_ONLY_HEADERS = {**COMPACT_ACCEPT, "X-Response-Mode": "data"}
+
+# Request headers that select the representation
+NEGOTIATION_VARY = "Accept, X-Response-Mode"
+
+# Dropped from responses in data mode
+TEXT_FIELDS = ("formatted_message",)
+
+# (media type, data only) of the request being served
+_negotiated: ContextVar[Tuple[str, bool]] = ContextVar("negotiated", default=(JSON_TYPE, False))
+
+
+def _media_type(accept: str) -> str:
+    """MessagePack if the Accept header prefers it over JSON, else JSON."""
+    best, best_q = JSON_TYPE, -1.0
+    for item in accept.split(","):
+        media, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media = media.strip().lower()
+        if media in MSGPACK_TYPES and msgpack is not None and q > best_q:
+            best, best_q = MSGPACK_TYPE, q
+        elif media in (JSON_TYPE, "application/*", "*/*") and q > best_q:
+            best, best_q = JSON_TYPE, q
+    return best
+
+
+def data_only_requested() -> bool:
+    """True while serving a request that asked for data without rendered text."""
+    return _negotiated.get()[1]
+
+
+def negotiated_representation() -> Tuple[str, bool]:
+    """(media type, data only) of the response being built for the current request."""
+    return _negotiated.get()
+
+
+def dumps_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads_json(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class NegotiatedResponse(Response):
+    """Response class that encodes as the request negotiated (default JSON)."""
+
+    media_type = JSON_TYPE
+
+    def __init__(self, content: Any = None, *args, **kwargs):
+        self.media_type, self._data_only = _negotiated.get()
+        super().__init__(content, *args, **kwargs)
+        self.headers["Vary"] = NEGOTIATION_VARY
+
+    def render(self, content: Any) -> bytes:
+        if self._data_only and isinstance(content, dict):
+            content = {key: value for key, value in content.items() if key not in TEXT_FIELDS}
+        if self.media_type == MSGPACK_TYPE:
+            return msgpack.packb(content, use_bin_type=True)
+        return dumps_json(content)
+
+
+class NegotiationMiddleware:
+    """Pure ASGI middleware: records Accept and X-Response-Mode for NegotiatedResponse."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept, mode = "", ""
+        for name, value in scope["headers"]:
+            if name == b"accept":
+                accept = value.decode("latin-1")
+            elif name == MODE_HEADER.encode():
+                mode = value.decode("latin-1").strip().lower()
+        token = _negotiated.set((_media_type(accept) if accept else JSON_TYPE, mode == "data"))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _negotiated.reset(token)
+
+
+def add_negotiation(app) -> None:
+    """Makes NegotiatedResponse the default for routes declared after this call."""
+    app.router.default_response_class = NegotiatedResponse
+    app.add_middleware(NegotiationMiddleware)
+
+
+def decode_response(response, default: Optional[Any] = None) -> Any:
+    """Body of a requests/httpx response by its Content-Type (MessagePack or JSON)."""
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if not response.content:
+        return default
+    if content_type in MSGPACK_TYPES:
+        return msgpack.unpackb(response.content, raw=False)
+    return loads_json(response.content)
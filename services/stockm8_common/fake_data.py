@@ -0,0 +1,102 @@
+"""
+In-memory stand-in for Alpaca's market data REST API, for AsyncDataClient.
+
+    fake = FakeAlpacaData({"AAPL": [{"t": "2025-01-02T05:00:00Z", "o": 1, ...}]})
+    client = AsyncDataClient("key", "secret", transport=fake.transport())
+
+Serves /v2/stocks/{symbol}/bars (filtered by start/end, paged by `limit`),
+/trades/latest and /quotes/latest through httpx.MockTransport, so the real
+request, paging and parsing code runs without network or API keys. Symbols
+without given bars get a deterministic synthetic daily series (a random walk
+seeded by the symbol); set synthetic=False to get empty results instead.
+Every request is recorded in `requests` for assertions.
+"""
+
+import random
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+SYNTHETIC_DAYS = 400
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def synthetic_daily_bars(symbol: str, days: int = SYNTHETIC_DAYS) -> List[Dict]:
+    """Weekday bars up to yesterday, the same for a symbol on every call."""
+    rng = random.Random(zlib.crc32(symbol.encode()))
+    today = datetime.now(timezone.utc).replace(hour=4, minute=0, second=0, microsecond=0)
+    price = rng.uniform(20, 400)
+    bars = []
+    for offset in range(days, 0, -1):
+        day = today - timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        open_ = price
+        price = max(1.0, price * (1 + rng.gauss(0.0004, 0.018)))
+        high = max(open_, price) * (1 + rng.uniform(0, 0.01))
+        low = min(open_, price) * (1 - rng.uniform(0, 0.01))
+        volume = rng.randint(1_000_000, 50_000_000)
+        bars.append({
+            "t": day.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "o": round(open_, 2), "h": round(high, 2), "l": round(low, 2), "c": round(price, 2),
+            "v": volume, "n": volume // 100, "vw": round((high + low + price) / 3, 2),
+        })
+    return bars
+
+
+class FakeAlpacaData:
+    """Fake market data API; bars per symbol are served for every timeframe."""
+
+    def __init__(self, bars: Optional[Dict[str, List[Dict]]] = None, synthetic: bool = True):
+        self.bars = dict(bars or {})
+        self.synthetic = synthetic
+        self.requests: List[Tuple[str, Dict[str, str]]] = []
+
+    def _bars(self, symbol: str) -> List[Dict]:
+        if symbol not in self.bars and self.synthetic:
+            self.bars[symbol] = synthetic_daily_bars(symbol)
+        return self.bars.get(symbol, [])
+
+    def handle(self, request):
+        import httpx
+
+        params = dict(request.url.params)
+        self.requests.append((request.url.path, params))
+        parts = request.url.path.strip("/").split("/")
+        if len(parts) < 4 or parts[:2] != ["v2", "stocks"]:
+            return httpx.Response(404, json={"message": "not found"})
+        symbol, endpoint = parts[2], "/".join(parts[3:])
+        bars = self._bars(symbol)
+
+        if endpoint == "bars":
+            start = _parse(params["start"]) if "start" in params else None
+            end = _parse(params["end"]) if "end" in params else None
+            selected = [
+                bar for bar in bars
+                if (start is None or _parse(bar["t"]) >= start) and (end is None or _parse(bar["t"]) <= end)
+            ]
+            offset = int(params.get("page_token", "0"))
+            limit = int(params.get("limit", "1000"))
+            page = selected[offset:offset + limit]
+            next_token = str(offset + limit) if offset + limit < len(selected) else None
+            return httpx.Response(200, json={"bars": page or None, "symbol": symbol, "next_page_token": next_token})
+
+        if not bars:
+            return httpx.Response(404, json={"message": f"no data for {symbol}"})
+        last = bars[-1]
+        if endpoint == "trades/latest":
+            trade = {"t": last["t"], "p": last["c"], "s": 100, "x": "V", "i": 1, "c": ["@"], "z": "C"}
+            return httpx.Response(200, json={"symbol": symbol, "trade": trade})
+        if endpoint == "quotes/latest":
+            quote = {"t": last["t"], "bp": round(last["c"] - 0.01, 2), "bs": 1,
+                     "ap": round(last["c"] + 0.01, 2), "as": 1, "bx": "V", "ax": "V", "c": ["R"], "z": "C"}
+            return httpx.Response(200, json={"symbol": symbol, "quote": quote})
+        return httpx.Response(404, json={"message": "not found"})
+
+    def transport(self):
+        import httpx
+
+        return httpx.MockTransport(self.handle)
@@ -0,0 +1,81 @@
+"""
+Chat messages rendered from expert data.
+
+The chart and comparison experts return structured data plus a ready-made
+formatted_message. Callers that ask for data only (see encoding) render the
+message themselves with these functions, so expert and orchestrator always
+produce the same text.
+"""
+
+from datetime import datetime
+from typing import Dict, List
+
+
+def _trend(change: float) -> tuple:
+    """(emoji, signed text) of a rounded change; -0.0 prints as +0.0"""
+    change += 0.0
+    return ("🟢", f"+{change}") if change >= 0 else ("🔴", f"{change}")
+
+
+def chart_links_message(data: Dict) -> str:
+    """/chart-links: price, daily change and chart links (WhatsApp/Telegram markup)."""
+    trend_emoji, change = _trend(data["change_percent"])
+    return f"""📊 *{data['symbol']} Stock Update*
+
+💰 Aktueller Preis: ${data['current_price']}
+{trend_emoji} Veränderung: {change}%
+
+🔗 *Charts ansehen:*
+📊 TradingView: {data['tradingview_url']}
+📈 Yahoo Finance: {data['yahoo_finance_url']}
+
+_Powered by StockM8 🚀_"""
+
+
+def intraday_message(data: Dict) -> str:
+    """/intraday: last price, change since the open, high/low and the last bar (New York time)."""
+    trend_emoji, change = _trend(data["change_percent"])
+    last_bar = datetime.fromisoformat(data["last_bar"])
+    return f"""⏱️ *{data['symbol']} Intraday* ({data['timeframe']}-Bars)
+
+💰 Letzter Preis: ${data['last_price']}
+{trend_emoji} Seit Eröffnung: {change}%
+📈 Hoch: ${data['high']}
+📉 Tief: ${data['low']}
+🕐 Stand: {last_bar.strftime('%d.%m. %H:%M')} ET ({data['bars']} Bars)
+
+_Powered by StockM8 🚀_"""
+
+
+def comparison_message(data: Dict) -> str:
+    """/compare: prices, 1-day/1-week/1-month changes and the better performer."""
+    stock1, stock2 = data["stock1"], data["stock2"]
+    symbol1, symbol2 = stock1["symbol"], stock2["symbol"]
+    message_parts: List[str] = [
+        "📊 STOCK COMPARISON",
+        f"{symbol1} vs {symbol2}",
+        "",
+        "📈 CURRENT PRICE",
+        f"• {symbol1}: ${stock1['current_price']}",
+        f"• {symbol2}: ${stock2['current_price']}",
+        "",
+    ]
+    for title, field in (("📅 1-DAY CHANGE", "change_1d"), ("📆 1-WEEK CHANGE", "change_1w"),
+                         ("🗓️ 1-MONTH CHANGE", "change_1m")):
+        message_parts.append(title)
+        for stock in (stock1, stock2):
+            emoji, change = _trend(stock[field])
+            message_parts.append(f"• {stock['symbol']}: {change}% {emoji}")
+        message_parts.append("")
+
+    total1 = stock1["change_1d"] + stock1["change_1w"] + stock1["change_1m"]
+    total2 = stock2["change_1d"] + stock2["change_1w"] + stock2["change_1m"]
+    if total1 > total2:
+        winner = f"🏆 {symbol1} is outperforming {symbol2}"
+    elif total2 > total1:
+        winner = f"🏆 {symbol2} is outperforming {symbol1}"
+    else:
+        winner = "⚖️ Both stocks are performing equally"
+
+    message_parts += [winner, "", "🤖 Powered by StockM8"]
+    return "\n".join(message_parts)
@@ -0,0 +1,224 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("stockm8.rate_limit")
+
+# Alpaca answers these with "try again later"; 5xx only for methods that are
+# safe to repeat (a retried POST could place an order twice)
+RETRY_ALWAYS = {429}
+RETRY_IDEMPOTENT = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "DELETE"}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    The bucket can be re-synchronised from the server's view of the budget
+    (sync), which accounts for requests made by other processes using the
+    same API key.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Monotonic time before which no token may be handed out (server said 0 left)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self._blocked_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Takes one token, sleeping until one is available.
+
+        Returns the seconds spent waiting. Raises TimeoutError if the wait
+        would exceed `timeout`.
+        """
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                raise TimeoutError(f"Rate limit budget exhausted, next token in {wait:.1f}s")
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> float:
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking the loop."""
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            if timeout is not None and waited + wait > timeout:
+                raise TimeoutError(f"Rate limit budget exhausted, next token in {wait:.1f}s")
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def sync(self, limit: Optional[int], remaining: Optional[int], reset_epoch: Optional[float]) -> None:
+        """Aligns the bucket with Alpaca's X-RateLimit-* headers."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.rate = limit / 60.0
+                self.capacity = float(limit)
+            if remaining is not None:
+                self._tokens = min(self._tokens, float(remaining))
+                if remaining <= 0 and reset_epoch:
+                    self._blocked_until = now + max(0.0, reset_epoch - time.time())
+
+
+class RateLimitMetrics:
+    """Counters describing how much the bucket and retries slowed us down."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.throttle_wait_seconds = 0.0
+        self.rate_limited = 0
+        self.retries = 0
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None
+
+    def record_request(self, waited: float) -> None:
+        with self._lock:
+            self.requests += 1
+            if waited > 0:
+                self.throttled += 1
+                self.throttle_wait_seconds += waited
+
+    def record_retry(self, status_code: int) -> None:
+        with self._lock:
+            self.retries += 1
+            if status_code == 429:
+                self.rate_limited += 1
+
+    def record_headers(self, limit, remaining, reset) -> None:
+        with self._lock:
+            self.limit, self.remaining, self.reset = limit, remaining, reset
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset": self.reset,
+            }
+
+
+def _int_header(response, name: str) -> Optional[int]:
+    value = response.headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, server_hint: Optional[float], base: float, cap: float) -> float:
+    # "Full jitter": spreads retries of concurrent callers over the window
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if server_hint is not None:
+        delay = max(delay, server_hint + random.uniform(0, base))
+    return delay
+
+
+def retry_after(response) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After or X-RateLimit-Reset)."""
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            return max(0.0, parsed.timestamp() - time.time())
+    reset = _int_header(response, "X-RateLimit-Reset")
+    if reset:
+        return max(0.0, reset - time.time())
+    return None
+
+
+def follow_rate_limit_headers(response, bucket: TokenBucket, metrics: RateLimitMetrics) -> None:
+    """Records Alpaca's X-RateLimit-* headers and re-syncs the bucket (requests or httpx responses)."""
+    limit = _int_header(response, "X-RateLimit-Limit")
+    remaining = _int_header(response, "X-RateLimit-Remaining")
+    reset = _int_header(response, "X-RateLimit-Reset")
+    if limit is not None or remaining is not None:
+        metrics.record_headers(limit, remaining, reset)
+        bucket.sync(limit, remaining, reset)
+
+
+class ThrottledSession(Session):
+    """
+    requests.Session that spends tokens from a shared bucket before every
+    request, follows Alpaca's rate-limit headers and retries 429s (and 5xx
+    for idempotent methods) with jittered exponential backoff.
+    """
+
+    def __init__(self, bucket: TokenBucket, max_retries: int = 4,
+                 backoff_base: float = 0.5, backoff_cap: float = 20.0,
+                 acquire_timeout: Optional[float] = 60.0, pool_size: int = 20):
+        super().__init__()
+        self.bucket = bucket
+        self.metrics = RateLimitMetrics()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.acquire_timeout = acquire_timeout
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def _backoff(self, attempt: int, server_hint: Optional[float]) -> float:
+        return backoff_delay(attempt, server_hint, self.backoff_base, self.backoff_cap)
+
+    def request(self, method, url, *args, **kwargs):
+        retryable = RETRY_ALWAYS | (RETRY_IDEMPOTENT if method.upper() in IDEMPOTENT_METHODS else set())
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire(timeout=self.acquire_timeout)
+            self.metrics.record_request(waited)
+            response = super().request(method, url, *args, **kwargs)
+
+            follow_rate_limit_headers(response, self.bucket, self.metrics)
+
+            if response.status_code not in retryable or attempt >= self.max_retries:
+                return response
+
+            delay = self._backoff(attempt, retry_after(response))
+            self.metrics.record_retry(response.status_code)
+            log.warning("%s %s returned %s, retrying in %.2fs", method, url, response.status_code, delay)
+            response.close()
+            time.sleep(delay)
+            attempt += 1
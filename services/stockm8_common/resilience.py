@@ -0,0 +1,189 @@
+"""
+Circuit breakers and hedged requests for calls to other services.
+
+    CircuitBreaker   closed → open after too many failed or slow calls in the
+                     recent window, rejects calls for `open_seconds`, then lets
+                     one probe through (half-open) to decide whether to close
+    hedged_call      starts a second identical call when the first has not
+                     answered after `delay` seconds and returns whichever
+                     succeeds first; only for idempotent requests
+
+Breakers are per process, each worker learns about a slow dependency on its own
+within a handful of calls.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+from requests.exceptions import RequestException
+
+log = logging.getLogger("stockm8.resilience")
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RequestException):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Thread-safe breaker over the last `window` calls.
+
+    A call fails if it raises or takes longer than `slow_call_seconds`. The
+    breaker opens once at least `min_calls` are recorded and the share of
+    failures reaches `failure_ratio`.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_ratio: float = 0.5,
+                 slow_call_seconds: float = 5.0, open_seconds: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        ok = ok and seconds <= self.slow_call_seconds
+        with self._lock:
+            if ok:
+                self._latencies.append(seconds)
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if ok:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_ratio):
+                self._trip()
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        log.warning("Circuit %s opened for %.0fs", self.name, self.open_seconds)
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Runs fn through the breaker; raises CircuitOpenError without calling it when open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is failing, circuit open")
+        started = time.monotonic()
+        try:
+            result = fn()
+        except Exception:
+            self.record(False, time.monotonic() - started)
+            raise
+        self.record(True, time.monotonic() - started)
+        return result
+
+    def latency(self, quantile: float) -> Optional[float]:
+        """Latency quantile of recent successful calls (None until min_calls are seen)."""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_calls:
+            return None
+        return samples[min(len(samples) - 1, int(quantile * len(samples)))]
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            failures = self._outcomes.count(False)
+            calls = len(self._outcomes)
+        p95 = self.latency(0.95)
+        return {
+            "state": self.state,
+            "recent_calls": calls,
+            "recent_failures": failures,
+            "p95_seconds": round(p95, 3) if p95 is not None else None,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class HedgeMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_won = 0
+
+    def record(self, hedged: bool, hedge_won: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.hedged += hedged
+            self.hedge_won += hedge_won
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "hedged": self.hedged, "hedge_won": self.hedge_won}
+
+
+hedge_metrics = HedgeMetrics()
+
+# Own pool: hedged calls are often made from pool threads themselves
+_hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def hedged_call(fn: Callable[[], T], delay: float) -> T:
+    """
+    Calls fn, and again if the first call is still running after `delay` seconds.
+
+    Returns the first successful result; raises only if both calls fail. The
+    slower call is left to finish in the background and its result dropped,
+    so fn must be safe to run twice.
+    """
+    first = _hedge_pool.submit(fn)
+    done, _ = wait([first], timeout=delay)
+    if done:
+        hedge_metrics.record(False, False)
+        return first.result()
+
+    second = _hedge_pool.submit(fn)
+    pending = {first, second}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                hedge_metrics.record(True, future is second)
+                return future.result()
+            error = future.exception()
+    hedge_metrics.record(True, False)
+    raise error
@@ -0,0 +1,112 @@
+"""
+Fast cold start: background warm-up, readiness and an import-time profile.
+
+Services keep heavy libraries (pandas, alpaca-py, agno, ...) out of module
+import so uvicorn starts serving immediately. A Warmup started from the
+lifespan hook imports them in a worker thread, runs warm-up hooks (client
+creation) and flips readiness when done:
+
+    GET /healthz          liveness, 200 as soon as the process serves HTTP
+    GET /readyz           readiness, 503 until the warm-up has finished
+    GET /startup-profile  seconds spent per import and hook
+
+Requests that arrive before warm-up finishes still work; they simply import
+what they need on first use.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+log = logging.getLogger("stockm8.startup")
+
+# Roughly process start: stockm8_common is imported early by every service
+STARTED_AT = time.monotonic()
+
+
+class Warmup:
+    """Imports modules and runs hooks in a background thread, then marks the service ready."""
+
+    def __init__(self, modules: Sequence[str] = (), hooks: Sequence[Tuple[str, Callable[[], object]]] = ()):
+        self.modules = list(modules)
+        self.hooks = list(hooks)
+        self.ready = False
+        self.error: Optional[str] = None
+        self.steps: List[dict] = []
+        self.ready_after: Optional[float] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _record(self, kind: str, name: str, seconds: float, already_loaded: bool = False) -> None:
+        with self._lock:
+            self.steps.append({
+                "kind": kind,
+                "name": name,
+                "seconds": round(seconds, 4),
+                "already_loaded": already_loaded,
+            })
+
+    def run(self) -> None:
+        """Runs the warm-up synchronously (called in a thread by start())."""
+        try:
+            for module in self.modules:
+                already_loaded = module in sys.modules
+                started = time.perf_counter()
+                importlib.import_module(module)
+                self._record("import", module, time.perf_counter() - started, already_loaded)
+            for name, hook in self.hooks:
+                started = time.perf_counter()
+                hook()
+                self._record("hook", name, time.perf_counter() - started)
+        except Exception as e:
+            # Stay not-ready; requests can still retry the lazy path themselves
+            log.exception("Warm-up failed")
+            self.error = f"{type(e).__name__}: {e}"
+            return
+        self.ready_after = time.monotonic() - STARTED_AT
+        self.ready = True
+        log.info("Ready after %.2fs (pid %s)", self.ready_after, os.getpid())
+
+    def start(self) -> asyncio.Task:
+        """Schedules the warm-up on the running event loop without blocking startup."""
+        self._task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.run))
+        return self._task
+
+    def report(self) -> dict:
+        with self._lock:
+            steps = list(self.steps)
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "pid": os.getpid(),
+            "seconds_since_start": round(time.monotonic() - STARTED_AT, 3),
+            "ready_after_seconds": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "warmup_seconds": round(sum(step["seconds"] for step in steps), 3),
+            "steps": sorted(steps, key=lambda step: step["seconds"], reverse=True),
+        }
+
+
+def add_health_routes(app: FastAPI, warmup: Warmup) -> None:
+    """Adds /healthz, /readyz and /startup-profile to a service."""
+
+    @app.get("/healthz", include_in_schema=False)
+    def liveness():
+        return {"status": "alive"}
+
+    @app.get("/readyz", include_in_schema=False)
+    def readiness():
+        if warmup.ready:
+            return {"status": "ready"}
+        return JSONResponse(status_code=503, content={"status": "starting", "error": warmup.error})
+
+    @app.get("/startup-profile", include_in_schema=False)
+    def startup_profile():
+        return warmup.report()